@@ -1,233 +1,90 @@
 import sys
+import time
+
+STARTED_AT = time.perf_counter()
+
+# Headless-режим (сервер, планировщик задач): PyQt6 и GUI не загружаются вовсе
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    from whea_headless import main as headless_main
+    sys.exit(headless_main(sys.argv[1:]))
+
+# Офлайн-анализ выгруженных журналов: python WHEA.py analyze dump.xml ...
+if __name__ == '__main__' and sys.argv[1:2] == ['analyze']:
+    from whea_analyze import main as analyze_main
+    sys.exit(analyze_main(sys.argv[2:]))
+
+# Поиск в сегментах журнала по времени: python WHEA.py logs around "14:32"
+if __name__ == '__main__' and sys.argv[1:2] == ['logs']:
+    from whea_log import main as logs_main
+    sys.exit(logs_main(sys.argv[2:]))
+
+# Клиент потока событий: python WHEA.py ipc subscribe | state
+if __name__ == '__main__' and sys.argv[1:2] == ['ipc']:
+    from whea_ipc import main as ipc_main
+    sys.exit(ipc_main(sys.argv[2:]))
+
+# Эталонный сборщик для проверки отправки: python WHEA.py report collector --port 8765
+if __name__ == '__main__' and sys.argv[1:2] == ['report']:
+    from whea_report import main as report_main
+    sys.exit(report_main(sys.argv[2:]))
+
+# До значка в трее импортируется только нужное для окна и трея. Окно настройки (whea_settings),
+# WHEA Tools (whea_tools), чтение журнала (whea_sources, whea_hosts), история SQLite, поток
+# событий и отправка на сборщик подключаются при первом использовании или после появления значка.
 import os
-import winsound
 import json
-import win32evtlog
-import pywintypes
-import ctypes
-import tempfile
 import subprocess
 from datetime import datetime
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QGroupBox, QCheckBox, QLineEdit, 
-    QPushButton, QFileDialog, QTextEdit, QLabel, QHBoxLayout, 
-    QVBoxLayout, QSystemTrayIcon, QMenu, QMessageBox, QDialog, 
-    QRadioButton  # Добавляем сюда QRadioButton
+    QApplication, QWidget, QLineEdit, QPushButton, QLabel,
+    QSystemTrayIcon, QMenu, QMessageBox, QComboBox
 )
-from PyQt6.QtGui import QPalette, QColor, QIntValidator, QIcon, QAction, QKeySequence
-from PyQt6.QtCore import Qt, QTimer, QSharedMemory, QEvent
+from PyQt6.QtGui import QIntValidator, QIcon, QAction
+from PyQt6.QtCore import Qt, QTimer, QSharedMemory, pyqtSignal
 
+from whea_core import (
+    CONFIG_PATH, MAX_RECORDS_PER_TICK, write_log, resource_path, load_config, ConfigWatcher,
+    set_log_level, configure_logs, flush_logs, matcher_from_config, channels_from_config,
+    EventLogCursor, EventLogHandlePool, ScanStats, WheaDetector,
+)
+from whea_triggers import log_detection, log_rate_alert, TriggerExecutor
+from whea_rates import RateDetector, load_rules
+from whea_rules import compile_rules
+from whea_metrics import MetricsServer
+from whea_dedup import table_from_config, DEDUP_MAX_ENTRIES, DEDUP_REPORT_INTERVAL, DEDUP_SWEEP_INTERVAL
+from whea_log import INFO, WARNING, ERROR
+from whea_schedule import scheduler_from_config, format_decision
+from whea_logview import (
+    LogModel, LogView, LOG_VIEW_CAPACITY, SEVERITY_FILTERS, detection_level, parse_id_filter,
+)
 
-APPDATA_DIR = os.path.join(os.getenv("APPDATA"), "Forgotten", "WHEAD")
-os.makedirs(APPDATA_DIR, exist_ok=True)
-
-LOG_FILE_PATH = os.path.join(APPDATA_DIR, "LTC-Logger.log")
-CONFIG_PATH = os.path.join(APPDATA_DIR, "LTC-Cursed.forgotten")
-ERRORS_LOG_PATH = os.path.join(APPDATA_DIR, "LTC-Errors.log")
-
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
-
-
-def write_log(text: str):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-    try:
-        with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {text}\n")
-    except Exception:
-        pass
-
-
-def write_error_log(text: str):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    try:
-        with open(ERRORS_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {text}\n")
-    except Exception:
-        pass
-
-
-def event_to_dict(event):
-    d = {}
-    for attr in dir(event):
-        if attr.startswith('_'):
-            continue
-        try:
-            val = getattr(event, attr)
-            if callable(val):
-                continue
-            if isinstance(val, (datetime, pywintypes.Time)):
-                val = str(val)
-            d[attr] = val
-        except Exception:
-            continue
-    return d
-
+IMPORTED_AT = time.perf_counter()
 
-def show_messagebox(text, title="WHEA Monitor"):
-    ctypes.windll.user32.MessageBoxW(0, text, title, 0x40)  # MB_ICONINFORMATION
+CONFIG_CHECK_MS = 2000  # Как часто проверяется, не изменился ли файл конфигурации
 
 
-class TriggerSettingsForm(QDialog):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Настройка триггера")
-        icon_path = resource_path("icon.ico")
-        if os.path.exists(icon_path):
-            self.setWindowIcon(QIcon(icon_path))
-        self.setFixedSize(450, 520)  # Размер остаётся прежним
-
-        palette = QPalette()
-        palette.setColor(QPalette.ColorRole.Window, QColor(45, 45, 45))
-        palette.setColor(QPalette.ColorRole.WindowText, QColor(220, 220, 220))
-        self.setPalette(palette)
-
-        self.setStyleSheet(""" 
-            QWidget { background-color: #1e1f26; color: #e0e0e0; font-family: 'Segoe UI'; font-size: 14px; }
-            QGroupBox { background-color: #323232; border: 1px solid gray; border-radius: 4px; margin-top: 4px; padding: 8px; min-height: 130px; }
-            QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; padding: 0 5px; color: #F0F0F0; font-weight: bold; font-size: 15px; }
-            QCheckBox { color: #F0F0F0; spacing: 6px; padding: 2px 0; font-size: 14px; background-color: transparent; }
-            QLabel { background-color: transparent; color: #F0F0F0; font-size: 14px; }
-            QLineEdit { background-color: #2c2d35; border: 1px solid #444; border-radius: 6px; padding: 6px 8px; color: #fff; min-height: 20px; font-size: 14px; }
-            QPushButton { background-color: #3f51b5; border-radius: 6px; color: white; padding: 4px 10px; min-height: 28px; }
-            QPushButton:hover { background-color: #303f9f; }
-        """)
+def form_config(cfg, file_exists=True):
+    """Конфигурация с теми же значениями по умолчанию для ключей окна настройки, что показала бы форма."""
+    config = {
+        # Без файла конфигурации форма показывает включённое стандартное уведомление
+        "message_enabled": not file_exists,
+        "message_mode": "notify",
+        "execute_enabled": False,
+        "execute_path": "",
+        "execute_args": "",
+        "rate_rules": [],
+        **cfg,
+    }
+    if config["message_mode"] != "notify":
+        config["message_mode"] = "message"
+    return config
 
-        main_layout = QVBoxLayout(self)
-        main_layout.setContentsMargins(8, 8, 8, 8)
-        main_layout.setSpacing(6)
-
-        # Message panel
-        self.group_message = QGroupBox("Сообщение")
-        layout_msg = QVBoxLayout(self.group_message)
-        self.checkbox_msg_enable = QCheckBox("Включить")
-        self.checkbox_msg_enable.setChecked(True)  # По умолчанию включено
-        self.checkbox_msg_enable.stateChanged.connect(self.on_message_enable_changed)
-
-        self.label_mode = QLabel("Режим уведомления")
-        self.radio_notify = QRadioButton("Стандартный Windows")
-        self.radio_notify.setChecked(True)  # По умолчанию выбрано уведомление Windows
-        self.radio_message = QRadioButton("Сообщение")
-        
-        layout_msg.addWidget(self.checkbox_msg_enable)
-        layout_msg.addWidget(self.label_mode)
-        layout_msg.addWidget(self.radio_notify)
-        layout_msg.addWidget(self.radio_message)
-        layout_msg.addStretch()
-        main_layout.addWidget(self.group_message)
-
-        # Execute panel (не изменён)
-        self.group_execute = QGroupBox("Запуск")
-        layout_exec = QVBoxLayout(self.group_execute)
-        self.checkbox_exec_enable = QCheckBox("Включить")
-        self.checkbox_exec_enable.stateChanged.connect(self.update_execute_controls)
-        layout_exec.addWidget(self.checkbox_exec_enable)
-        path_layout = QHBoxLayout()
-        self.line_program = QLineEdit()
-        self.line_program.setPlaceholderText("Путь к программе")
-        self.btn_browse = QPushButton("Обзор")
-        self.btn_browse.clicked.connect(self.browse_program)
-        self.btn_browse.setEnabled(False)
-        path_layout.addWidget(self.line_program)
-        path_layout.addWidget(self.btn_browse)
-        layout_exec.addLayout(path_layout)
-        self.line_args = QLineEdit()
-        self.line_args.setPlaceholderText("Аргумент запуска")
-        self.line_args.setEnabled(False)
-        layout_exec.addWidget(self.line_args)
-        layout_exec.addStretch()
-        main_layout.addWidget(self.group_execute)
-
-        self.load_config()
-        self.update_message_controls()
-        self.update_execute_controls()
-
-    def on_message_enable_changed(self, state):
-        """Изменение состояния включения/выключения блока сообщений."""
-        enabled = self.checkbox_msg_enable.isChecked()
-        self.radio_notify.setEnabled(enabled)
-        self.radio_message.setEnabled(enabled)
-
-        # Логируем состояние чекбокса
-        write_log(f"Состояние чекбокса 'Включить': {enabled}")  # Логируем состояние чекбокса
-
-        # Сохраняем обновленное состояние конфигурации
-        self.save_config()  # Сохраняем изменения в конфигурации
-
-    def update_message_controls(self):
-        """Обновление контролов для сообщений."""
-        enabled = self.checkbox_msg_enable.isChecked()
-        self.radio_notify.setEnabled(enabled)
-        self.radio_message.setEnabled(enabled)
-
-    def update_execute_controls(self):
-        """Обновление контролов для запуска программы."""
-        enabled = self.checkbox_exec_enable.isChecked()
-        self.line_program.setEnabled(enabled)
-        self.btn_browse.setEnabled(enabled)
-        self.line_args.setEnabled(enabled)
-
-    def browse_program(self):
-        """Выбор программы через диалоговое окно."""
-        path, _ = QFileDialog.getOpenFileName(self, "Выберите .exe или .bat", "", "Executable Files (*.exe *.bat)")
-        if path:
-            self.line_program.setText(path)
-
-    def get_current_config(self):
-        """Возвращаем текущую конфигурацию триггера."""
-        return {
-            "message_enabled": self.checkbox_msg_enable.isChecked(),
-            "message_mode": "notify" if self.radio_notify.isChecked() else "message",
-            "execute_enabled": self.checkbox_exec_enable.isChecked(),
-            "execute_path": self.line_program.text(),
-            "execute_args": self.line_args.text()
-        }
 
-    def load_config(self):
-        """Загрузка конфигурации."""
-        if os.path.exists(CONFIG_PATH):
-            try:
-                with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                    cfg = json.load(f)
-                    write_log(f"Загружена конфигурация триггера: {json.dumps(cfg, ensure_ascii=False)}")  # Логируем конфигурацию
-
-                    # Убедимся, что состояние чекбокса правильно устанавливается
-                    self.checkbox_msg_enable.setChecked(cfg.get("message_enabled", False))  # Включение триггера
-                    write_log(f"Значение 'message_enabled' из конфигурации: {cfg.get('message_enabled', False)}")  # Логируем значение
-
-                    mode = cfg.get("message_mode", "notify")
-                    if mode == "notify":
-                        self.radio_notify.setChecked(True)
-                    else:
-                        self.radio_message.setChecked(True)
-
-                    self.checkbox_exec_enable.setChecked(cfg.get("execute_enabled", False))
-                    self.line_program.setText(cfg.get("execute_path", ""))
-                    self.line_args.setText(cfg.get("execute_args", ""))
-            except Exception as e:
-                write_log(f"Ошибка загрузки конфигурации: {e}")
+def initial_trigger_config():
+    """Конфигурация при запуске без построения окна настройки."""
+    return form_config(load_config(), os.path.exists(CONFIG_PATH))
 
 
-    def closeEvent(self, event):
-        """Переопределение метода closeEvent для сохранения конфигурации при закрытии формы."""
-        self.save_config()  # Сохраняем конфигурацию триггера перед закрытием
-        event.accept()  # Разрешаем закрытие окна
-
-    def save_config(self):
-        """Сохранение конфигурации."""
-        cfg = self.get_current_config()  # Получаем текущую конфигурацию
-        try:
-            with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-                json.dump(cfg, f, indent=2, ensure_ascii=False)
-            write_log(f"Конфигурация триггера сохранена: {json.dumps(cfg, ensure_ascii=False)}")  # Логируем сохранение
-        except Exception as e:
-            write_log(f"Ошибка сохранения конфигурации триггера: {e}")
-
 # Общая функция для показа уведомлений
 def Win_Message(app, icon_type, message):
     """Функция для показа уведомлений."""
@@ -245,15 +102,25 @@ def Win_Message(app, icon_type, message):
 
 
 class WheaMonitorApp(QWidget):
-    WHEA_EVENT_IDS = {17, 18, 19, 20, 41, 45, 46, 47}
-
-    def __init__(self):
+    # Чтение и обработка журнала идут в фоновых потоках — результаты передаём в GUI-поток через сигналы
+    detection_found = pyqtSignal(object)
+    rate_alert_found = pyqtSignal(object)
+    source_error = pyqtSignal(str)
+    notify_requested = pyqtSignal(str)
+    poll_schedule_changed = pyqtSignal(object)
+
+    def __init__(self, startup_report=False):
         super().__init__()
 
         self.trigger_config = {}
+        self.startup_report = startup_report
 
         self.instance_check = QSharedMemory("WHEA_MONITOR_APP_KEY")
         if self.instance_check.attach():
+            if startup_report:
+                # Замер запуска не показывает окно: запущенный экземпляр исказил бы результат
+                print(json.dumps({"error": "WHEAD уже запущен"}, ensure_ascii=False), flush=True)
+                sys.exit(2)
             QMessageBox.warning(None, "WHEA Monitor", "Приложение уже запущено.")
             sys.exit(0)
         if not self.instance_check.create(1):
@@ -262,18 +129,95 @@ class WheaMonitorApp(QWidget):
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.check_whea_events)
+        self.detection_found.connect(self.handle_detection)
+        self.rate_alert_found.connect(self.handle_rate_alert)
+        self.source_error.connect(self.on_source_error)
+        self.notify_requested.connect(lambda text: Win_Message(self, 1, text))
+        self.poll_schedule_changed.connect(self.on_poll_schedule_changed)
+        self.trigger_executor = None
+        self.rate_detector = RateDetector()
+        self.dedup = None
+        self.event_source = None
+        self.scan_worker = None
+        self.scheduler = None
+        self.host_monitor = None
+        self.ipc = None
+        self.reporter = None
+        self.history = None
+        self.metrics_server = None
+        self.trigger_form = None  # Окно настройки строится при первом открытии
+        self.ready_at = None
+
+        self.update_trigger_config(initial_trigger_config())
 
-        self.trigger_form = TriggerSettingsForm()
-        self.update_trigger_config(self.trigger_form.get_current_config())
-        self.trigger_form.save_callback = self.update_trigger_config
-
-        self.setup_ui()
+        icon_path = resource_path("icon.ico")
+        self.icon = QIcon(icon_path) if os.path.exists(icon_path) else QIcon()
         self.setup_tray()
+        self.tray_at = time.perf_counter()
+        if not startup_report:
+            self.show_notification()
 
         self.monitor_start_time = datetime.now()
-        self.last_error_count = 0
-
-        self.show_notification()
+        self.detector = WheaDetector(matcher_from_config(self.trigger_config))
+        self.cursor = EventLogCursor()
+        self.scan_stats = ScanStats()
+        self.handle_pool = EventLogHandlePool()
+        # Окно, история и фоновые службы — в первом проходе цикла событий, когда значок уже в трее
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        self.setup_ui()
+        # Действия триггера выполняются в своих потоках; уведомление в трей — через сигнал в GUI-поток
+        self.trigger_executor = TriggerExecutor(self.trigger_config, notify=self.notify_requested.emit)
+        self.trigger_executor.start()
+        self.dedup = table_from_config(self.trigger_config)
+        if self.dedup is not None:
+            # Повторы затихшего всплеска уходят сводкой по таймеру, не дожидаясь нового события
+            self.dedup_timer = QTimer(self)
+            self.dedup_timer.timeout.connect(self.sweep_dedup)
+            self.dedup_timer.start(DEDUP_SWEEP_INTERVAL * 1000)
+        if self.trigger_config.get("history_enabled", True):
+            from whea_history import WheaHistory, RETENTION_DAYS
+            try:
+                self.history = WheaHistory(retention_days=self.trigger_config.get("history_retention_days", RETENTION_DAYS))
+            except Exception as e:
+                write_log(f"Ошибка открытия истории WHEA: {e}")
+        self.start_metrics_server(int(self.trigger_config.get("metrics_port", 0)))
+        from whea_ipc import server_from_config
+        from whea_report import reporter_from_config
+        # Поток событий для других программ (именованный канал \\.\pipe\WHEAD)
+        self.ipc = server_from_config(self.trigger_config, self.current_state)
+        # Отправка на центральный сборщик (report_url), если задана
+        self.reporter = reporter_from_config(self.trigger_config)
+        # Правка файла конфигурации снаружи применяется на лету; неверный файл не применяется
+        self.config_watcher = ConfigWatcher(interval=0, validate=compile_rules,
+                                            on_error=lambda text: self.log_ui(text, ERROR))
+        self.config_timer = QTimer(self)
+        self.config_timer.timeout.connect(self.check_config_file)
+        self.config_timer.start(CONFIG_CHECK_MS)
+        self.ready_at = time.perf_counter()
+        write_log(f"Запуск: импорт {(IMPORTED_AT - STARTED_AT) * 1000:.0f} мс, значок в трее {(self.tray_at - STARTED_AT) * 1000:.0f} мс, "
+                  f"готовность {(self.ready_at - STARTED_AT) * 1000:.0f} мс")
+        if self.startup_report:
+            print(json.dumps({
+                "import_ms": round((IMPORTED_AT - STARTED_AT) * 1000, 1),
+                "tray_ms": round((self.tray_at - STARTED_AT) * 1000, 1),
+                "ready_ms": round((self.ready_at - STARTED_AT) * 1000, 1),
+                "modules": len(sys.modules),
+            }), flush=True)
+            self.exit_app()
+
+    def start_metrics_server(self, port):
+        """Локальный эндпоинт метрик (ключ конфигурации metrics_port, 0 — выключен)."""
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(port)
+            self.metrics_server.start()
+            write_log(f"Метрики доступны на http://127.0.0.1:{self.metrics_server.port}/metrics")
+        except OSError as e:
+            self.metrics_server = None
+            write_log(f"Не удалось открыть порт метрик {port}: {e}")
 
     def show_notification(self):
         """Простая функция для показа уведомления о сворачивании приложения в трей."""
@@ -286,8 +230,6 @@ class WheaMonitorApp(QWidget):
 
     def setup_ui(self):
         self.setWindowTitle("Монитор WHEA")
-        icon_path = resource_path("icon.ico")
-        self.icon = QIcon(icon_path) if os.path.exists(icon_path) else QIcon()
         self.setWindowIcon(self.icon)
         self.setFixedSize(550, 380)  # Ширина прежняя, не меняем
 
@@ -332,23 +274,52 @@ class WheaMonitorApp(QWidget):
         self.stop_button.setEnabled(False)
         self.stop_button.clicked.connect(self.stop_monitor)
 
-        self.log_output = QTextEdit(self)
-        self.log_output.setGeometry(20, 60, 510, 250)  # Старая ширина 510
+        # Журнал окна: кольцевой буфер и список, который рисует только видимые строки
+        self.severity_filter = QComboBox(self)
+        self.severity_filter.setGeometry(20, 56, 230, 26)
+        for title, _ in SEVERITY_FILTERS:
+            self.severity_filter.addItem(title)
+        self.severity_filter.currentIndexChanged.connect(self.apply_log_filter)
+
+        self.id_filter = QLineEdit(self)
+        self.id_filter.setGeometry(260, 56, 270, 26)
+        self.id_filter.setPlaceholderText("Коды событий: 19, 41")
+        self.id_filter.textChanged.connect(self.apply_log_filter)
+
+        self.log_model = LogModel(self.trigger_config.get("log_view_capacity", LOG_VIEW_CAPACITY), self)
+        self.log_output = LogView(self.log_model, self)
+        self.log_output.setGeometry(20, 88, 510, 222)
 
         self.trigger_button = QPushButton("⚡ Настроить триггер", self)
         self.trigger_button.setGeometry(20, 320, 180, 30)
-        # self.trigger_button.clicked.connect(lambda: self.trigger_form.exec())
-        # Вставить внутрь setup_ui(), сразу после создания self.trigger_button
-        def open_trigger_dialog():
-            self.trigger_form.exec()
-            self.update_trigger_config(self.trigger_form.get_current_config())
-
-        self.trigger_button.clicked.connect(open_trigger_dialog)
+        self.trigger_button.clicked.connect(self.open_trigger_dialog)
 
         self.tools_button = QPushButton("WHEA Tools", self)
         self.tools_button.setGeometry(220, 320, 130, 30)
         self.tools_button.clicked.connect(self.run_whea_tools)
 
+        # Текущий интервал опроса; причина последней смены — во всплывающей подсказке
+        self.poll_label = QLabel("", self)
+        self.poll_label.setGeometry(360, 320, 170, 30)
+
+    def open_trigger_dialog(self):
+        if self.trigger_form is None:
+            from whea_settings import TriggerSettingsForm
+            self.trigger_form = TriggerSettingsForm()
+            self.trigger_form.save_callback = self.update_trigger_config
+        else:
+            self.trigger_form.load_config()  # Файл мог измениться снаружи с прошлого открытия
+        self.trigger_form.exec()
+        self.update_trigger_config(self.trigger_form.get_current_config())
+
+    def log_ui(self, text, level=INFO, event_ids=()):
+        """Строка в журнал окна с текущим временем."""
+        self.log_model.append(f"[{datetime.now().strftime('%H:%M:%S')}] {text}", level, event_ids)
+
+    def apply_log_filter(self):
+        self.log_model.set_filter(SEVERITY_FILTERS[self.severity_filter.currentIndex()][1],
+                                  parse_id_filter(self.id_filter.text()))
+
     def setup_tray(self):
         self.tray_icon = QSystemTrayIcon(self.icon, self)
         tray_menu = QMenu()
@@ -395,7 +366,7 @@ class WheaMonitorApp(QWidget):
         self.hide()
 
     def update_tray_actions(self):
-        running = self.timer.isActive()
+        running = self.event_source is not None or self.host_monitor is not None
         self.act_start.setEnabled(not running)
         self.act_stop.setEnabled(running)
 
@@ -405,139 +376,238 @@ class WheaMonitorApp(QWidget):
             if interval < 1 or interval > 3600:
                 raise ValueError()
         except ValueError:
-            self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] Ошибка: интервал должен быть от 1 до 3600")
+            self.log_ui("Ошибка: интервал должен быть от 1 до 3600", WARNING)
             write_log("Ошибка запуска мониторинга: неверный интервал.")
             return
 
-        if interval < 5:
-            self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] Внимание: интервал ниже 5 секунд может вызывать нагрузку на CPU")
+        source_kind = self.trigger_config.get("event_source", "poll")
+        if interval < 5 and source_kind == "poll":
+            self.log_ui("Внимание: интервал ниже 5 секунд может вызывать нагрузку на CPU", WARNING)
+
+        # Модули чтения журнала нужны только с запуском мониторинга
+        from whea_sources import create_event_source, ScanWorker
+        from whea_hosts import MultiHostMonitor, EventLogFetcher
 
         self.interval_input.setDisabled(True)
-        self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] Мониторинг WHEA запущен")
-        write_log(f"Мониторинг WHEA запущен с интервалом {interval} секунд")
+        self.log_ui("Мониторинг WHEA запущен")
         self.monitor_start_time = datetime.now()
-        self.timer.start(interval * 1000)
+        self.detector.matcher = matcher = matcher_from_config(self.trigger_config)
+        self.detector.reset()
+        channels = channels_from_config(self.trigger_config)
+        max_records = int(self.trigger_config.get("max_records_per_tick", MAX_RECORDS_PER_TICK))
+        hosts = self.trigger_config.get("hosts") or ['localhost']
+        if hosts != ['localhost']:
+            # Несколько хостов: опрос пулом потоков, таймер только раздаёт задания
+            self.host_monitor = MultiHostMonitor(
+                hosts,
+                EventLogFetcher(self.cursor, self.monitor_start_time.timestamp(), max_records, channels,
+                                handles=self.handle_pool, matcher=matcher),
+                self.on_host_detection,
+                self.source_error.emit,
+                interval=interval,
+                max_workers=int(self.trigger_config.get("host_workers", 8)),
+                timeout=int(self.trigger_config.get("host_timeout", 60)),
+                matcher=matcher,
+            )
+            self.host_monitor.start()
+            write_log(f"Мониторинг WHEA запущен для хостов {', '.join(hosts)} с интервалом {interval} секунд")
+            self.timer.setSingleShot(False)
+            self.timer.start(1000)
+            self.check_whea_events()
+        else:
+            self.event_source = create_event_source(
+                source_kind,
+                cursor=self.cursor,
+                since=self.monitor_start_time.timestamp(),
+                max_records=max_records,
+                stats=self.scan_stats,
+                handles=self.handle_pool,
+                channels=channels,
+                matcher=matcher,
+            )
+            write_log(f"Мониторинг WHEA запущен (источник: {self.event_source.name}, каналы: {', '.join(channels)}) "
+                      f"с интервалом {interval} секунд")
+            if self.event_source.needs_polling:
+                self.scheduler = scheduler_from_config(self.trigger_config, interval)
+            self.scan_worker = ScanWorker(self.event_source, self.process_events, self.source_error.emit,
+                                          on_polled=self.on_polled)
+            self.scan_worker.start()
+            if self.scheduler is not None:
+                # Каждый тик заново заводит однократный таймер на паузу, выбранную планировщиком
+                self.timer.setSingleShot(True)
+                self.timer.start(int(self.scheduler.next_delay() * 1000))
+                self.show_poll_interval(self.scheduler.interval, self.scheduler.reason)
+            elif self.event_source.needs_polling:
+                self.timer.setSingleShot(False)
+                self.timer.start(interval * 1000)
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
         self.update_tray_actions()
-        self.last_error_count = 0
 
     def stop_monitor(self):
         self.timer.stop()
-        self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] Мониторинг WHEA остановлен")
+        if self.scan_worker is not None:
+            self.scan_worker.stop()
+            self.scan_worker = None
+        self.event_source = None
+        self.scheduler = None
+        self.poll_label.setText("")
+        self.stop_host_monitor()
+        self.flush_dedup()
+        self.log_ui("Мониторинг WHEA остановлен")
         write_log("Мониторинг WHEA остановлен")
         self.interval_input.setDisabled(False)
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.update_tray_actions()
-        self.last_error_count = 0
+        self.detector.reset()
 
     def exit_app(self):
+        if self.scan_worker is not None:
+            self.scan_worker.stop()
+            self.scan_worker = None
+        self.stop_host_monitor()
+        self.flush_dedup()
+        if self.trigger_executor is not None:
+            self.trigger_executor.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.ipc is not None:
+            self.ipc.stop()
+        if self.reporter is not None:
+            self.reporter.stop()
         self.tray_icon.hide()
+        if self.history is not None:
+            self.history.close()
+        flush_logs()
         QApplication.quit()
 
-    def check_whea_events(self):
-        server = 'localhost'
-        log_type = 'System'
-        flags = win32evtlog.EVENTLOG_BACKWARDS_READ | win32evtlog.EVENTLOG_SEQUENTIAL_READ
+    def stop_host_monitor(self):
+        """Закрыть хендлы журналов; если опросы хостов ещё идут — когда последний завершится.
 
-        try:
-            hand = win32evtlog.OpenEventLog(server, log_type)
-            write_log(f"Открыт журнал событий Windows: {log_type} на сервере {server}")
-        except Exception as e:
-            err = f"Ошибка открытия журнала событий: {e}"
-            self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] {err}")
-            write_log(err)
+        Следующий запуск мониторинга получает новый пул, чтобы отложенное закрытие не задело его хендлы.
+        """
+        if self.host_monitor is None:
+            self.handle_pool.close_all()
             return
+        self.host_monitor.stop(on_idle=self.handle_pool.close_all)
+        self.host_monitor = None
+        self.handle_pool = EventLogHandlePool()
 
-        count = 0
-        found_event_ids = set()
-        sample_events_info = []
-
-        try:
-            events = win32evtlog.ReadEventLog(hand, flags, 0)
-        except Exception as e:
-            err = f"Ошибка чтения журнала событий: {e}"
-            self.log_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] {err}")
-            write_log(err)
+    def check_whea_events(self):
+        """Тик таймера: запрос прохода чтения в фоновом потоке (для подписки таймер не запускается)."""
+        if self.scan_worker is not None:
+            self.scan_worker.request_poll()
+        if self.scheduler is not None:
+            self.timer.start(int(self.scheduler.next_delay() * 1000))
+        if self.host_monitor is not None:
+            self.host_monitor.tick()
+
+    def on_polled(self, duration):
+        """Итог прохода чтения (в фоновом потоке): планировщик выбирает следующий интервал."""
+        scheduler = self.scheduler
+        if scheduler is None:
             return
+        tick = self.scan_stats.tick
+        decision = scheduler.on_poll(duration, tick["records_scanned"], tick["budget_exhausted"] > 0)
+        if decision is not None:
+            self.poll_schedule_changed.emit(decision)
+
+    def on_poll_schedule_changed(self, decision):
+        text = format_decision(decision)
+        write_log(text)
+        self.log_ui(text)
+        self.show_poll_interval(decision.interval, decision.reason)
+        # Сжатие интервала действует сразу, не дожидаясь конца уже заведённой длинной паузы
+        if self.scheduler is not None and self.timer.remainingTime() > decision.interval * 1000:
+            self.timer.start(int(self.scheduler.next_delay() * 1000))
+
+    def show_poll_interval(self, interval, reason):
+        self.poll_label.setText(f"Опрос: {interval:.0f} с")
+        self.poll_label.setToolTip(reason)
+
+    def on_source_error(self, err):
+        self.log_ui(err, ERROR)
+        self.publish("error", {"time": datetime.now().isoformat(timespec="seconds"), "text": err})
+
+    def publish(self, kind, payload):
+        """Сообщение подписчикам потока событий и на центральный сборщик."""
+        if self.ipc is not None:
+            self.ipc.publish(kind, payload)
+        if self.reporter is not None:
+            self.reporter.submit(kind, payload)
+
+    def current_state(self):
+        """Ответ на запрос state потока событий. Вызывается из потока клиента — только чтение."""
+        source = self.event_source
+        host_monitor = self.host_monitor
+        return {
+            "pid": os.getpid(),
+            "running": source is not None or host_monitor is not None,
+            "source": source.name if source is not None else ("hosts" if host_monitor is not None else None),
+            "started": self.monitor_start_time.isoformat(timespec="seconds"),
+            "total": self.detector.total_count,
+            "event_ids": sorted(self.detector.found_event_ids),
+            "hosts": host_monitor.snapshot() if host_monitor is not None else [],
+            "rates": self.rate_detector.snapshot(),
+            "dedup": self.dedup.stats() if self.dedup is not None else None,
+            "triggers": self.trigger_executor.stats() if self.trigger_executor is not None else None,
+            "report": self.reporter.snapshot() if self.reporter is not None else None,
+            "poll": self.scheduler.snapshot() if self.scheduler is not None else None,
+        }
 
-        if not events:
-            write_log("Журнал событий пуст")
+    def process_events(self, events):
+        """Общий путь обнаружения для всех источников. Вызывается в фоновом потоке."""
+        detection = self.detector.process(events)
+        if detection is not None:
+            scheduler = self.scheduler
+            if scheduler is not None:
+                scheduler.on_detection()
+            self.on_host_detection(detection)
+
+    def on_host_detection(self, detection):
+        """Обнаружение на любом хосте: пороги частоты, дедупликация, история и передача в GUI-поток.
+
+        Вызывается в фоновом потоке. Пороги частоты считают все события, а журнал,
+        история и триггер получают только изменения отпечатков (whea_dedup).
+        """
+        for alert in self.rate_detector.update(detection.events, detection.host):
+            self.publish("rate_alert", alert.to_dict())
+            self.rate_alert_found.emit(alert)
+        if self.dedup is not None:
+            detection = self.dedup.process(detection)
+            if detection is None:
+                return
+        self.report_detection(detection)
+
+    def report_detection(self, detection):
+        if self.history is not None:
+            self.history.add(detection.events, host=detection.host)
+        self.publish("detection", detection.to_dict())
+        self.detection_found.emit(detection)
+
+    def sweep_dedup(self):
+        """Тик таймера: сводки повторов, у которых прошёл dedup_report_interval."""
+        for detection in self.dedup.sweep():
+            self.report_detection(detection)
+
+    def flush_dedup(self):
+        """Отправить накопленные повторы при остановке мониторинга."""
+        if self.dedup is None:
             return
+        for detection in self.dedup.flush():
+            self.report_detection(detection)
 
-        for ev in events[:5]:
-            sample_events_info.append(event_to_dict(ev))
-
-        for event in events:
-            try:
-                event_time = datetime.fromtimestamp(pywintypes.Time(event.TimeGenerated).timestamp())
-            except Exception:
-                continue
-            if event_time < self.monitor_start_time:
-                continue
-            event_id = event.EventID & 0xFFFF
-            if event_id not in self.WHEA_EVENT_IDS:
-                continue
-            count += 1
-            found_event_ids.add(event_id)
-
-        write_log(f"Структура первых прочитанных событий (макс 5): {json.dumps(sample_events_info, ensure_ascii=False, indent=2)}")
-        write_log(f"Всего найдено ошибок/предупреждений WHEA: {count}, Коды ошибок: {sorted(found_event_ids)}")
-
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        if count > 0 and count != self.last_error_count:
-            codes_str = ', '.join(str(eid) for eid in sorted(found_event_ids))
-            msg = f"[{timestamp}] Найдена ошибка WHEA ({count}). Коды ошибок: {codes_str}"
-            self.log_output.append(msg)
-            write_log(msg)
-            write_error_log(msg)
-
-            cfg = self.trigger_config
-            write_log(f"Текущая конфигурация триггера: {json.dumps(cfg, ensure_ascii=False)}")
-            message_enabled = cfg.get("message_enabled", False)
-            message_mode = cfg.get("message_mode", "notify")
-
-            print(f"Триггер сообщений включен: {message_enabled}")
-            print(f"Текущий режим уведомлений: {message_mode}")
-
-            if message_enabled:
-                if message_mode == "notify":
-                    notification_msg = f"Найдена ошибка WHEA! Коды ошибок {codes_str}"
-                    write_log(f"Отправляем уведомление через Windows: {notification_msg}")
-                    Win_Message(self, 1, notification_msg)
-                    write_log(f"Отправлено сообщение Windows: {notification_msg}")
-                elif message_mode == "message":
-                    notification_msg = "Найдена ошибка WHEA"
-                    write_log(f"Отправляем сообщение через ShowMessage: {notification_msg}")
-                    show_messagebox(notification_msg)
-                    write_log(f"Отправлено сообщение через ShowMessage: {notification_msg}")
-                else:
-                    print("Неверный режим уведомления.")
-            else:
-                print("Сообщения отключены.")
-
-            # Новый блок: запуск внешнего приложения, если включено
-            if cfg.get("execute_enabled"):
-                exe_path = cfg.get("execute_path", "").strip()
-                exe_args = cfg.get("execute_args", "").strip()
-                if exe_path:
-                    try:
-                        full_cmd = [exe_path] + exe_args.split()
-                        subprocess.Popen(full_cmd)
-                        write_log(f"Запущено приложение: {exe_path} с аргументами: {exe_args}")
-                    except Exception as e:
-                        write_log(f"Ошибка запуска приложения: {e}")
-                else:
-                    write_log("Не указан путь к приложению для запуска.")
-
-            self.last_error_count = count
-
-        elif count == 0 and self.last_error_count != 0:
-            self.last_error_count = 0
-            write_log(f"[{timestamp}] Ошибок WHEA не найдено, счетчик ошибок сброшен.")
-
+    def handle_detection(self, detection):
+        msg = log_detection(detection)
+        self.log_model.append(msg, detection_level(detection.events), {ev.event_id for ev in detection.events})
+        # Без правил частоты триггер срабатывает на любое новое событие, как раньше; сводки повторов — только в журнал
+        if not self.rate_detector.rules and not detection.summary:
+            self.trigger_executor.submit(detection)
 
+    def handle_rate_alert(self, alert):
+        self.log_model.append(log_rate_alert(alert), WARNING, alert.event_ids)
+        self.trigger_executor.submit(alert)
 
     def handle_trigger(self):
         """Обрабатываем триггер в зависимости от конфигурации.""" 
@@ -555,119 +625,37 @@ class WheaMonitorApp(QWidget):
                 self.show_messagebox(msg)  # Показываем кастомное сообщение
                 write_log(f"Отправлено сообщение через ShowMessage: {msg}")
     
+    def check_config_file(self):
+        cfg = self.config_watcher.poll()
+        if cfg is None:
+            return
+        config = form_config(cfg)
+        if config == self.trigger_config:
+            return  # Файл записан самим окном настройки — конфигурация уже применена
+        self.log_ui("Конфигурация перечитана из файла")
+        write_log("Конфигурация перечитана из файла после изменения")
+        self.update_trigger_config(config)
+
     def update_trigger_config(self, config):
         """Обновление конфигурации триггера."""
         self.trigger_config = config
+        set_log_level(config.get("log_level", "info"))
+        configure_logs(config)
+        if hasattr(self, "log_model"):
+            self.log_model.set_capacity(config.get("log_view_capacity", LOG_VIEW_CAPACITY))
+        rules = load_rules(config)
+        if [r.to_dict() for r in rules] != [r.to_dict() for r in self.rate_detector.rules]:
+            self.rate_detector.set_rules(rules)
+        if self.dedup is not None:
+            self.dedup.configure(config.get("dedup_max_entries", DEDUP_MAX_ENTRIES),
+                                 config.get("dedup_report_interval", DEDUP_REPORT_INTERVAL))
+        if self.trigger_executor is not None:
+            self.trigger_executor.update_config(config)
         write_log(f"Обновлена конфигурация триггера: {json.dumps(config, ensure_ascii=False)}")
 
     def run_whea_tools(self):
-        bat_code = r"""@echo off
-chcp 65001 >nul
-
-:: Проверка прав администратора
->nul 2>&1 "%SYSTEMROOT%\system32\cacls.exe" "%SYSTEMROOT%\system32\config\system"
-if '%errorlevel%' NEQ '0' (
-    echo Admin rights required. Restarting as admin...
-    powershell -Command "Start-Process -Verb runAs -FilePath '%~f0'"
-    exit /b
-)
-
-:main_loop
-cls
-echo ┌─────┐ ┌─────┐ ┌─────┐  ┌───────────────────────────────────────────────────┐
-echo │ ┌───┘ │ ┌─┐ │ │ ┌───┘  │ Forgotten Private Coalition                       │
-echo │ └───┐ │ └─┘ │ │ │      │ WHEA Trigger Tools                                │
-echo │ ┌───┘ │ ┌───┘ │ │      -│ Private version                                   │
-echo │ │     │ │     │ └───┐  │ License CC BY 4.0                                 │
-echo └─┘     └─┘     └─────┘  └───────────────────────────────────────────────────┘
-echo.
-echo Available WHEA EventIDs and meanings:
-echo  17 - General hardware error event
-echo  18 - Machine Check Exception (MCE)
-echo  19 - Corrected Machine Check error
-echo  20 - PCI Express error
-echo  41 - Detailed WHEA error report
-echo  45 - Corrected memory error
-echo  46 - Corrected processor error
-echo  47 - Corrected PCI Express error
-echo.
-echo Commands:
-echo  ex - Exit program
-echo  el - Open Windows Event Viewer / System log
-echo  ec - Clear all errors from TestWHEA source
-echo.
-
-if defined last_message (
-    echo %last_message%
-    echo.
-    set "last_message="
-)
-
-set /p input=Enter "EventID Level" (Level: 1=Warning, 2=Error) or command (ex, el, ec): 
-
-:: Command checks
-if /i "%input%"=="ex" (
-    exit /b
-)
-if /i "%input%"=="el" (
-    start eventvwr.msc /s:"System"
-    set last_message=Windows System event log opened.
-    goto main_loop
-)
-if /i "%input%"=="ec" (
-    echo Clearing all errors from TestWHEA source...
-    wevtutil.exe cl System
-    set last_message=System log cleared.
-    goto main_loop
-)
-
-:: Process EventID and Level
-for /f "tokens=1,2" %%a in ("%input%") do (
-    set "code=%%a"
-    set "level=%%b"
-)
-
-if not defined code (
-    set last_message=Invalid input. Try again.
-    goto main_loop
-)
-if not defined level (
-    set last_message=Invalid input. Try again.
-    goto main_loop
-)
-
-set executed=0
-
-for %%E in (17 18 19 20 41 45 46 47) do (
-    if "%code%"=="%%E" (
-        if "%level%"=="1" (
-            eventcreate /T WARNING /ID %%E /L SYSTEM /SO TestWHEA /D "Test warning WHEA (EventID %%E)"
-            set executed=1
-        ) else if "%level%"=="2" (
-            eventcreate /T ERROR /ID %%E /L SYSTEM /SO TestWHEA /D "Test error WHEA (EventID %%E)"
-            set executed=1
-        )
-    )
-)
-
-if "%executed%"=="1" (
-    set last_message=Operation successful.
-    goto main_loop
-) else (
-    set last_message=Invalid input or unsupported EventID/Level. Try again.
-    goto main_loop
-)
-"""
-        try:
-            with tempfile.NamedTemporaryFile("w", delete=False, suffix=".bat", encoding="utf-8") as tmpfile:
-                tmpfile.write(bat_code)
-                tmp_path = tmpfile.name
-            subprocess.Popen(
-                ["cmd.exe", "/c", tmp_path],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-        except Exception as e:
-            write_log(f"Error launching WHEA Tools: {e}")
+        from whea_tools import launch_tools
+        launch_tools()
 
     def show_system_notification(self, title: str, message: str):
         """Показываем системное уведомление (push)"""
@@ -687,6 +675,7 @@ if "%executed%"=="1" (
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    window = WheaMonitorApp()
+    # --startup-report: напечатать время запуска одной строкой JSON и выйти (whea_bench.py startup)
+    window = WheaMonitorApp(startup_report='--startup-report' in sys.argv[1:])
 
     sys.exit(app.exec())
@@ -1,3 +1,16 @@
-python -m PyInstaller --windowed --icon=icon.ico --version-file=version.txt whea.py
+@echo off
+chcp 65001 >nul
+
+:: По умолчанию сборка каталогом (onedir): exe стартует сразу, без распаковки всех модулей
+:: во временную папку при каждом запуске, как у onefile. "compile.bat onefile" — один exe.
+:: UPX не используется: сжатые DLL распаковываются при каждой загрузке и замедляют запуск.
+set MODE=--onedir
+if /i "%~1"=="onefile" set MODE=--onefile
+
+python -m PyInstaller %MODE% --windowed --noconfirm --noupx ^
+    --icon=icon.ico --version-file=version.txt --add-data "icon.ico;." ^
+    --exclude-module tkinter --exclude-module unittest --exclude-module pydoc --exclude-module doctest ^
+    --exclude-module PyQt6.QtNetwork --exclude-module PyQt6.QtQml --exclude-module PyQt6.QtQuick ^
+    whea.py
 
 pause
@@ -0,0 +1,438 @@
+"""Офлайн-анализ выгруженных журналов: отбор WHEA-событий в файлах XML, CSV и JSON.
+
+    python whea_analyze.py dump1.xml dump2.csv dump3.ndjson [--workers 4] [--json]
+    python WHEA.py analyze [те же параметры]
+
+Файлы читаются потоково с постоянной памятью: XML — инкрементальным парсером
+(выгрузка wevtutil qe /f:xml без корневого элемента и «Сохранить как XML» из
+просмотра событий), CSV — построчно (просмотр событий, Export-Csv из PowerShell),
+JSON — построчно (NDJSON, в том числе вывод whea_headless.py --json) или потоковым
+разбором массива (ConvertTo-Json). Несколько файлов обрабатываются параллельно в
+пуле процессов; итог — количество WHEA-событий по хостам, кодам и часам.
+
+Событие отбирается тем же EventMatcher, что и при мониторинге: по паре (поставщик, код)
+из WHEA_PROVIDERS или ключа event_providers конфигурации. Если в выгрузке нет поставщика
+(например, CSV без столбца Source), остаётся проверка только по коду.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from whea_core import DEFAULT_MATCHER, load_config, matcher_from_config
+from whea_sources import parse_system_time
+
+
+CHUNK_SIZE = 1024 * 1024
+FORMATS = ("auto", "xml", "csv", "ndjson", "json")
+
+# Заголовки столбцов CSV: просмотр событий (англ./рус.) и Export-Csv из PowerShell
+CSV_ID_COLUMNS = ("event id", "eventid", "id", "код события")
+CSV_TIME_COLUMNS = ("date and time", "timecreated", "timegenerated", "time", "дата и время")
+CSV_HOST_COLUMNS = ("machinename", "computer", "computername", "компьютер")
+CSV_SOURCE_COLUMNS = ("source", "providername", "provider", "источник")
+CSV_TIME_FORMATS = ("%m/%d/%Y %I:%M:%S %p", "%d.%m.%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M:%S")
+
+JSON_ID_KEYS = ("event_id", "EventID", "Id", "id")
+JSON_TIME_KEYS = ("timestamp", "TimeCreated", "TimeGenerated", "time")
+JSON_HOST_KEYS = ("host", "MachineName", "Computer", "ComputerName")
+JSON_SOURCE_KEYS = ("source", "ProviderName", "Source", "SourceName")
+
+MS_DATE = re.compile(r"/Date\((-?\d+)")
+
+
+class Summary:
+    """Итог по одному или нескольким файлам: счётчики по хостам, кодам и часам."""
+
+    def __init__(self, matcher=DEFAULT_MATCHER):
+        self.matcher = matcher
+        self.records = 0
+        self.matched = 0
+        self.errors = 0
+        self.bytes = 0
+        self.files = 0
+        self.by_host = Counter()
+        self.by_id = Counter()
+        self.by_hour = Counter()  # начало часа (epoch) или None, если время неизвестно
+        self.first = None
+        self.last = None
+
+    def is_whea(self, event_id, source):
+        """Правило мониторинга (EventMatcher); без поставщика в выгрузке — только по коду."""
+        if source is None:
+            return (event_id & 0xFFFF) in self.matcher.event_ids
+        return self.matcher.matches_source(source, event_id)
+
+    def add(self, event_id, timestamp, host, source=None):
+        """Учесть одну запись журнала; WHEA-события попадают в счётчики."""
+        self.records += 1
+        if not self.is_whea(event_id, source):
+            return
+        self.matched += 1
+        self.by_id[event_id] += 1
+        self.by_host[host or "unknown"] += 1
+        if timestamp is None:
+            self.by_hour[None] += 1
+            return
+        self.by_hour[int(timestamp) - int(timestamp) % 3600] += 1
+        if self.first is None or timestamp < self.first:
+            self.first = timestamp
+        if self.last is None or timestamp > self.last:
+            self.last = timestamp
+
+    def merge(self, other):
+        for name in ("records", "matched", "errors", "bytes", "files"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.by_host.update(other.by_host)
+        self.by_id.update(other.by_id)
+        self.by_hour.update(other.by_hour)
+        for t in (other.first, other.last):
+            if t is not None:
+                self.first = t if self.first is None else min(self.first, t)
+                self.last = t if self.last is None else max(self.last, t)
+
+    def to_dict(self):
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "records": self.records,
+            "matched": self.matched,
+            "errors": self.errors,
+            "first": format_time(self.first),
+            "last": format_time(self.last),
+            "by_host": dict(self.by_host.most_common()),
+            "by_id": {str(k): v for k, v in sorted(self.by_id.items())},
+            "by_hour": {format_hour(k): v for k, v in sorted(self.by_hour.items(), key=lambda kv: (kv[0] is None, kv[0] or 0))},
+        }
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp is not None else None
+
+
+def format_hour(hour):
+    return datetime.fromtimestamp(hour).strftime('%Y-%m-%d %H:00') if hour is not None else "unknown"
+
+
+def to_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xml":
+        return "xml"
+    if ext == ".csv":
+        return "csv"
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        head = f.read(4096).lstrip()
+    if head.startswith("<"):
+        return "xml"
+    if head.startswith("["):
+        return "json"
+    if head.startswith("{"):
+        return "ndjson"
+    return "csv"
+
+
+# --- XML ---
+
+def scan_xml(path, summary):
+    """Инкрементальный разбор: каждое <Event> разбирается и сразу удаляется из дерева."""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    # Обёртка-корень: выгрузка wevtutil — это последовательность <Event> без общего корня
+    parser.feed("<WheadExport>")
+    stack = []
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        first = True
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if first:
+                first = False
+                if chunk.lstrip().startswith("<?xml"):
+                    chunk = chunk[chunk.index("?>") + 2:]
+            parser.feed(chunk)
+            drain_xml(parser, stack, summary)
+    parser.feed("</WheadExport>")
+    drain_xml(parser, stack, summary)
+
+
+def drain_xml(parser, stack, summary):
+    for event, elem in parser.read_events():
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        tag = elem.tag
+        if tag != "Event" and not tag.endswith("}Event"):
+            continue
+        add_xml_event(elem, summary)
+        if stack:
+            stack[-1].remove(elem)
+
+
+def add_xml_event(elem, summary):
+    ns = elem.tag[:elem.tag.index("}") + 1] if elem.tag.startswith("{") else ""
+    system = elem.find(f"{ns}System")
+    if system is None:
+        summary.errors += 1
+        return
+    event_id = to_int(system.findtext(f"{ns}EventID"))
+    if event_id is None:
+        summary.errors += 1
+        return
+    provider = system.find(f"{ns}Provider")
+    source = provider.get("Name", "") if provider is not None else None
+    timestamp = None
+    if summary.is_whea(event_id, source):
+        time_created = system.find(f"{ns}TimeCreated")
+        if time_created is not None and time_created.get("SystemTime"):
+            try:
+                timestamp = parse_system_time(time_created.get("SystemTime")).timestamp()
+            except ValueError:
+                pass
+    summary.add(event_id, timestamp, system.findtext(f"{ns}Computer"), source)
+
+
+# --- CSV ---
+
+def find_column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def parse_time_text(value):
+    """Время из текстового поля выгрузки: ISO, /Date(ms)/, число epoch или формат просмотра событий."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 10 ** 11 else float(value)
+    value = str(value).strip()
+    m = MS_DATE.search(value)
+    if m:
+        return int(m.group(1)) / 1000
+    try:
+        t = datetime.fromisoformat(value.replace("Z", "+00:00")[:32])
+        return t.timestamp()
+    except ValueError:
+        pass
+    if "T" in value:
+        try:
+            return parse_system_time(value).timestamp()
+        except ValueError:
+            pass
+    for fmt in CSV_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def scan_csv(path, summary):
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        id_col = find_column(header, CSV_ID_COLUMNS)
+        if id_col is None:
+            raise ValueError(f"в {path} нет столбца с кодом события ({', '.join(CSV_ID_COLUMNS)})")
+        id_index = header.index(id_col)
+        time_col = find_column(header, CSV_TIME_COLUMNS)
+        host_col = find_column(header, CSV_HOST_COLUMNS)
+        source_col = find_column(header, CSV_SOURCE_COLUMNS)
+        time_index = header.index(time_col) if time_col else None
+        host_index = header.index(host_col) if host_col else None
+        source_index = header.index(source_col) if source_col else None
+        default_host = os.path.splitext(os.path.basename(path))[0]
+        for row in reader:
+            if len(row) <= id_index:
+                summary.errors += 1
+                continue
+            event_id = to_int(row[id_index])
+            if event_id is None:
+                summary.errors += 1
+                continue
+            source = row[source_index].strip() if source_index is not None and source_index < len(row) else None
+            if not summary.is_whea(event_id, source):
+                summary.records += 1
+                continue
+            timestamp = parse_time_text(row[time_index]) if time_index is not None and time_index < len(row) else None
+            host = row[host_index] if host_index is not None and host_index < len(row) else default_host
+            summary.add(event_id, timestamp, host, source)
+
+
+# --- JSON ---
+
+def first_key(obj, keys):
+    for key in keys:
+        if key in obj:
+            return obj[key]
+    return None
+
+
+def add_json_object(obj, summary, default_host):
+    if not isinstance(obj, dict):
+        summary.errors += 1
+        return
+    if isinstance(obj.get("events"), list):
+        # Обнаружение из whea_headless.py --json: события и хост внутри
+        host = obj.get("host", default_host)
+        for ev in obj["events"]:
+            if isinstance(ev, dict):
+                add_json_object({**ev, "host": host}, summary, default_host)
+        return
+    event_id = to_int(first_key(obj, JSON_ID_KEYS))
+    if event_id is None:
+        summary.errors += 1
+        return
+    source = first_key(obj, JSON_SOURCE_KEYS)
+    source = str(source) if source is not None else None
+    timestamp = parse_time_text(first_key(obj, JSON_TIME_KEYS)) if summary.is_whea(event_id, source) else None
+    summary.add(event_id, timestamp, first_key(obj, JSON_HOST_KEYS) or default_host, source)
+
+
+def scan_ndjson(path, summary):
+    default_host = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                summary.errors += 1
+                continue
+            add_json_object(obj, summary, default_host)
+
+
+def scan_json_array(path, summary):
+    """Потоковый разбор массива JSON: объекты декодируются по одному из буфера."""
+    default_host = os.path.splitext(os.path.basename(path))[0]
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        eof = False
+        while True:
+            # Пропускаем разделители между элементами массива
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError(f"{path}: ожидался массив JSON")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    if buffer[pos:].strip():
+                        summary.errors += 1
+                    return
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            add_json_object(obj, summary, default_host)
+            pos = end
+
+
+SCANNERS = {"xml": scan_xml, "csv": scan_csv, "ndjson": scan_ndjson, "json": scan_json_array}
+
+
+def analyze_file(path, fmt="auto", matcher=DEFAULT_MATCHER):
+    """Разбор одного файла (выполняется в процессе пула). Возвращает (Summary, ошибка или None)."""
+    summary = Summary(matcher)
+    summary.files = 1
+    try:
+        summary.bytes = os.path.getsize(path)
+        kind = detect_format(path) if fmt == "auto" else fmt
+        SCANNERS[kind](path, summary)
+    except Exception as e:
+        return summary, f"{path}: {e}"
+    return summary, None
+
+
+def analyze_files(paths, fmt="auto", workers=None, matcher=DEFAULT_MATCHER):
+    """Разбор файлов в пуле процессов (один файл — в текущем процессе). Возвращает (Summary, [ошибки])."""
+    total = Summary(matcher)
+    failures = []
+    if len(paths) == 1 or workers == 1:
+        results = (analyze_file(path, fmt, matcher) for path in paths)
+        for summary, error in results:
+            total.merge(summary)
+            if error:
+                failures.append(error)
+        return total, failures
+    with ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1)) as pool:
+        for summary, error in pool.map(analyze_file, paths, [fmt] * len(paths), [matcher] * len(paths)):
+            total.merge(summary)
+            if error:
+                failures.append(error)
+    return total, failures
+
+
+def print_summary(summary, elapsed):
+    mb = summary.bytes / (1024 * 1024)
+    print(f"Файлов: {summary.files}, {mb:.1f} МБ, записей: {summary.records}, WHEA: {summary.matched}, "
+          f"ошибок разбора: {summary.errors}, {elapsed:.1f} с ({mb / elapsed if elapsed else 0:.1f} МБ/с)")
+    if not summary.matched:
+        print("WHEA-событий не найдено")
+        return
+    print(f"Период: {format_time(summary.first)} — {format_time(summary.last)}")
+    print("По хостам:")
+    for host, count in summary.by_host.most_common():
+        print(f"  {host}: {count}")
+    print("По кодам:")
+    for event_id, count in sorted(summary.by_id.items()):
+        print(f"  {event_id}: {count}")
+    print("По часам:")
+    for hour, count in sorted(summary.by_hour.items(), key=lambda kv: (kv[0] is None, kv[0] or 0)):
+        print(f"  {format_hour(hour)}  {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-анализ выгруженных журналов на WHEA-события")
+    parser.add_argument("files", nargs="+", help="Файлы выгрузки XML, CSV, NDJSON или массив JSON")
+    parser.add_argument("--format", choices=FORMATS, default="auto", help="Формат (по умолчанию по расширению и содержимому)")
+    parser.add_argument("--workers", type=int, help="Процессов для параллельного разбора файлов")
+    parser.add_argument("--json", action="store_true", help="Итог в JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    summary, failures = analyze_files(args.files, args.format, args.workers, matcher_from_config(load_config()))
+    elapsed = time.perf_counter() - started
+    for text in failures:
+        print(f"Ошибка: {text}", file=sys.stderr)
+    if args.json:
+        print(json.dumps({**summary.to_dict(), "elapsed": round(elapsed, 2), "failures": failures}, ensure_ascii=False))
+    else:
+        print_summary(summary, elapsed)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
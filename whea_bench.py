@@ -0,0 +1,582 @@
+"""Бенчмарки WHEAD, которые запускаются без Windows API.
+
+    python whea_bench.py event-record [--count N] [--repeat R]
+    python whea_bench.py hosts [--hosts 300] [--workers 16] [--duration 10]
+    python whea_bench.py scan [--records 1000000] [--density 0.001] [--shape uniform|periodic|storm] [--json]
+    python whea_bench.py cper [--count 100000] [--dump fixtures.bin]
+    python whea_bench.py startup [--runs 5] [--importtime] [--json]
+
+scan прогоняет синтетический журнал через тот же путь, что и тик check_whea_events:
+PollingEventSource (пул хендлов, курсор, drain_backwards на первом тике и read_new_events
+дальше) читает SyntheticEventLog вместо журнала Windows -> WheaDetector -> пороги частоты ->
+дедупликация -> история (--history). Записи генерируются лениво, а журнал кольцевой
+(--log-capacity), поэтому миллионы записей не требуют памяти под весь журнал.
+
+startup запускает WHEA.py --startup-report в отдельных процессах (нужны PyQt6 и рабочий
+стол; запущенный WHEAD нужно закрыть) и сравнивает медиану с бюджетом STARTUP_BUDGET_MS.
+Код возврата 1 — бюджет превышен.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from whea_core import (
+    WHEA_EVENT_IDS, MAX_RECORDS_PER_TICK, DEFAULT_MATCHER, WheaEvent, EventRecord, WheaDetector, EventLogCursor, ScanStats,
+)
+from whea_hosts import MultiHostMonitor
+from whea_sources import PollingEventSource, timed_poll
+import whea_core
+import whea_sources
+import whea_cper
+
+
+class SyntheticRecord:
+    """Объект с тем же набором атрибутов, что у PyEventLogRecord из pywin32."""
+
+    def __init__(self, record_number, event_id, time_generated, source_name="Microsoft-Windows-WHEA-Logger"):
+        self.Reserved = 0
+        self.RecordNumber = record_number
+        self.TimeGenerated = time_generated
+        self.TimeWritten = time_generated
+        self.EventID = event_id
+        self.EventType = 2
+        self.EventCategory = 0
+        self.ReservedFlags = 0
+        self.ClosingRecordNumber = 0
+        self.SourceName = source_name
+        self.StringInserts = ("0", "1", "2", "3")
+        self.Sid = None
+        self.Data = b"\x00" * 64
+        self.ComputerName = "BENCH-PC"
+
+
+def legacy_event_to_dict(event):
+    """Прежнее преобразование event_to_dict: обход dir() и getattr по каждому атрибуту."""
+    d = {}
+    for attr in dir(event):
+        if attr.startswith('_'):
+            continue
+        try:
+            val = getattr(event, attr)
+            if callable(val):
+                continue
+            if isinstance(val, datetime):
+                val = str(val)
+            d[attr] = val
+        except Exception:
+            continue
+    return d
+
+
+def make_records(count, event_id=19):
+    now = datetime.now(timezone.utc)
+    return [SyntheticRecord(i + 1, event_id, now) for i in range(count)]
+
+
+def bench_event_record(args):
+    records = make_records(args.count)
+    cases = [
+        ("legacy event_to_dict", lambda: [legacy_event_to_dict(ev) for ev in records]),
+        ("WheaEvent.from_record", lambda: [WheaEvent.from_record(ev) for ev in records]),
+        ("WheaEvent + to_dict", lambda: [WheaEvent.from_record(ev).to_dict() for ev in records]),
+    ]
+    print(f"Преобразование {args.count} записей, лучшее из {args.repeat} повторов:")
+    baseline = None
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        per_record = best / args.count * 1e6
+        baseline = baseline or best
+        print(f"  {name:<24} {best * 1000:9.2f} мс  {per_record:7.3f} мкс/запись  x{baseline / best:.1f}")
+
+
+class FakeHostBackend:
+    """Поддельные хосты для MultiHostMonitor: fetch(host) с задержкой, сбоями и «зависаниями».
+
+    Каждый вызов возвращает events_per_poll записей, из них доля whea_ratio — WHEA-события.
+    Хосты из failing всегда падают с ошибкой, из hanging — отвечают через hang_seconds.
+    """
+
+    def __init__(self, events_per_poll=20, whea_ratio=0.05, latency=0.01, failing=(), hanging=(), hang_seconds=30.0):
+        self.events_per_poll = events_per_poll
+        self.whea_ratio = whea_ratio
+        self.latency = latency
+        self.failing = set(failing)
+        self.hanging = set(hanging)
+        self.hang_seconds = hang_seconds
+        self.lock = threading.Lock()
+        self.next_record = {}
+        self.calls = 0
+
+    def __call__(self, host):
+        with self.lock:
+            self.calls += 1
+            first = self.next_record.get(host, 1)
+            self.next_record[host] = first + self.events_per_poll
+        if host in self.hanging:
+            time.sleep(self.hang_seconds)
+        time.sleep(random.uniform(0, 2 * self.latency))
+        if host in self.failing:
+            raise ConnectionError("RPC-сервер недоступен")
+        now = datetime.now(timezone.utc)
+        return [
+            EventRecord(first + i, 19, now, "Microsoft-Windows-WHEA-Logger") if random.random() < self.whea_ratio
+            else EventRecord(first + i, 7036, now, "Service Control Manager")
+            for i in range(self.events_per_poll)
+        ]
+
+
+def bench_hosts(args):
+    hosts = [f"host{i:04d}" for i in range(args.hosts)]
+    failing = hosts[:args.failing]
+    hanging = hosts[args.failing:args.failing + args.hanging]
+    backend = FakeHostBackend(args.events, args.whea_ratio, args.latency, failing, hanging, args.duration * 2)
+    detections = []
+    monitor = MultiHostMonitor(hosts, backend, detections.append, interval=args.interval,
+                               max_workers=args.workers, timeout=args.timeout)
+    monitor.start()
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        monitor.tick()
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    snapshot = monitor.snapshot()
+    monitor.stop()
+
+    healthy = [s for s in snapshot if s["host"] not in failing and s["host"] not in hanging]
+    polls = sum(s["polls"] for s in healthy)
+    durations = sorted(s["last_duration"] for s in healthy if s["last_duration"] is not None)
+    expected = len(healthy) * max(1, int(elapsed / args.interval))
+    print(f"Хостов: {args.hosts} (сбойных {len(failing)}, зависших {len(hanging)}), потоков: {args.workers}, {elapsed:.1f} с")
+    print(f"  опросов исправных хостов: {polls} (ожидалось ~{expected}), {polls / elapsed:.0f} опросов/с")
+    if durations:
+        print(f"  длительность опроса p50/p99: {durations[len(durations) // 2] * 1000:.1f} / "
+              f"{durations[int(len(durations) * 0.99)] * 1000:.1f} мс")
+    print(f"  обнаружений: {len(detections)}, записей: {sum(s['events'] for s in snapshot)}")
+    print(f"  ошибок у сбойных хостов: {sum(s['failures'] for s in snapshot if s['host'] in failing)}")
+
+
+# Частые коды журнала System, которые не относятся к WHEA (служба, Kernel-General, DNS и т.п.)
+NOISE_EVENT_IDS = (7036, 7040, 10016, 16, 1014, 6013, 7045, 1074)
+BURST_SHAPES = ("uniform", "periodic", "storm")
+
+
+def synthetic_event_stream(total, density=0.001, shape="uniform", burst_len=500, burst_every=20000,
+                           burst_density=0.5, rate=200.0, seed=1, start_time=None):
+    """Ленивый генератор total записей журнала System в форме PyEventLogRecord.
+
+    density — доля WHEA-событий вне всплесков. Форма всплесков shape:
+    uniform — всплесков нет; periodic — каждые burst_every записей burst_len записей с
+    долей burst_density; storm — один такой всплеск посередине журнала.
+    rate — записей в секунду по времени TimeGenerated.
+    """
+    rng = random.Random(seed)
+    whea_ids = sorted(WHEA_EVENT_IDS)
+    start = start_time if start_time is not None else time.time() - total / rate
+    storm_start = total // 2
+    for i in range(total):
+        if shape == "periodic" and i % burst_every < burst_len:
+            p = burst_density
+        elif shape == "storm" and storm_start <= i < storm_start + burst_len:
+            p = burst_density
+        else:
+            p = density
+        if rng.random() < p:
+            event_id = rng.choice(whea_ids)
+            source, event_type = DEFAULT_MATCHER.provider_for(event_id), 2
+        else:
+            event_id, source, event_type = NOISE_EVENT_IDS[i % len(NOISE_EVENT_IDS)], "Service Control Manager", 4
+        generated = datetime.fromtimestamp(start + i / rate, timezone.utc)
+        yield EventRecord(i + 1, event_id, generated, source, event_type, 0, "BENCH-PC", ("0", "1"), None)
+
+
+class SyntheticEventLog:
+    """Кольцевой журнал в памяти с теми функциями win32evtlog, которые вызывает чтение журнала.
+
+    append() дописывает записи (генерация не попадает во время прохода); при переполнении
+    capacity вытесняются самые старые, как в заполненном журнале Windows. ReadEventLog
+    отдаёт по batch записей за вызов — как буфер чтения в 64 КБ.
+    """
+
+    EVENTLOG_SEQUENTIAL_READ = 0x1
+    EVENTLOG_SEEK_READ = 0x2
+    EVENTLOG_FORWARDS_READ = 0x4
+    EVENTLOG_BACKWARDS_READ = 0x8
+
+    def __init__(self, capacity, batch=128):
+        self.records = deque(maxlen=capacity)
+        self.batch = batch
+        self.reads = 0
+
+    def append(self, records):
+        self.records.extend(records)
+
+    def OpenEventLog(self, server, log_type):
+        return (server, log_type)
+
+    def CloseEventLog(self, hand):
+        pass
+
+    def GetOldestEventLogRecord(self, hand):
+        return self.records[0].RecordNumber if self.records else 0
+
+    def GetNumberOfEventLogRecords(self, hand):
+        return len(self.records)
+
+    def ReadEventLog(self, hand, flags, offset):
+        self.reads += 1
+        if not self.records:
+            return []
+        index = offset - self.records[0].RecordNumber
+        if not 0 <= index < len(self.records):
+            return []
+        if flags & self.EVENTLOG_BACKWARDS_READ:
+            start = max(0, index - self.batch + 1)
+            return [self.records[i] for i in range(index, start - 1, -1)]
+        return [self.records[i] for i in range(index, min(len(self.records), index + self.batch))]
+
+
+@contextmanager
+def synthetic_event_log(log):
+    """Подменяет win32evtlog в whea_core и whea_sources на время прогона."""
+    saved = whea_core.win32evtlog, whea_sources.win32evtlog
+    whea_core.win32evtlog = whea_sources.win32evtlog = log
+    try:
+        yield log
+    finally:
+        whea_core.win32evtlog, whea_sources.win32evtlog = saved
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def bench_scan(args):
+    from whea_headless import peak_memory_mb
+    from whea_rates import RateDetector, parse_rules_text
+    from whea_dedup import table_from_config
+
+    detector = WheaDetector()
+    rates = RateDetector(parse_rules_text(args.rules)) if args.rules else None
+    dedup = table_from_config({"dedup_enabled": not args.no_dedup})
+    work_dir = tempfile.mkdtemp(prefix="whead-bench-")
+    history = None
+    if args.history:
+        from whea_history import WheaHistory
+        history = WheaHistory(os.path.join(work_dir, "history.sqlite"), retention_days=0)
+    counters = {"detections": 0, "matched": 0, "alerts": 0, "reported": 0}
+
+    def process_events(events):
+        # То же, что WheaMonitorApp.process_events / handle_detection, без GUI
+        detection = detector.process(events)
+        if detection is None:
+            return
+        counters["detections"] += 1
+        counters["matched"] += detection.new_count
+        if rates is not None:
+            counters["alerts"] += len(rates.update(detection.events, detection.host))
+        if dedup is not None:
+            detection = dedup.process(detection)
+            if detection is None:
+                return
+        counters["reported"] += len(detection.events)
+        if history is not None:
+            history.add(detection.events, host=detection.host)
+
+    log = SyntheticEventLog(args.log_capacity)
+    start_time = time.time() - args.records / 200.0
+    stream = synthetic_event_stream(args.records, args.density, args.shape, args.burst_len, args.burst_every,
+                                    args.burst_density, seed=args.seed, start_time=start_time)
+    stats = ScanStats()
+    # Курсора ещё нет: первый тик дочитывает журнал назад до since, дальнейшие — вперёд от курсора
+    source = PollingEventSource(cursor=EventLogCursor(os.path.join(work_dir, "cursor.json")), since=int(start_time),
+                                max_records=args.per_tick, stats=stats)
+    if args.tracemalloc:
+        tracemalloc.start()
+    durations = []
+    busy = 0.0
+    started = time.perf_counter()
+    with synthetic_event_log(log):
+        source.start(process_events)
+        while True:
+            batch = list(itertools.islice(stream, args.per_tick))
+            if not batch:
+                break
+            log.append(batch)
+            tick_started = time.perf_counter()
+            timed_poll(source)
+            elapsed = time.perf_counter() - tick_started
+            durations.append(elapsed)
+            busy += elapsed
+        source.stop()
+        source.handles.close_all()
+    if history is not None:
+        history.close()
+    wall = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    durations.sort()
+    result = {
+        "records": args.records,
+        "per_tick": args.per_tick,
+        "ticks": len(durations),
+        "shape": args.shape,
+        "density": args.density,
+        "records_per_sec": round(args.records / busy) if busy else None,
+        "tick_ms": {
+            "p50": round(percentile(durations, 0.50) * 1000, 3),
+            "p95": round(percentile(durations, 0.95) * 1000, 3),
+            "p99": round(percentile(durations, 0.99) * 1000, 3),
+            "max": round(durations[-1] * 1000, 3) if durations else 0.0,
+        },
+        "wall_sec": round(wall, 2),
+        "records_scanned": stats.total["records_scanned"],
+        "buffers_read": stats.total["buffers_read"],
+        "matched": counters["matched"],
+        "detections": counters["detections"],
+        "reported_after_dedup": counters["reported"] if dedup is not None else None,
+        "rate_alerts": counters["alerts"],
+        "peak_rss_mb": peak_memory_mb(),
+        "traced_peak_mb": traced_peak,
+    }
+    for name in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, name))
+    os.rmdir(work_dir)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    print(f"Записей: {args.records} ({args.shape}, доля WHEA {args.density}), по {args.per_tick} за тик, тиков: {len(durations)}")
+    print(f"  скорость обработки: {result['records_per_sec']} записей/с (общее время {result['wall_sec']} с с генерацией)")
+    print(f"  прочитано записей: {result['records_scanned']}, буферов: {result['buffers_read']}")
+    tick = result["tick_ms"]
+    print(f"  тик p50/p95/p99/max: {tick['p50']} / {tick['p95']} / {tick['p99']} / {tick['max']} мс")
+    print(f"  найдено WHEA: {counters['matched']}, обнаружений: {counters['detections']}, оповещений частоты: {counters['alerts']}")
+    if dedup is not None:
+        print(f"  после дедупликации: {counters['reported']} записей, отпечатков: {len(dedup.entries)}")
+    memory = f"{result['peak_rss_mb']:.1f} МБ" if result["peak_rss_mb"] is not None else "н/д"
+    traced = f", tracemalloc: {traced_peak:.1f} МБ" if traced_peak is not None else ""
+    print(f"  пиковая память процесса: {memory}{traced}")
+
+
+def build_memory_section(address=0x1F2E3000, node=0, card=1, module=3, rank=0, error_type=2):
+    """Секция памяти CPER (80 байт) с адресом, узлом, картой, модулем, рангом и типом ошибки."""
+    validation = (1 << 1) | (1 << 3) | (1 << 4) | (1 << 5) | (1 << 14) | (1 << 15)
+    return whea_cper.MEMORY.pack(validation, 0, address, 0, node, card, module, 0, 0, 0, 0, 0,
+                                 0, 0, 0, error_type, 0, rank, 0, 0)
+
+
+def build_mca_section(processor=2, bank=5, status=0x9C00_0040_0001_0135, address=0x7FF000):
+    """Секция XPF MCA (64 байта): процессор, банк MCA, MCi_STATUS и MCi_ADDR."""
+    return whea_cper.XPF_MCA.pack(2, 1, 0, processor, 0, 0, bank, status, address, 0)
+
+
+def build_pcie_section(segment=0, bus=3, device=0, function=1, vendor=0x8086, device_id=0x1533,
+                       port_type=0, correctable=0x40):
+    """Секция PCIe (208 байт): тип порта, идентификатор устройства и регистры AER."""
+    validation = (1 << 0) | (1 << 3) | (1 << 7)
+    data = bytearray(208)
+    whea_cper.PCIE_HEADER.pack_into(data, 0, validation, port_type, 0, 0, 0, 0)
+    whea_cper.PCIE_DEVICE.pack_into(data, 24, vendor, device_id, b"\x00\x00\x02", function, device,
+                                    segment, bus, 0, 4 << 3)
+    whea_cper.AER.pack_into(data, whea_cper.PCIE_AER_OFFSET, 0, 0, 0, 0, correctable)
+    return bytes(data)
+
+
+def build_cper_record(sections, severity=2, record_id=1):
+    """Двоичная запись CPER из [(GUID типа секции в bytes_le, тело секции)] — фикстура для проверок на Linux."""
+    body_offset = whea_cper.HEADER_SIZE + whea_cper.DESCRIPTOR_SIZE * len(sections)
+    length = body_offset + sum(len(body) for _, body in sections)
+    data = bytearray(length)
+    whea_cper.HEADER.pack_into(data, 0, whea_cper.CPER_SIGNATURE, 0x0101, 0xFFFFFFFF, len(sections),
+                               severity, 1 << 1, length)
+    whea_cper.TIMESTAMP.pack_into(data, 24, 30, 20, 10, 0, 31, 1, 25, 20)
+    struct.pack_into("<Q", data, 96, record_id)
+    offset = body_offset
+    for i, (type_guid, body) in enumerate(sections):
+        whea_cper.DESCRIPTOR.pack_into(data, whea_cper.HEADER_SIZE + i * whea_cper.DESCRIPTOR_SIZE, offset, len(body),
+                                       0x0300, 0, 0, 0, type_guid, b"\x00" * 16, severity, b"DIMM_A1")
+        data[offset:offset + len(body)] = body
+        offset += len(body)
+    return bytes(data)
+
+
+def cper_fixtures(count, seed=1):
+    """Смесь записей памяти, MCA и PCIe для бенчмарка разбора."""
+    rng = random.Random(seed)
+    kinds = [
+        lambda i: [(whea_cper.SECTION_MEMORY, build_memory_section(rng.randrange(1 << 36) & ~0xFFF, 0, 1, i % 8))],
+        lambda i: [(whea_cper.SECTION_XPF_MCA, build_mca_section(i % 16, i % 22))],
+        lambda i: [(whea_cper.SECTION_PCIE, build_pcie_section(bus=i % 256))],
+    ]
+    return [build_cper_record(kinds[i % len(kinds)](i), record_id=i + 1) for i in range(count)]
+
+
+# Бюджет запуска GUI, мс от первой строки WHEA.py: импорт модулей, значок в трее, готовность
+# (окно, история, триггер и фоновые службы созданы)
+STARTUP_BUDGET_MS = {"import_ms": 350, "tray_ms": 500, "ready_ms": 800}
+
+
+def top_imports(stderr, limit=10):
+    """Самые долгие импорты верхнего уровня из вывода python -X importtime: (мс, модуль)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if len(name) - len(name.lstrip()) <= 1:  # Вложенные импорты сдвинуты на два пробела за уровень
+            rows.append((int(parts[1]) / 1000, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def bench_startup(args):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WHEA.py")
+    budget = {"import_ms": args.budget_import, "tray_ms": args.budget_tray, "ready_ms": args.budget_ready}
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, script, "--startup-report"], capture_output=True, text=True,
+                              encoding="utf-8", timeout=120)
+        process_ms = (time.perf_counter() - started) * 1000
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"WHEA.py --startup-report не вывел результат (код {proc.returncode}): {proc.stderr.strip()[-500:]}",
+                  file=sys.stderr)
+            return 2
+        result = json.loads(lines[-1])
+        if "error" in result:
+            print(f"Замер невозможен: {result['error']}", file=sys.stderr)
+            return 2
+        result["process_ms"] = round(process_ms, 1)
+        runs.append(result)
+
+    summary = {}
+    for key in ("import_ms", "tray_ms", "ready_ms", "process_ms"):
+        values = sorted(run[key] for run in runs)
+        summary[key] = {"median": values[len(values) // 2], "max": values[-1]}
+    over = {key: summary[key]["median"] for key, limit in budget.items() if summary[key]["median"] > limit}
+    slowest = []
+    if args.importtime:
+        proc = subprocess.run([sys.executable, "-X", "importtime", script, "--startup-report"], capture_output=True,
+                              text=True, encoding="utf-8", timeout=120)
+        slowest = top_imports(proc.stderr)
+
+    if args.json:
+        print(json.dumps({"runs": len(runs), "summary": summary, "budget_ms": budget, "over_budget": over,
+                          "modules": runs[-1].get("modules"),
+                          "slowest_imports": [{"ms": round(ms, 1), "module": name} for ms, name in slowest]},
+                         ensure_ascii=False))
+        return 1 if over else 0
+    print(f"Запусков WHEA.py: {len(runs)}, модулей после запуска: {runs[-1].get('modules')}")
+    titles = {"import_ms": "импорт", "tray_ms": "значок в трее", "ready_ms": "готовность", "process_ms": "процесс целиком"}
+    for key, title in titles.items():
+        limit = f" (бюджет {budget[key]:.0f})" if key in budget else ""
+        mark = " — ПРЕВЫШЕН" if key in over else ""
+        print(f"  {title}: медиана {summary[key]['median']:.0f} мс, максимум {summary[key]['max']:.0f} мс{limit}{mark}")
+    if slowest:
+        print("  самые долгие импорты:")
+        for ms, name in slowest:
+            print(f"    {ms:8.1f} мс  {name}")
+    return 1 if over else 0
+
+
+def bench_cper(args):
+    payloads = cper_fixtures(args.count)
+    total_bytes = sum(len(p) for p in payloads)
+    if args.dump:
+        with open(args.dump, "wb") as f:
+            f.write(b"".join(payloads))
+        print(f"Записано {len(payloads)} записей CPER ({total_bytes} байт) в {args.dump}")
+    for sample in payloads[:3]:
+        print(f"  {whea_cper.describe_record(whea_cper.decode_record(sample))}")
+    best = min(timeit.repeat(lambda: whea_cper.decode_batch(payloads), number=1, repeat=args.repeat))
+    decoded = whea_cper.decode_batch(payloads)
+    failed = sum(1 for r in decoded if r is None)
+    print(f"decode_batch: {args.count} записей за {best * 1000:.1f} мс, {best / args.count * 1e6:.2f} мкс/запись, "
+          f"{total_bytes / best / (1024 * 1024):.0f} МБ/с, не разобрано: {failed}")
+    joined = b"".join(payloads)
+    best = min(timeit.repeat(lambda: sum(1 for _ in whea_cper.iter_records(joined)), number=1, repeat=args.repeat))
+    print(f"iter_records по одному буферу: {best * 1000:.1f} мс")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки WHEAD")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("event-record", help="WheaEvent против прежнего event_to_dict")
+    p.add_argument("--count", type=int, default=10000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_event_record)
+
+    p = sub.add_parser("hosts", help="Параллельный опрос сотен поддельных хостов")
+    p.add_argument("--hosts", type=int, default=300)
+    p.add_argument("--workers", type=int, default=16)
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--timeout", type=float, default=1.0)
+    p.add_argument("--events", type=int, default=20, help="Записей за один опрос")
+    p.add_argument("--whea-ratio", type=float, default=0.05)
+    p.add_argument("--latency", type=float, default=0.01, help="Средняя задержка ответа хоста, с")
+    p.add_argument("--failing", type=int, default=5)
+    p.add_argument("--hanging", type=int, default=3)
+    p.set_defaults(func=bench_hosts)
+
+    p = sub.add_parser("scan", help="Путь обнаружения на синтетическом журнале")
+    p.add_argument("--records", type=int, default=100000)
+    p.add_argument("--per-tick", type=int, default=MAX_RECORDS_PER_TICK, help="Записей за один проход")
+    p.add_argument("--density", type=float, default=0.001, help="Доля WHEA-событий вне всплесков")
+    p.add_argument("--shape", choices=BURST_SHAPES, default="uniform")
+    p.add_argument("--burst-len", type=int, default=500)
+    p.add_argument("--burst-every", type=int, default=20000)
+    p.add_argument("--burst-density", type=float, default=0.5)
+    p.add_argument("--rules", default="45>10/10, 19>0/60", help="Пороги частоты (пусто — без них)")
+    p.add_argument("--log-capacity", type=int, default=4 * MAX_RECORDS_PER_TICK,
+                   help="Размер кольцевого синтетического журнала, записей")
+    p.add_argument("--no-dedup", action="store_true", help="Без дедупликации по отпечаткам")
+    p.add_argument("--history", action="store_true", help="Записывать события во временную историю SQLite")
+    p.add_argument("--tracemalloc", action="store_true", help="Пик памяти Python-объектов (замедляет прогон)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="Результат одной строкой JSON (для сравнения в CI)")
+    p.set_defaults(func=bench_scan)
+
+    p = sub.add_parser("cper", help="Разбор двоичных записей CPER (память, MCA, PCIe)")
+    p.add_argument("--count", type=int, default=100000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--dump", help="Сохранить сгенерированные записи подряд в файл (фикстура)")
+    p.set_defaults(func=bench_cper)
+
+    p = sub.add_parser("startup", help="Время запуска GUI до значка в трее (против бюджета)")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--budget-import", type=float, default=STARTUP_BUDGET_MS["import_ms"])
+    p.add_argument("--budget-tray", type=float, default=STARTUP_BUDGET_MS["tray_ms"])
+    p.add_argument("--budget-ready", type=float, default=STARTUP_BUDGET_MS["ready_ms"])
+    p.add_argument("--importtime", action="store_true", help="Ещё один запуск с -X importtime: самые долгие импорты")
+    p.add_argument("--json", action="store_true", help="Результат одной строкой JSON (для сравнения в CI)")
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,710 @@
+"""Ядро WHEAD без GUI: пути, журналы, чтение журнала событий Windows и обнаружение WHEA.
+
+Модуль не зависит от PyQt6 и импортируется вне Windows — pywin32 подключается,
+только если установлен (на Linux работают симулированные источники событий).
+"""
+import os
+import sys
+import json
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+from whea_log import AsyncLogWriter, LogRotation, DEBUG, INFO, WARNING, parse_level
+from whea_metrics import METRICS, MATCHES, HANDLE_RECONNECTS, HANDLE_OPEN_ERRORS
+from whea_cper import describe_event
+
+try:
+    import win32evtlog
+    import pywintypes
+except ImportError:  # Не Windows: доступны только симулированные источники
+    win32evtlog = None
+    pywintypes = None
+
+
+# Вне Windows (тесты, бенчмарки) APPDATA нет — используем домашний каталог
+APPDATA_DIR = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "Forgotten", "WHEAD")
+os.makedirs(APPDATA_DIR, exist_ok=True)
+
+LOG_FILE_PATH = os.path.join(APPDATA_DIR, "LTC-Logger.log")
+CONFIG_PATH = os.path.join(APPDATA_DIR, "LTC-Cursed.forgotten")
+ERRORS_LOG_PATH = os.path.join(APPDATA_DIR, "LTC-Errors.log")
+CURSOR_PATH = os.path.join(APPDATA_DIR, "LTC-Cursor.forgotten")
+
+
+def resource_path(relative_path):
+    """Путь к файлу рядом с программой (в сборке PyInstaller — во временном каталоге _MEIPASS)."""
+    base_path = getattr(sys, "_MEIPASS", None) or os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+# Сколько записей журнала максимум обрабатывается за один тик (ключ конфигурации max_records_per_tick)
+MAX_RECORDS_PER_TICK = 5000
+
+
+# Поставщик -> коды его WHEA-событий (ключ конфигурации event_providers). Код 41 в журнале
+# System пишут и другие поставщики, поэтому событие совпадает только по паре (поставщик, код).
+# TestWHEA — источник проверочных событий кнопки «Тест» и WHEA.bat (eventcreate /SO TestWHEA).
+WHEA_PROVIDERS = {
+    "Microsoft-Windows-WHEA-Logger": (17, 18, 19, 20, 45, 46, 47),
+    "Microsoft-Windows-Kernel-WHEA": (17, 18, 19, 20, 45, 46, 47),
+    "Microsoft-Windows-Kernel-Power": (41,),
+    "TestWHEA": (17, 18, 19, 20, 41, 45, 46, 47),
+}
+
+WHEA_EVENT_IDS = {eid for ids in WHEA_PROVIDERS.values() for eid in ids}
+
+# Каналы, которые читаются за один проход (ключ конфигурации event_channels)
+EVENT_CHANNELS = ("System", "Microsoft-Windows-Kernel-WHEA/Errors", "Microsoft-Windows-Kernel-WHEA/Operational")
+
+
+log_writer = AsyncLogWriter(LOG_FILE_PATH, '%Y-%m-%d %H:%M:%S.%f')
+error_log_writer = AsyncLogWriter(ERRORS_LOG_PATH, '%Y-%m-%d %H:%M:%S')
+log_level = INFO
+
+METRICS.gauge("whead_log_queue_depth", "Строк в очереди записи журнала",
+              lambda: {"logger": log_writer.queue_depth, "errors": error_log_writer.queue_depth}, label="log")
+METRICS.gauge("whead_log_dropped_lines", "Строк журнала, отброшенных из-за переполнения очереди",
+              lambda: {"logger": log_writer.dropped, "errors": error_log_writer.dropped}, label="log")
+METRICS.gauge("whead_log_disk_bytes", "Объём журнала на диске: активный файл и сегменты",
+              lambda: {name: s["active_bytes"] + s["segment_bytes"] for name, s in
+                       (("logger", log_writer.stats()), ("errors", error_log_writer.stats()))}, label="log")
+
+
+def set_log_level(level):
+    """Уровень подробности LTC-Logger.log (ключ конфигурации log_level)."""
+    global log_level
+    log_level = parse_level(level)
+
+
+def configure_logs(cfg):
+    """Ротация LTC-Logger.log и LTC-Errors.log по ключам log_max_mb, log_max_age_hours, log_budget_mb, log_compress."""
+    try:
+        rotation = LogRotation.from_config(cfg)
+    except (TypeError, ValueError) as e:
+        write_log(f"Неверные параметры ротации журнала: {e}", WARNING)
+        return
+    log_writer.configure(rotation)
+    error_log_writer.configure(rotation)
+
+
+def log_enabled(level):
+    return level >= log_level
+
+
+def write_log(text: str, level=INFO):
+    if level >= log_level:
+        log_writer.write(text)
+
+
+def write_debug(text: str):
+    """Подробная диагностика каждого тика; при уровне выше DEBUG строка сразу отбрасывается."""
+    if DEBUG >= log_level:
+        log_writer.write(text)
+
+
+def write_error_log(text: str):
+    error_log_writer.write(text)
+
+
+def flush_logs(timeout=5.0):
+    log_writer.flush(timeout)
+    error_log_writer.flush(timeout)
+
+
+def load_config(path=CONFIG_PATH):
+    """Конфигурация триггера из LTC-Cursed.forgotten (пустой словарь, если файла нет или он повреждён)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        return cfg if isinstance(cfg, dict) else {}
+    except Exception as e:
+        write_log(f"Ошибка загрузки конфигурации: {e}", WARNING)
+        return {}
+
+
+def save_config(cfg, path=CONFIG_PATH):
+    """Атомарная запись конфигурации: временный файл рядом и замена, поэтому читатель
+    (в том числе ConfigWatcher другого процесса) никогда не видит файл наполовину записанным."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ConfigWatcher:
+    """Перечитывание конфигурации при изменении файла (время изменения и размер).
+
+    poll() можно вызывать часто: файл проверяется не чаще раза в interval секунд.
+    Новая конфигурация проходит validate(cfg) (исключение ValueError — ошибка);
+    неверный файл не применяется, текст ошибки пишется в журнал и передаётся on_error.
+    """
+
+    def __init__(self, path=CONFIG_PATH, interval=2.0, validate=None, on_error=None):
+        self.path = path
+        self.interval = interval
+        self.validate = validate
+        self.on_error = on_error
+        self.stamp = self.read_stamp()
+        self.last_check = time.monotonic()
+        self.reloads = 0
+        self.error = None
+
+    def read_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def poll(self):
+        """Новая конфигурация, если файл изменился и она верна, иначе None."""
+        now = time.monotonic()
+        if now - self.last_check < self.interval:
+            return None
+        self.last_check = now
+        stamp = self.read_stamp()
+        if stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        if stamp is None:
+            return None  # Файл удалён: остаётся прежняя конфигурация
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+            if not isinstance(cfg, dict):
+                raise ValueError("ожидается объект JSON")
+            if self.validate is not None:
+                self.validate(cfg)
+        except (OSError, ValueError) as e:
+            self.error = f"Конфигурация {os.path.basename(self.path)} не применена: {e}"
+            write_log(self.error, WARNING)
+            if self.on_error is not None:
+                self.on_error(self.error)
+            return None
+        self.error = None
+        self.reloads += 1
+        return cfg
+
+
+def event_timestamp(event):
+    """Время создания события в секундах epoch (None, если преобразовать не удалось)."""
+    try:
+        t = event.TimeGenerated
+        if pywintypes is not None and not isinstance(t, datetime):
+            t = pywintypes.Time(t)
+        return int(t.timestamp())
+    except Exception:
+        return None
+
+
+class WheaEvent(NamedTuple):
+    """Компактная запись события: только поля, которые использует WHEAD.
+
+    Создаётся одним проходом из объекта pywin32 (без обхода dir() и getattr по всем
+    атрибутам); в словарь/JSON превращается только по запросу — для отладочного журнала.
+    """
+
+    record_number: int
+    event_id: int
+    source: str
+    level: int       # EventType: 1 — ошибка, 2 — предупреждение, 4 — информация
+    timestamp: int   # TimeGenerated в секундах epoch (0, если время не удалось получить)
+    inserts: tuple
+    details: str = ""  # Описание из двоичной записи CPER (whea_cper), например модуль памяти и адрес
+    location: str = ""  # Место ошибки из CPER без адреса (модуль памяти, банк MCA, устройство PCIe)
+    occurrences: int = 1  # Сколько одинаковых событий представляет запись после дедупликации (whea_dedup)
+
+    @classmethod
+    def from_record(cls, event, details="", location=""):
+        try:
+            timestamp = int(event.TimeGenerated.timestamp())
+        except Exception:
+            timestamp = event_timestamp(event) or 0
+        return cls(
+            event.RecordNumber,
+            event.EventID & 0xFFFF,
+            event.SourceName,
+            event.EventType,
+            timestamp,
+            tuple(event.StringInserts or ()),
+            details,
+            location,
+        )
+
+    def to_dict(self):
+        return self._asdict()
+
+
+class EventMatcher:
+    """Таблица совпадений (поставщик, код), построенная один раз.
+
+    Проверка записи — поиск кода в множестве кодов (большинство записей журнала на этом
+    отсеиваются) и затем пары в frozenset.
+    """
+
+    def __init__(self, providers=None):
+        providers = WHEA_PROVIDERS if providers is None else providers
+        self.providers = {name: tuple(sorted({int(eid) & 0xFFFF for eid in ids})) for name, ids in providers.items()}
+        self.pairs = frozenset((name, eid) for name, ids in self.providers.items() for eid in ids)
+        self.event_ids = frozenset(eid for _, eid in self.pairs)
+        self.default_providers = {}
+        for name, ids in self.providers.items():
+            for eid in ids:
+                self.default_providers.setdefault(eid, name)
+
+    def matches(self, event):
+        event_id = event.EventID & 0xFFFF
+        return event_id in self.event_ids and (event.SourceName, event_id) in self.pairs
+
+    def matches_source(self, source, event_id):
+        """То же по отдельным полям (выгрузки журналов в офлайн-анализе)."""
+        event_id &= 0xFFFF
+        return event_id in self.event_ids and (source, event_id) in self.pairs
+
+    def provider_for(self, event_id):
+        """Поставщик, от имени которого симулируется событие с кодом event_id."""
+        return self.default_providers.get(event_id, "")
+
+    def xpath(self):
+        """Условие XPath для EvtQuery/EvtSubscribe: те же пары, что и в таблице."""
+        terms = []
+        for name, ids in self.providers.items():
+            if ids:
+                codes = " or ".join(f"EventID={eid}" for eid in ids)
+                terms.append(f"(Provider[@Name='{name}'] and ({codes}))")
+        return " or ".join(terms) or "false()"
+
+
+DEFAULT_MATCHER = EventMatcher()
+
+
+def matcher_from_config(cfg):
+    """EventMatcher по ключу event_providers ({поставщик: [коды]}) или таблица по умолчанию."""
+    providers = cfg.get("event_providers")
+    if not isinstance(providers, dict) or not providers:
+        return DEFAULT_MATCHER
+    try:
+        return EventMatcher(providers)
+    except (TypeError, ValueError) as e:
+        write_log(f"Неверный ключ event_providers, используется таблица по умолчанию: {e}", WARNING)
+        return DEFAULT_MATCHER
+
+
+def channels_from_config(cfg):
+    channels = cfg.get("event_channels")
+    if not isinstance(channels, list) or not channels:
+        return EVENT_CHANNELS
+    return tuple(dict.fromkeys(str(c) for c in channels))
+
+
+class EventLogCursor:
+    """Курсор последней обработанной записи журнала (RecordNumber + время), хранится в APPDATA.
+
+    Позиция хранится отдельно для каждой пары (сервер, журнал): {"record": N, "time": epoch}.
+    record == 0 означает «читать с самой старой записи».
+    """
+
+    def __init__(self, path=CURSOR_PATH):
+        self.path = path
+        self.positions = {}
+        # Курсор общий для нескольких хостов, которые опрашиваются параллельно
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(server, log_type):
+        return f"{server}\\{log_type}"
+
+    def get(self, server, log_type):
+        return self.positions.get(self.key(server, log_type))
+
+    def set(self, server, log_type, position):
+        with self.lock:
+            self.positions[self.key(server, log_type)] = position
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.positions = data
+        except Exception as e:
+            write_log(f"Ошибка загрузки курсора журнала: {e}")
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with self.lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.positions, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            write_log(f"Ошибка сохранения курсора журнала: {e}")
+
+
+# Коды ошибок Windows, после которых хендл журнала нужно открыть заново
+ERROR_INVALID_HANDLE = 6
+ERROR_EVENTLOG_FILE_CHANGED = 1503  # Журнал очищен или заменён, пока хендл был открыт
+RPC_ERRORS = {1722, 1726, 1727}    # Сервер RPC недоступен / вызов не выполнен (удалённые хосты)
+
+
+class EventLogHandlePool:
+    """Хендлы журналов событий: один открытый хендл на пару (сервер, журнал), переиспользуемый между тиками.
+
+    Хендл, на котором чтение завершилось ошибкой, закрывается (invalidate) и при следующем
+    acquire() открывается заново. Повторные неудачные открытия откладываются с
+    экспоненциальной задержкой. close_all() вызывается при остановке мониторинга и выходе.
+
+    Открытие (у недоступного хоста — таймаут RPC в десятки секунд) идёт вне общей
+    блокировки, под блокировкой своей пары: медленный хост не задерживает остальные.
+    """
+
+    def __init__(self, backoff_base=1.0, backoff_max=300.0):
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.handles = {}
+        self.failures = {}  # ключ -> (число неудачных открытий подряд, время следующей попытки)
+        self.invalidated = set()
+        self.lock = threading.Lock()
+        self.open_locks = {}  # ключ -> блокировка открытия этой пары
+        self.opened = 0
+        self.closed = 0
+        self.reconnects = 0
+        self.open_errors = 0
+
+    def cached(self, key):
+        """Открытый хендл пары или None; исключение, если повторная попытка ещё не наступила."""
+        with self.lock:
+            hand = self.handles.get(key)
+            if hand is not None:
+                return hand
+            _, retry_at = self.failures.get(key, (0, 0.0))
+            now = time.monotonic()
+            if now < retry_at:
+                raise RuntimeError(f"повторное подключение к журналу {key[1]} на {key[0]} через {retry_at - now:.0f} с")
+            return None
+
+    def acquire(self, server, log_type):
+        key = (server, log_type)
+        hand = self.cached(key)
+        if hand is not None:
+            return hand
+        with self.lock:
+            open_lock = self.open_locks.setdefault(key, threading.Lock())
+        with open_lock:
+            # Пока ждали, пару мог открыть (или не суметь открыть) другой поток
+            hand = self.cached(key)
+            if hand is not None:
+                return hand
+            try:
+                hand = win32evtlog.OpenEventLog(server, log_type)
+            except Exception:
+                with self.lock:
+                    count = self.failures.get(key, (0, 0.0))[0] + 1
+                    self.open_errors += 1
+                    self.failures[key] = (count, time.monotonic() + min(self.backoff_max, self.backoff_base * 2 ** (count - 1)))
+                HANDLE_OPEN_ERRORS.inc()
+                raise
+            with self.lock:
+                self.failures.pop(key, None)
+                self.handles[key] = hand
+                self.opened += 1
+                reconnected = key in self.invalidated
+                if reconnected:
+                    self.invalidated.discard(key)
+                    self.reconnects += 1
+        if reconnected:
+            HANDLE_RECONNECTS.inc()
+            write_log(f"Журнал {log_type} на {server} открыт повторно (переподключений: {self.reconnects})")
+        else:
+            write_debug(f"Открыт журнал событий Windows: {log_type} на сервере {server}")
+        return hand
+
+    def invalidate(self, server, log_type):
+        """Закрыть хендл после ошибки чтения; следующий acquire() откроет журнал заново."""
+        key = (server, log_type)
+        with self.lock:
+            hand = self.handles.pop(key, None)
+            if hand is None:
+                return
+            self.invalidated.add(key)
+            self.close_handle(hand)
+
+    def close_all(self):
+        with self.lock:
+            handles = list(self.handles.values())
+            self.handles.clear()
+            self.invalidated.clear()
+            self.failures.clear()
+            for hand in handles:
+                self.close_handle(hand)
+        if handles:
+            write_log(f"Закрыты хендлы журналов событий: {len(handles)}; {self.summary()}")
+
+    def close_handle(self, hand):
+        try:
+            win32evtlog.CloseEventLog(hand)
+        except Exception:
+            pass
+        self.closed += 1
+
+    def stats(self):
+        return {
+            "open": len(self.handles),
+            "opened": self.opened,
+            "closed": self.closed,
+            "reconnects": self.reconnects,
+            "open_errors": self.open_errors,
+        }
+
+    def summary(self):
+        return ", ".join(f"{k}={v}" for k, v in self.stats().items())
+
+
+class ScanStats:
+    """Счётчики чтения журнала: за последний тик (tick) и накопленные с запуска (total)."""
+
+    FIELDS = ("records_scanned", "buffers_read", "early_exits", "budget_exhausted")
+
+    def __init__(self):
+        self.total = dict.fromkeys(self.FIELDS, 0)
+        self.tick = dict.fromkeys(self.FIELDS, 0)
+
+    def begin_tick(self):
+        self.tick = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, n=1):
+        self.tick[field] += n
+        self.total[field] += n
+
+    def summary(self):
+        tick = ", ".join(f"{k}={v}" for k, v in self.tick.items())
+        total = ", ".join(f"{k}={v}" for k, v in self.total.items())
+        return f"за тик: {tick}; всего: {total}"
+
+
+def drain_backwards(hand, since, max_records, stats):
+    """Читает журнал от самой новой записи назад, буфер за буфером, пока не встретит
+    запись старше since (epoch) — дальше только более старые, поэтому чтение прекращается.
+
+    Возвращает (события в порядке возрастания номеров, самая новая прочитанная запись).
+    """
+    flags = win32evtlog.EVENTLOG_BACKWARDS_READ | win32evtlog.EVENTLOG_SEEK_READ
+    oldest = win32evtlog.GetOldestEventLogRecord(hand)
+    offset = oldest + win32evtlog.GetNumberOfEventLogRecords(hand) - 1
+    events = []
+    newest = None
+    while offset >= oldest:
+        batch = win32evtlog.ReadEventLog(hand, flags, offset)
+        if not batch:
+            break
+        stats.add("buffers_read")
+        if newest is None:
+            newest = batch[0]
+        for event in batch:
+            stats.add("records_scanned")
+            ts = event_timestamp(event)
+            if since is not None and ts is not None and ts < since:
+                stats.add("early_exits")
+                events.reverse()
+                return events, newest
+            if len(events) >= max_records:
+                stats.add("budget_exhausted")
+                write_log(f"Достигнут лимит {max_records} записей за тик при чтении назад, более старые записи пропущены", WARNING)
+                events.reverse()
+                return events, newest
+            events.append(event)
+        offset = batch[-1].RecordNumber - 1
+    events.reverse()
+    return events, newest
+
+
+def read_new_events(hand, position, since=None, max_records=None, stats=None):
+    """Читает журнал вперёд от курсора. Возвращает (новые события, новая позиция).
+
+    При первом запуске (position is None) журнал дочитывается назад до начала окна
+    мониторинга since. Очистка журнала и перезапись старых записей (журнал заполнен)
+    определяются по диапазону номеров и по времени записи под курсором.
+    За один вызов обрабатывается не больше max_records записей — остаток будет
+    прочитан на следующем тике, так как курсор сдвигается только по обработанным.
+    """
+    if max_records is None:
+        max_records = MAX_RECORDS_PER_TICK
+    if stats is None:
+        stats = ScanStats()
+
+    oldest = win32evtlog.GetOldestEventLogRecord(hand)
+    total = win32evtlog.GetNumberOfEventLogRecords(hand)
+    if total == 0:
+        # Журнал пуст (например, очищен) — следующие записи читаем с самой старой
+        return [], {"record": 0, "time": 0}
+    newest = oldest + total - 1
+
+    if position is None:
+        events, last = drain_backwards(hand, since, max_records, stats)
+        if last is None:
+            return [], {"record": 0, "time": 0}
+        return events, {"record": last.RecordNumber, "time": event_timestamp(last)}
+
+    record = position.get("record", 0)
+    verify = True
+    if record == 0:
+        start, verify = oldest, False
+    elif record > newest:
+        write_log(f"Журнал событий очищен (курсор {record} > последней записи {newest}), чтение с начала", WARNING)
+        start, verify = oldest, False
+    elif record < oldest:
+        write_log(f"Записи журнала перезаписаны (курсор {record} < самой старой записи {oldest}), чтение с {oldest}", WARNING)
+        start, verify = oldest, False
+    else:
+        start = record
+
+    flags = win32evtlog.EVENTLOG_FORWARDS_READ | win32evtlog.EVENTLOG_SEEK_READ
+    events = []
+    offset = start
+    while offset <= newest:
+        batch = win32evtlog.ReadEventLog(hand, flags, offset)
+        if not batch:
+            break
+        stats.add("buffers_read")
+        stats.add("records_scanned", len(batch))
+        if verify:
+            verify = False
+            first = batch[0]
+            if first.RecordNumber == record and event_timestamp(first) == position.get("time"):
+                batch = batch[1:]
+            else:
+                # Под курсором другая запись — журнал очищался и нумерация началась заново
+                write_log(f"Запись под курсором {record} не совпадает, журнал очищался — чтение с начала", WARNING)
+                events = []
+                offset = oldest
+                continue
+            if not batch:
+                offset = record + 1
+                continue
+        events.extend(batch)
+        if len(events) >= max_records:
+            stats.add("budget_exhausted")
+            del events[max_records:]
+            write_log(f"Достигнут лимит {max_records} записей за тик, остаток будет прочитан на следующем тике", WARNING)
+            break
+        offset = batch[-1].RecordNumber + 1
+
+    if events:
+        last = events[-1]
+        return events, {"record": last.RecordNumber, "time": event_timestamp(last)}
+    if offset == record + 1:
+        return [], position
+    return [], {"record": 0, "time": 0}
+
+
+class EventRecord:
+    """Запись журнала с теми же атрибутами, что у PyEventLogRecord из pywin32.
+
+    Используется подписочным и симулированным источниками, чтобы весь дальнейший
+    путь обработки не зависел от того, откуда пришло событие.
+    """
+
+    __slots__ = ("RecordNumber", "EventID", "TimeGenerated", "TimeWritten", "SourceName",
+                 "EventType", "EventCategory", "ComputerName", "StringInserts", "Data", "Channel")
+
+    def __init__(self, RecordNumber, EventID, TimeGenerated, SourceName="", EventType=1,
+                 EventCategory=0, ComputerName="", StringInserts=None, Data=None, TimeWritten=None, Channel=""):
+        self.RecordNumber = RecordNumber
+        self.EventID = EventID
+        self.TimeGenerated = TimeGenerated
+        self.TimeWritten = TimeWritten if TimeWritten is not None else TimeGenerated
+        self.SourceName = SourceName
+        self.EventType = EventType
+        self.EventCategory = EventCategory
+        self.ComputerName = ComputerName
+        self.StringInserts = StringInserts
+        self.Data = Data
+        self.Channel = Channel  # Канал журнала (только для записей, прочитанных через XML)
+
+    def __repr__(self):
+        return f"EventRecord(#{self.RecordNumber}, id={self.EventID & 0xFFFF}, {self.SourceName})"
+
+
+class Detection:
+    """Результат обработки пачки событий: найденные WHEA-ошибки."""
+
+    def __init__(self, count, new_count, event_ids, events, host='localhost', summary=False):
+        self.count = count          # Всего WHEA-событий с начала мониторинга
+        self.new_count = new_count  # Из них в этой пачке
+        self.event_ids = event_ids  # Отсортированные коды за всё время мониторинга
+        self.events = events        # WHEA-события этой пачки (WheaEvent)
+        self.host = host
+        self.summary = summary      # Только сводки повторов известных отпечатков: в журнал, без триггера
+        self.time = datetime.now()
+
+    @property
+    def codes_str(self):
+        return ', '.join(str(eid) for eid in self.event_ids)
+
+    @property
+    def details(self):
+        """Различающиеся описания CPER событий пачки (не больше трёх)."""
+        return list(dict.fromkeys(ev.details for ev in self.events if ev.details))[:3]
+
+    def to_dict(self):
+        return {
+            "time": self.time.isoformat(timespec="seconds"),
+            "host": self.host,
+            "count": self.count,
+            "new_count": self.new_count,
+            "event_ids": self.event_ids,
+            "summary": self.summary,
+            "events": [ev.to_dict() for ev in self.events],
+        }
+
+
+class WheaDetector:
+    """Общий путь обнаружения для всех источников: отбирает WHEA-события из пачки новых записей."""
+
+    def __init__(self, matcher=None, host='localhost'):
+        self.matcher = matcher if matcher is not None else DEFAULT_MATCHER
+        self.host = host
+        # process() вызывается из потока чтения и из потока подписки
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.total_count = 0
+        self.found_event_ids = set()
+
+    def process(self, events):
+        """Обрабатывает пачку новых записей. Возвращает Detection или None, если WHEA-событий нет."""
+        if not events:
+            return None
+        if log_enabled(DEBUG):
+            sample_events_info = [WheaEvent.from_record(ev).to_dict() for ev in events[:5]]
+            write_debug(f"Структура первых прочитанных событий (макс 5): {json.dumps(sample_events_info, ensure_ascii=False)}")
+
+        event_ids = self.matcher.event_ids
+        pairs = self.matcher.pairs
+        # Двоичная запись CPER разбирается только для совпавших (редких) WHEA-событий
+        matched = [WheaEvent.from_record(ev, *describe_event(ev)) for ev in events
+                   if (ev.EventID & 0xFFFF) in event_ids and (ev.SourceName, ev.EventID & 0xFFFF) in pairs]
+        per_id = {}
+        for event in matched:
+            per_id[event.event_id] = per_id.get(event.event_id, 0) + 1
+        for event_id, n in per_id.items():
+            MATCHES.inc(n, event_id)
+        with self.lock:
+            self.found_event_ids.update(per_id)
+            self.total_count += len(matched)
+            total_count = self.total_count
+            event_ids = sorted(self.found_event_ids)
+
+        write_debug(f"Всего найдено ошибок/предупреждений WHEA: {total_count}, Коды ошибок: {event_ids}")
+        if not matched:
+            return None
+        return Detection(total_count, len(matched), event_ids, matched, self.host)
@@ -0,0 +1,400 @@
+"""Разбор двоичной записи об ошибке WHEA (формат CPER, UEFI спецификация, приложение N).
+
+У событий WHEA-Logger полезные подробности — какой процессор и банк MCA, какой модуль
+памяти и адрес, какое устройство PCIe — лежат не в коде события, а в двоичных данных
+записи (Data у PyEventLogRecord или поле RawData в шестнадцатеричном виде среди
+StringInserts). Разбор идёт по memoryview через struct.unpack_from, без копирования
+буфера; 16-байтные GUID сравниваются с таблицей типов секций как bytes.
+
+    decode_record(data)     — одна запись -> CperRecord (CperError, если формат не тот)
+    decode_batch(payloads)  — много записей за раз, неразобранные -> None
+    iter_records(buffer)    — записи, идущие подряд в одном буфере (дамп)
+    describe_event(record)  — (описание, место) для уведомлений, истории и дедупликации:
+                              «Память: узел 0, модуль 3, адрес 0x1f2e3000 — однобитная ECC»,
+                              «mem:0/-/3/-»
+
+Модуль не зависит от остальных модулей WHEAD.
+"""
+import struct
+import uuid
+from functools import lru_cache
+from typing import NamedTuple
+
+
+CPER_SIGNATURE = b"CPER"
+HEADER_SIZE = 128
+DESCRIPTOR_SIZE = 72
+
+# Заголовок записи: подпись, ревизия, SignatureEnd, число секций, серьёзность, ValidationBits, длина
+HEADER = struct.Struct("<4sHIHIII")
+TIMESTAMP = struct.Struct("<BBBBBBBB")
+# Дескриптор секции: смещение, длина, ревизия, ValidationBits, резерв, флаги, тип (GUID), FRU Id, серьёзность, FRU-текст
+DESCRIPTOR = struct.Struct("<IIHBBI16s16sI20s")
+
+SEVERITY_NAMES = {0: "исправимая", 1: "фатальная", 2: "исправленная", 3: "информационная"}
+
+
+def guid_bytes(text):
+    """GUID из текстового вида в порядке байтов, как он лежит в записи (little-endian)."""
+    return uuid.UUID(text).bytes_le
+
+
+@lru_cache(maxsize=256)
+def guid_text(raw):
+    return str(uuid.UUID(bytes_le=raw))
+
+
+def format_guid(raw):
+    """Текстовый GUID; одни и те же GUID (создатель, тип секции) повторяются, поэтому кэшируются."""
+    return guid_text(bytes(raw))
+
+
+SECTION_PROCESSOR_GENERIC = guid_bytes("9876ccad-47b4-4bdb-b65e-16f193c4f3db")
+SECTION_PROCESSOR_X86 = guid_bytes("dc3ea0b0-a144-4797-b95b-53fa242b6e1d")
+SECTION_MEMORY = guid_bytes("a5bc1114-6f64-4ede-b863-3e83ed7c83b1")
+SECTION_MEMORY2 = guid_bytes("61ec04fc-48e6-d813-25c9-8daa44750b12")
+SECTION_PCIE = guid_bytes("d995e954-bbc1-430f-ad91-b44dcb3c6f35")
+SECTION_XPF_MCA = guid_bytes("8a1e1d01-42f9-4557-9c33-565e5cc3f7e8")
+SECTION_ERROR_PACKET = guid_bytes("e71254e9-c1b9-4940-ab76-909703a4320f")
+
+
+class CperError(ValueError):
+    """Буфер не является записью CPER или обрезан."""
+
+
+class CperSection(NamedTuple):
+    kind: str          # processor, memory, pcie, mca или unknown
+    type_guid: str
+    severity: int
+    fru_text: str
+    fields: dict       # Разобранные поля секции (только те, что помечены в ValidationBits)
+
+
+class CperRecord(NamedTuple):
+    revision: int
+    severity: int
+    record_id: int
+    timestamp: str     # Время из заголовка записи (ISO) или "", если не задано
+    creator: str
+    notification: str
+    sections: tuple
+
+    @property
+    def severity_name(self):
+        return SEVERITY_NAMES.get(self.severity, str(self.severity))
+
+
+def bit(validation, n):
+    return validation >> n & 1
+
+
+# --- секции ---
+
+# Общая секция процессора: ValidationBits, тип, ISA, тип ошибки, операция, флаги, уровень, резерв,
+# версия CPU, строка бренда, ProcessorId (APIC), адрес назначения, Requester, Responder, IP
+PROCESSOR_GENERIC = struct.Struct("<QBBBBBBHQ128sQQQQQ")
+PROCESSOR_ERROR_TYPES = {0x01: "кэш", 0x02: "TLB", 0x04: "шина", 0x08: "микроархитектура"}
+PROCESSOR_OPERATIONS = {0: "неизвестная", 1: "чтение данных", 2: "запись данных", 3: "выборка инструкции"}
+
+
+def decode_processor_generic(mv, offset):
+    (validation, proc_type, isa, error_type, operation, flags, level, _, version, brand,
+     apic_id, target, requester, responder, ip) = PROCESSOR_GENERIC.unpack_from(mv, offset)
+    fields = {}
+    if bit(validation, 2):
+        fields["error_type"] = PROCESSOR_ERROR_TYPES.get(error_type, hex(error_type))
+    if bit(validation, 3):
+        fields["operation"] = PROCESSOR_OPERATIONS.get(operation, str(operation))
+    if bit(validation, 5):
+        fields["cache_level"] = level
+    if bit(validation, 6):
+        fields["cpu_version"] = hex(version)
+    if bit(validation, 7):
+        fields["cpu_brand"] = bytes(brand).split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+    if bit(validation, 8):
+        fields["apic_id"] = apic_id
+    if bit(validation, 9):
+        fields["target_address"] = hex(target)
+    if bit(validation, 12):
+        fields["ip"] = hex(ip)
+    return fields
+
+
+# Секция памяти: ValidationBits, ErrorStatus, адрес, маска, узел, карта, модуль, банк, устройство,
+# строка, столбец, бит, Requester, Responder, Target, тип ошибки, Extended, ранг, хендлы карты и модуля
+MEMORY = struct.Struct("<QQQQHHHHHHHHQQQBBHHH")
+MEMORY_ERROR_TYPES = {
+    0: "неизвестная", 1: "нет ошибки", 2: "однобитная ECC", 3: "многобитная ECC",
+    4: "ChipKill (один символ)", 5: "ChipKill (несколько символов)", 6: "Master Abort",
+    7: "Target Abort", 8: "чётность", 9: "таймаут", 10: "неверный адрес", 11: "нарушение зеркала",
+    12: "Memory Sparing", 13: "исправлена при Scrub", 14: "неисправима при Scrub",
+    15: "отключение страницы памяти",
+}
+
+
+def decode_memory(mv, offset):
+    (validation, status, address, mask, node, card, module, bank, device, row, column, bit_pos,
+     _, _, _, error_type, _, rank, card_handle, module_handle) = MEMORY.unpack_from(mv, offset)
+    fields = {}
+    if bit(validation, 1):
+        fields["address"] = hex(address)
+    if bit(validation, 3):
+        fields["node"] = node
+    if bit(validation, 4):
+        fields["card"] = card
+    if bit(validation, 5):
+        fields["module"] = module
+    if bit(validation, 6):
+        fields["bank"] = bank
+    if bit(validation, 7):
+        fields["device"] = device
+    if bit(validation, 8):
+        fields["row"] = row
+    if bit(validation, 9):
+        fields["column"] = column
+    if bit(validation, 10):
+        fields["bit"] = bit_pos
+    if bit(validation, 14):
+        fields["error_type"] = MEMORY_ERROR_TYPES.get(error_type, str(error_type))
+    if bit(validation, 15):
+        fields["rank"] = rank
+    if bit(validation, 17):
+        fields["module_handle"] = module_handle
+    return fields
+
+
+# Секция PCIe: ValidationBits, тип порта, версия, Command, Status, резерв, затем идентификатор устройства
+PCIE_HEADER = struct.Struct("<QIIHHI")
+PCIE_DEVICE = struct.Struct("<HH3sBBHBBH")
+PCIE_PORT_TYPES = {
+    0: "конечное устройство PCIe", 1: "устаревшее конечное устройство", 4: "корневой порт",
+    5: "восходящий порт коммутатора", 6: "нисходящий порт коммутатора", 7: "мост PCIe-PCI",
+    8: "мост PCI-PCIe", 9: "встроенное устройство корневого комплекса", 10: "сборщик событий корневого комплекса",
+}
+PCIE_AER_OFFSET = 112  # Структура AER внутри секции
+AER = struct.Struct("<IIIII")  # Заголовок возможности, UncorrectableStatus, маска, серьёзность, CorrectableStatus
+
+
+def decode_pcie(mv, offset):
+    validation, port_type, version, command, status, _ = PCIE_HEADER.unpack_from(mv, offset)
+    fields = {}
+    if bit(validation, 0):
+        fields["port_type"] = PCIE_PORT_TYPES.get(port_type, str(port_type))
+    if bit(validation, 3):
+        vendor, device, _, function, dev_number, segment, bus, _, slot = PCIE_DEVICE.unpack_from(mv, offset + 24)
+        fields["vendor_id"] = f"{vendor:04x}"
+        fields["device_id"] = f"{device:04x}"
+        fields["bdf"] = f"{segment:04x}:{bus:02x}:{dev_number:02x}.{function:x}"
+        fields["slot"] = slot >> 3
+    if bit(validation, 7):
+        _, uncorrectable, _, _, correctable = AER.unpack_from(mv, offset + PCIE_AER_OFFSET)
+        fields["aer_uncorrectable"] = hex(uncorrectable)
+        fields["aer_correctable"] = hex(correctable)
+    return fields
+
+
+# Секция Windows XPF MCA (упакованная структура WHEA_XPF_MCA_SECTION): версия, производитель CPU,
+# время, номер процессора, MCG_STATUS, IP, номер банка, MCi_STATUS, MCi_ADDR, MCi_MISC
+XPF_MCA = struct.Struct("<IIqIQQIQQQ")
+CPU_VENDORS = {0: "неизвестен", 1: "Intel", 2: "AMD"}
+
+
+def decode_xpf_mca(mv, offset):
+    (_, vendor, _, processor, _, _, bank, status, address, misc) = XPF_MCA.unpack_from(mv, offset)
+    fields = {
+        "cpu_vendor": CPU_VENDORS.get(vendor, str(vendor)),
+        "processor": processor,
+        "mca_bank": bank,
+        "mci_status": hex(status),
+    }
+    if status >> 58 & 1:  # ADDRV — регистр адреса действителен
+        fields["mci_addr"] = hex(address)
+    if status >> 59 & 1:  # MISCV
+        fields["mci_misc"] = hex(misc)
+    fields["corrected"] = not status >> 61 & 1  # UC
+    return fields
+
+
+# GUID типа секции -> (вид, разборщик, минимальная длина секции)
+SECTION_DECODERS = {
+    SECTION_PROCESSOR_GENERIC: ("processor", decode_processor_generic, PROCESSOR_GENERIC.size),
+    SECTION_MEMORY: ("memory", decode_memory, MEMORY.size),
+    SECTION_MEMORY2: ("memory", decode_memory, MEMORY.size),
+    SECTION_PCIE: ("pcie", decode_pcie, PCIE_AER_OFFSET + AER.size),
+    SECTION_XPF_MCA: ("mca", decode_xpf_mca, XPF_MCA.size),
+    SECTION_PROCESSOR_X86: ("processor", None, 0),
+    SECTION_ERROR_PACKET: ("packet", None, 0),
+}
+
+
+# --- запись ---
+
+def decode_timestamp(mv, offset):
+    seconds, minutes, hours, flags, day, month, year, century = TIMESTAMP.unpack_from(mv, offset)
+    if not month or not day:
+        return ""
+    return f"{century * 100 + year:04d}-{month:02d}-{day:02d}T{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def decode_record(data):
+    """Разобрать запись CPER из bytes/bytearray/memoryview. Буфер не копируется."""
+    mv = data if isinstance(data, memoryview) else memoryview(data)
+    size = len(mv)
+    if size < HEADER_SIZE:
+        raise CperError(f"запись короче заголовка ({size} байт)")
+    signature, revision, signature_end, count, severity, validation, length = HEADER.unpack_from(mv, 0)
+    if signature != CPER_SIGNATURE or signature_end != 0xFFFFFFFF:
+        raise CperError("нет подписи CPER")
+    if length > size:
+        raise CperError(f"запись обрезана: {size} байт из {length}")
+    if HEADER_SIZE + count * DESCRIPTOR_SIZE > length:
+        raise CperError(f"дескрипторы {count} секций не помещаются в запись")
+    timestamp = decode_timestamp(mv, 24) if bit(validation, 1) else ""
+    record_id = struct.unpack_from("<Q", mv, 96)[0]
+    creator = format_guid(mv[64:80])
+    notification = format_guid(mv[80:96])
+
+    sections = []
+    for i in range(count):
+        (sec_offset, sec_length, _, _, _, _, type_raw, _, sec_severity,
+         fru_text) = DESCRIPTOR.unpack_from(mv, HEADER_SIZE + i * DESCRIPTOR_SIZE)
+        type_raw = bytes(type_raw)
+        kind, decoder, min_size = SECTION_DECODERS.get(type_raw, ("unknown", None, 0))
+        fields = {}
+        if decoder is not None:
+            if sec_offset + max(sec_length, min_size) > length or sec_length < min_size:
+                raise CperError(f"секция {i} ({kind}) выходит за границы записи")
+            fields = decoder(mv, sec_offset)
+        sections.append(CperSection(
+            kind, format_guid(type_raw), sec_severity,
+            bytes(fru_text).split(b"\x00", 1)[0].decode("ascii", "replace"), fields))
+    return CperRecord(revision, severity, record_id, timestamp, creator, notification, tuple(sections))
+
+
+def decode_batch(payloads):
+    """Разобрать много записей за раз. Для неразобранных — None на той же позиции."""
+    results = []
+    append = results.append
+    for payload in payloads:
+        if payload is None:
+            append(None)
+            continue
+        try:
+            append(decode_record(payload))
+        except (CperError, struct.error):
+            append(None)
+    return results
+
+
+def iter_records(buffer):
+    """Записи CPER, идущие подряд в одном буфере; разбор останавливается на первой неверной."""
+    mv = memoryview(buffer)
+    offset = 0
+    while len(mv) - offset >= HEADER_SIZE:
+        length = struct.unpack_from("<I", mv, offset + 20)[0]
+        if length < HEADER_SIZE:
+            return
+        try:
+            yield decode_record(mv[offset:offset + length])
+        except (CperError, struct.error):
+            return
+        offset += length
+
+
+# --- записи журнала ---
+
+HEX_SIGNATURE = CPER_SIGNATURE.hex().upper()  # "43504552"
+
+
+def payload_from_event(record):
+    """Двоичные данные CPER события журнала (pywin32 или EventRecord) или None.
+
+    Классический API отдаёт их в Data; при чтении через XML (подписка) RawData
+    приходит шестнадцатеричной строкой среди StringInserts.
+    """
+    data = getattr(record, "Data", None)
+    if data and bytes(data[:4]) == CPER_SIGNATURE:
+        return memoryview(data)
+    for insert in getattr(record, "StringInserts", None) or ():
+        if isinstance(insert, str) and len(insert) >= HEADER_SIZE * 2 and insert[:8].upper() == HEX_SIGNATURE:
+            try:
+                return memoryview(bytes.fromhex(insert))
+            except ValueError:
+                return None
+    return None
+
+
+def describe_section(section):
+    f = section.fields
+    if section.kind == "memory":
+        where = ", ".join(f"{name} {f[key]}" for key, name in
+                          (("node", "узел"), ("card", "карта"), ("module", "модуль"), ("rank", "ранг"),
+                           ("bank", "банк")) if key in f)
+        text = "Память" + (f": {where}" if where else "")
+        if "address" in f:
+            text += f", адрес {f['address']}"
+        if "error_type" in f:
+            text += f" — {f['error_type']}"
+        return text
+    if section.kind == "mca":
+        text = f"Процессор {f['processor']}, банк MCA {f['mca_bank']}, MCi_STATUS {f['mci_status']}"
+        if "mci_addr" in f:
+            text += f", адрес {f['mci_addr']}"
+        return text
+    if section.kind == "processor":
+        parts = []
+        if "apic_id" in f:
+            parts.append(f"APIC {f['apic_id']}")
+        if "error_type" in f:
+            parts.append(f"ошибка: {f['error_type']}")
+        if "cache_level" in f:
+            parts.append(f"уровень {f['cache_level']}")
+        return "Процессор" + (f" ({', '.join(parts)})" if parts else "")
+    if section.kind == "pcie":
+        text = f"PCIe {f.get('bdf', '')}".rstrip()
+        if "vendor_id" in f:
+            text += f" [{f['vendor_id']}:{f['device_id']}]"
+        if "port_type" in f:
+            text += f", {f['port_type']}"
+        if "aer_uncorrectable" in f and f["aer_uncorrectable"] != "0x0":
+            text += f", AER UE {f['aer_uncorrectable']}"
+        elif "aer_correctable" in f:
+            text += f", AER CE {f['aer_correctable']}"
+        return text
+    return ""
+
+
+def describe_record(record):
+    """Краткое описание записи CPER по самым информативным секциям."""
+    parts = [text for text in (describe_section(s) for s in record.sections) if text]
+    return "; ".join(dict.fromkeys(parts))
+
+
+def locate_section(section):
+    """Место ошибки без изменчивых подробностей (адреса, статуса): модуль памяти, банк MCA, устройство."""
+    f = section.fields
+    if section.kind == "memory":
+        return "mem:" + "/".join(str(f.get(key, "-")) for key in ("node", "card", "module", "rank"))
+    if section.kind == "mca":
+        return f"mca:{f['processor']}/{f['mca_bank']}"
+    if section.kind == "pcie":
+        return f"pcie:{f.get('bdf', '-')}"
+    if section.kind == "processor":
+        return f"cpu:{f.get('apic_id', '-')}"
+    return ""
+
+
+def locate_record(record):
+    return ",".join(dict.fromkeys(loc for loc in (locate_section(s) for s in record.sections) if loc))
+
+
+def describe_event(record):
+    """(описание, место) из двоичных данных события журнала; ("", "") — данных нет или формат не CPER."""
+    payload = payload_from_event(record)
+    if payload is None:
+        return "", ""
+    try:
+        decoded = decode_record(payload)
+    except (CperError, struct.error):
+        return "", ""
+    return describe_record(decoded), locate_record(decoded)
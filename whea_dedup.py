@@ -0,0 +1,181 @@
+"""Дедупликация повторяющихся WHEA-событий по отпечатку.
+
+Неисправный модуль памяти или канал PCIe может записать одну и ту же исправленную
+ошибку тысячи раз. Отпечаток события — (хост, код, источник, место из записи CPER),
+поэтому повторы одной неисправности сливаются в одну строку таблицы с временем первого
+и последнего появления и счётчиком. Дальше по конвейеру (журнал, история, триггер)
+идёт только изменение: первое появление отпечатка и не чаще раза в report_interval
+секунд — сводка накопившихся повторов (WheaEvent.occurrences). Обнаружение из одних
+сводок помечено Detection.summary: оно попадает в журнал и отчёты, но не в триггер,
+иначе одна повторяющаяся ошибка запускала бы действия каждые report_interval секунд. Сводки отправляются
+и при следующем событии хоста, и по таймеру (sweep()), поэтому повторы затихшего
+всплеска не ждут нового события или остановки мониторинга.
+
+Таблица ограничена max_entries строками; при переполнении вытесняется давно не
+встречавшийся отпечаток (LRU), а его ещё не отправленные повторы уходят сводкой.
+Пороги частоты (whea_rates) считают исходные события, до дедупликации.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from whea_core import Detection
+from whea_metrics import METRICS
+
+
+DEDUP_MAX_ENTRIES = 1024     # dedup_max_entries
+DEDUP_REPORT_INTERVAL = 300  # dedup_report_interval: как часто отправлять сводку повторов, с
+DEDUP_SWEEP_INTERVAL = 5     # Как часто приложение вызывает sweep(), с
+
+
+class FingerprintEntry:
+    __slots__ = ("first_seen", "last_seen", "count", "pending", "last_report", "event")
+
+    def __init__(self, now, event):
+        self.first_seen = now
+        self.last_seen = now
+        self.count = 1
+        self.pending = 0      # Повторы после последней отправки
+        self.last_report = now
+        self.event = event    # Последнее событие с этим отпечатком (WheaEvent)
+
+
+def fingerprint(event, host):
+    return host, event.event_id, event.source, event.location
+
+
+class FingerprintTable:
+    """Ограниченная LRU-таблица отпечатков. process() вызывается из потоков обнаружения."""
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES, report_interval=DEDUP_REPORT_INTERVAL):
+        self.max_entries = max(1, int(max_entries))
+        self.report_interval = float(report_interval)
+        self.entries = OrderedDict()
+        self.orphans = {}  # хост -> сводки вытесненных отпечатков, ещё не переданные дальше
+        self.orphan_totals = {}  # хост -> сколько всего событий было у этих отпечатков
+        self.lock = threading.Lock()
+        self.last_sweep = {}  # хост -> время последней проверки его сводок в process()
+        self.raw_events = 0
+        self.reported_events = 0
+        self.evicted = 0
+
+    def configure(self, max_entries, report_interval):
+        with self.lock:
+            self.max_entries = max(1, int(max_entries))
+            self.report_interval = float(report_interval)
+
+    def process(self, detection, now=None):
+        """Свернуть обнаружение до изменений отпечатков.
+
+        Возвращает Detection, в котором events — новые отпечатки и сводки повторов
+        (occurrences — сколько исходных событий за каждой записью), или None, если
+        все события — повторы, о которых ещё рано сообщать.
+        """
+        now = time.time() if now is None else now
+        host = detection.host
+        out = {}
+        fresh = False
+        with self.lock:
+            entries = self.entries
+            for ev in detection.events:
+                self.raw_events += 1
+                key = fingerprint(ev, host)
+                entry = entries.get(key)
+                if entry is None:
+                    entries[key] = FingerprintEntry(now, ev)
+                    out[key] = ev
+                    fresh = True
+                    if len(entries) > self.max_entries:
+                        self.evict(out)
+                    continue
+                entries.move_to_end(key)
+                entry.count += 1
+                entry.pending += 1
+                entry.last_seen = now
+                entry.event = ev
+            if now - self.last_sweep.get(host, 0.0) >= 1.0:
+                self.last_sweep[host] = now
+                self.collect_due(now, out, host)
+            events = self.orphans.pop(host, []) + list(out.values())
+            self.orphan_totals.pop(host, None)
+            self.reported_events += len(events)
+        if not events:
+            return None
+        new_count = sum(ev.occurrences for ev in events)
+        return Detection(detection.count, new_count, detection.event_ids, events, host, summary=not fresh)
+
+    def summary_event(self, entry, now):
+        event = entry.event._replace(occurrences=entry.pending)
+        entry.pending = 0
+        entry.last_report = now
+        return event
+
+    def collect_due(self, now, out, host):
+        """Сводки повторов этого хоста, у которых прошёл report_interval с последней отправки."""
+        for key, entry in self.entries.items():
+            if key[0] == host and entry.pending and now - entry.last_report >= self.report_interval and key not in out:
+                out[key] = self.summary_event(entry, now)
+
+    def evict(self, out):
+        key, entry = self.entries.popitem(last=False)
+        self.evicted += 1
+        if entry.pending:
+            self.orphans.setdefault(key[0], []).append(self.summary_event(entry, entry.last_seen))
+            self.orphan_totals[key[0]] = self.orphan_totals.get(key[0], 0) + entry.count
+
+    def sweep(self, now=None):
+        """Сводки всех хостов, у которых прошёл report_interval, и сводки вытесненных
+        отпечатков: список Detection по хостам. Вызывается по таймеру."""
+        now = time.time() if now is None else now
+        return self.collect(now, due_only=True)
+
+    def flush(self):
+        """Все ещё не отправленные повторы (при остановке мониторинга): список Detection по хостам."""
+        return self.collect(time.time(), due_only=False)
+
+    def collect(self, now, due_only):
+        """Сводки по хостам; count — сколько всего событий с этими отпечатками с первого появления."""
+        with self.lock:
+            by_host = self.orphans
+            self.orphans = {}
+            totals, self.orphan_totals = self.orphan_totals, {}
+            for key, entry in self.entries.items():
+                if entry.pending and (not due_only or now - entry.last_report >= self.report_interval):
+                    by_host.setdefault(key[0], []).append(self.summary_event(entry, now))
+                    totals[key[0]] = totals.get(key[0], 0) + entry.count
+            self.reported_events += sum(len(events) for events in by_host.values())
+        return [
+            Detection(totals.get(host, 0), sum(ev.occurrences for ev in events), sorted({ev.event_id for ev in events}),
+                      events, host, summary=True)
+            for host, events in by_host.items()
+        ]
+
+    def snapshot(self):
+        """Строки таблицы: отпечаток, первое и последнее появление, общее число событий."""
+        with self.lock:
+            return [
+                {"host": key[0], "event_id": key[1], "source": key[2], "location": key[3],
+                 "first_seen": entry.first_seen, "last_seen": entry.last_seen, "count": entry.count}
+                for key, entry in self.entries.items()
+            ]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "fingerprints": len(self.entries),
+                "raw_events": self.raw_events,
+                "reported_events": self.reported_events,
+                "evicted": self.evicted,
+            }
+
+
+def table_from_config(cfg):
+    """FingerprintTable по конфигурации или None, если дедупликация выключена (dedup_enabled)."""
+    if not cfg.get("dedup_enabled", True):
+        return None
+    table = FingerprintTable(cfg.get("dedup_max_entries", DEDUP_MAX_ENTRIES),
+                             cfg.get("dedup_report_interval", DEDUP_REPORT_INTERVAL))
+    METRICS.gauge("whead_dedup_fingerprints", "Отпечатков в таблице дедупликации", lambda: len(table.entries))
+    METRICS.gauge("whead_dedup_events", "События до и после дедупликации",
+                  lambda: {"raw": table.raw_events, "reported": table.reported_events}, "stage")
+    return table
@@ -0,0 +1,411 @@
+"""Headless-режим WHEAD: тот же путь обнаружения и триггеров, но без PyQt6 и окна.
+
+    python whea_headless.py [--interval 30] [--once] [--json] [--source poll|subscribe]
+    python whea_headless.py --hosts srv1,srv2,srv3 [--workers 8] [--host-timeout 60]
+    python whea_headless.py --metrics-port 9187   # /metrics (Prometheus) и /metrics.json
+    python WHEA.py --headless [те же параметры]
+
+Для серверов и планировщика задач. PyQt6 в этом режиме не импортируется вовсе,
+поэтому запуск быстрее и памяти нужно меньше; --stats выводит время запуска и
+пиковый объём памяти процесса. --simulate позволяет проверить путь целиком вне Windows;
+проверочные события не попадают в историю, LTC-Errors.log, триггер, поток событий и на сборщик.
+"""
+import time
+
+STARTED_AT = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+from whea_core import (
+    MAX_RECORDS_PER_TICK, load_config, set_log_level, configure_logs, flush_logs, write_log, WARNING, ConfigWatcher,
+    EventLogCursor, EventLogHandlePool, ScanStats, WheaDetector, matcher_from_config, channels_from_config,
+)
+from whea_sources import create_event_source, timed_poll, SimulatedEventSource, MultiChannelEventSource
+from whea_triggers import detection_message, log_detection, log_rate_alert, TriggerExecutor
+from whea_rates import RateDetector, load_rules
+from whea_dedup import table_from_config, DEDUP_MAX_ENTRIES, DEDUP_REPORT_INTERVAL, DEDUP_SWEEP_INTERVAL
+from whea_rules import compile_rules
+from whea_hosts import MultiHostMonitor, EventLogFetcher
+from whea_metrics import MetricsServer
+from whea_ipc import server_from_config
+from whea_report import reporter_from_config
+from whea_schedule import scheduler_from_config, format_decision
+
+IMPORTED_AT = time.perf_counter()
+
+
+def peak_memory_mb():
+    """Пиковый объём памяти процесса (МБ) или None, если узнать не удалось."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    except Exception:
+        pass
+    return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WHEAD без GUI: мониторинг WHEA-ошибок в консоли")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--interval", type=int, default=30, help="Интервал опроса в секундах (1–3600); после обнаружения опрос временно чаще")
+    parser.add_argument("--once", action="store_true", help="Один проход чтения и выход")
+    parser.add_argument("--json", action="store_true", help="Вывод в JSON (NDJSON для непрерывного режима)")
+    parser.add_argument("--source", choices=["poll", "subscribe"], help="Источник событий (по умолчанию из конфигурации)")
+    parser.add_argument("--log-level", help="Уровень LTC-Logger.log: debug, info, warning, error")
+    parser.add_argument("--no-history", action="store_true", help="Не записывать события в историю SQLite")
+    parser.add_argument("--no-triggers", action="store_true", help="Не выполнять действия триггера")
+    parser.add_argument("--hosts", help="Хосты через запятую (по умолчанию из конфигурации или localhost)")
+    parser.add_argument("--workers", type=int, help="Потоков для параллельного опроса хостов")
+    parser.add_argument("--host-timeout", type=int, help="Таймаут опроса одного хоста в секундах")
+    parser.add_argument("--simulate", metavar="IDS", help="Вместо журнала выдать события с кодами через запятую (проверка вне Windows)")
+    parser.add_argument("--stats", action="store_true", help="Вывести в stderr время запуска и пиковую память")
+    parser.add_argument("--channels", help="Каналы журнала через запятую (по умолчанию из конфигурации: "
+                                           "System и Microsoft-Windows-Kernel-WHEA/Errors, /Operational)")
+    parser.add_argument("--metrics-port", type=int, help="Порт HTTP-эндпоинта метрик на 127.0.0.1 (0 — выключен)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.interval <= 3600:
+        parser.error("интервал должен быть от 1 до 3600")
+    if args.simulate:
+        args.no_history = args.no_triggers = True
+    return args
+
+
+class HeadlessMonitor:
+    """Связывает источник, обнаружение, историю и триггеры без Qt."""
+
+    def __init__(self, args, cfg):
+        self.args = args
+        self.cfg = cfg
+        self.matcher = matcher_from_config(cfg)
+        self.channels = ([c.strip() for c in args.channels.split(",") if c.strip()] if args.channels
+                         else channels_from_config(cfg))
+        self.detector = WheaDetector(self.matcher)
+        self.stats = ScanStats()
+        # Списки нужны только для итога --once; в непрерывном режиме за недели работы они бы росли без предела
+        self.detections = []
+        self.errors = []
+        self.detection_count = 0
+        self.error_count = 0
+        self.stop_event = threading.Event()
+        self.metrics_server = None
+        port = args.metrics_port if args.metrics_port is not None else int(cfg.get("metrics_port", 0))
+        if port:
+            try:
+                self.metrics_server = MetricsServer(port)
+                self.metrics_server.start()
+                write_log(f"Метрики доступны на http://127.0.0.1:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                self.metrics_server = None
+                write_log(f"Не удалось открыть порт метрик {port}: {e}", WARNING)
+        self.handles = EventLogHandlePool()
+        self.history = None
+        if cfg.get("history_enabled", True) and not args.no_history:
+            from whea_history import WheaHistory, RETENTION_DAYS
+            self.history = WheaHistory(retention_days=cfg.get("history_retention_days", RETENTION_DAYS))
+        self.rates = RateDetector(load_rules(cfg))
+        self.dedup = table_from_config(cfg)
+        self.next_sweep = time.monotonic() + DEDUP_SWEEP_INTERVAL
+        # Правка конфигурации применяется на лету (правила триггера, пороги, журнал)
+        self.config_watcher = None if args.once else ConfigWatcher(validate=compile_rules)
+        self.triggers = None
+        if not args.no_triggers:
+            self.triggers = TriggerExecutor(cfg)
+            self.triggers.start()
+        self.source = None
+        self.host_monitor = None
+        self.scheduler = None
+        self.started = time.time()
+        # Однократный проход не держит поток событий: подписчики не успели бы подключиться
+        self.ipc = None if args.once or args.simulate else server_from_config(cfg, self.current_state)
+        # При --once пачка отправляется при выходе, а если сборщик недоступен — досылается следующим запуском
+        self.reporter = None if args.simulate else reporter_from_config(cfg)
+        hosts = [h.strip() for h in args.hosts.split(",") if h.strip()] if args.hosts else cfg.get("hosts")
+        if hosts and hosts != ['localhost'] and not args.simulate:
+            self.host_monitor = self.create_host_monitor(hosts)
+        else:
+            self.source = self.create_source()
+
+    def create_host_monitor(self, hosts):
+        fetch = EventLogFetcher(
+            EventLogCursor(), time.time(), int(self.cfg.get("max_records_per_tick", MAX_RECORDS_PER_TICK)),
+            self.channels, handles=self.handles, matcher=self.matcher)
+        return MultiHostMonitor(
+            hosts, fetch, self.handle_detection, self.on_error,
+            interval=self.args.interval,
+            max_workers=self.args.workers or int(self.cfg.get("host_workers", 8)),
+            timeout=self.args.host_timeout or int(self.cfg.get("host_timeout", 60)),
+            matcher=self.matcher,
+        )
+
+    def create_source(self):
+        if self.args.simulate:
+            ids = [int(x) for x in self.args.simulate.split(",") if x.strip()]
+            return SimulatedEventSource([(0, ids)])
+        kwargs = dict(
+            cursor=EventLogCursor(),
+            since=time.time(),
+            max_records=int(self.cfg.get("max_records_per_tick", MAX_RECORDS_PER_TICK)),
+            stats=self.stats,
+            handles=self.handles,
+            channels=self.channels,
+            matcher=self.matcher,
+        )
+        if self.args.once:
+            return MultiChannelEventSource(**kwargs)
+        return create_event_source(self.args.source or self.cfg.get("event_source", "poll"), **kwargs)
+
+    def on_events(self, events):
+        detection = self.detector.process(events)
+        if detection is not None:
+            if self.scheduler is not None:
+                self.scheduler.on_detection()
+            self.handle_detection(detection)
+
+    def handle_detection(self, detection):
+        """Пороги частоты считают все события; журнал, история и триггер — только изменения отпечатков."""
+        self.detection_count += 1
+        if self.args.once:
+            self.detections.append(detection)
+        for alert in self.rates.update(detection.events, detection.host):
+            self.publish("rate_alert", alert.to_dict())
+            msg = alert.message() if self.args.simulate else log_rate_alert(alert)
+            if not self.args.once:
+                self.emit({"rate_alert": alert.to_dict()} if self.args.json else msg)
+            if self.triggers is not None:
+                self.triggers.submit(alert)
+        if self.dedup is not None:
+            detection = self.dedup.process(detection)
+            if detection is None:
+                return
+        self.report_detection(detection)
+
+    def report_detection(self, detection):
+        if self.history is not None:
+            self.history.add(detection.events, host=detection.host)
+        self.publish("detection", detection.to_dict())
+        msg = detection_message(detection) if self.args.simulate else log_detection(detection)
+        if not self.args.once:
+            self.emit(detection.to_dict() if self.args.json else msg)
+        if self.triggers is not None and not self.rates.rules and not detection.summary:
+            self.triggers.submit(detection)
+
+    def sweep_dedup(self):
+        """Сводки повторов, срок которых подошёл, без ожидания нового события."""
+        if self.dedup is None or time.monotonic() < self.next_sweep:
+            return
+        self.next_sweep = time.monotonic() + DEDUP_SWEEP_INTERVAL
+        for detection in self.dedup.sweep():
+            self.report_detection(detection)
+
+    def publish(self, kind, payload):
+        if self.ipc is not None:
+            self.ipc.publish(kind, payload)
+        if self.reporter is not None:
+            self.reporter.submit(kind, payload)
+
+    def current_state(self):
+        """Ответ на запрос state потока событий (из потока клиента)."""
+        return {
+            "pid": os.getpid(),
+            "running": not self.stop_event.is_set(),
+            "source": self.source.name if self.source is not None else "hosts",
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "total": self.detector.total_count,
+            "detections": self.detection_count,
+            "errors": self.error_count,
+            "event_ids": sorted(self.detector.found_event_ids),
+            "hosts": self.host_monitor.snapshot() if self.host_monitor is not None else [],
+            "rates": self.rates.snapshot(),
+            "dedup": self.dedup.stats() if self.dedup is not None else None,
+            "triggers": self.triggers.stats() if self.triggers is not None else None,
+            "report": self.reporter.snapshot() if self.reporter is not None else None,
+            "poll": self.scheduler.snapshot() if self.scheduler is not None else None,
+        }
+
+    def check_config(self):
+        if self.config_watcher is None:
+            return
+        cfg = self.config_watcher.poll()
+        if cfg is None or cfg == self.cfg:
+            return
+        self.cfg = cfg
+        set_log_level(self.args.log_level or cfg.get("log_level", "info"))
+        configure_logs(cfg)
+        rules = load_rules(cfg)
+        if [r.to_dict() for r in rules] != [r.to_dict() for r in self.rates.rules]:
+            self.rates.set_rules(rules)
+        if self.dedup is not None:
+            self.dedup.configure(cfg.get("dedup_max_entries", DEDUP_MAX_ENTRIES),
+                                 cfg.get("dedup_report_interval", DEDUP_REPORT_INTERVAL))
+        if self.triggers is not None:
+            self.triggers.update_config(cfg)
+        write_log("Конфигурация перечитана из файла после изменения")
+
+    def wait(self, delay):
+        """Пауза до следующего прохода с проверкой файла конфигурации; False — пора остановиться."""
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            interval = self.config_watcher.interval if self.config_watcher is not None else remaining
+            if self.stop_event.wait(min(remaining, interval, DEDUP_SWEEP_INTERVAL)):
+                return False
+            self.check_config()
+            self.sweep_dedup()
+
+    def on_error(self, text):
+        self.error_count += 1
+        if self.args.once:
+            self.errors.append(text)
+        self.publish("error", {"time": datetime.now().isoformat(timespec="seconds"), "text": text})
+        if self.args.json:
+            print(json.dumps({"error": text}, ensure_ascii=False), file=sys.stderr, flush=True)
+        else:
+            print(text, file=sys.stderr, flush=True)
+
+    def emit(self, item):
+        if isinstance(item, str):
+            print(item, flush=True)
+        else:
+            print(json.dumps(item, ensure_ascii=False), flush=True)
+
+    def run_once(self):
+        if self.host_monitor is not None:
+            self.host_monitor.start()
+            self.host_monitor.tick()
+            self.host_monitor.wait_idle(self.host_monitor.timeout)
+            self.host_monitor.stop(on_idle=self.handles.close_all)
+            summary = {"hosts": self.host_monitor.snapshot()}
+        else:
+            self.source.start(self.on_events, self.on_error)
+            timed_poll(self.source)
+            self.source.stop()
+            summary = {"scan": self.stats.tick}
+        if self.args.json:
+            self.emit({
+                "detections": [d.to_dict() for d in self.detections],
+                "count": sum(d.new_count for d in self.detections),
+                "event_ids": sorted({eid for d in self.detections for eid in d.event_ids}),
+                **summary,
+                "errors": self.errors,
+            })
+        elif self.detections:
+            for detection in self.detections:
+                print(detection_message(detection))
+        else:
+            print("Новых ошибок WHEA не найдено")
+
+    def run_forever(self):
+        if self.host_monitor is not None:
+            self.run_hosts_forever()
+            return
+        write_log(f"Headless-мониторинг WHEA запущен (источник: {self.source.name}) с интервалом {self.args.interval} секунд")
+        if self.source.needs_polling:
+            self.scheduler = scheduler_from_config(self.cfg, self.args.interval)
+        self.source.start(self.on_events, self.on_error)
+        try:
+            while not self.stop_event.is_set():
+                if self.source.needs_polling:
+                    duration = timed_poll(self.source)
+                    self.reschedule(duration)
+                self.wait(self.scheduler.next_delay() if self.scheduler is not None else self.args.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.source.stop()
+            write_log("Headless-мониторинг WHEA остановлен")
+
+    def reschedule(self, duration):
+        if self.scheduler is None:
+            return
+        tick = self.stats.tick
+        decision = self.scheduler.on_poll(duration, tick["records_scanned"], tick["budget_exhausted"] > 0)
+        if decision is not None:
+            write_log(format_decision(decision))
+
+    def run_hosts_forever(self):
+        hosts = ', '.join(state.host for state in self.host_monitor.states)
+        write_log(f"Headless-мониторинг WHEA запущен для хостов {hosts} с интервалом {self.args.interval} секунд")
+        self.host_monitor.start()
+        try:
+            while not self.stop_event.is_set():
+                self.host_monitor.tick()
+                self.stop_event.wait(0.5)
+                self.check_config()
+                self.sweep_dedup()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.host_monitor.stop(on_idle=self.handles.close_all)
+            write_log("Headless-мониторинг WHEA остановлен")
+
+    def close(self):
+        if self.dedup is not None:
+            for detection in self.dedup.flush():
+                self.report_detection(detection)
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.ipc is not None:
+            self.ipc.stop()
+        if self.reporter is not None:
+            self.reporter.stop(send=self.args.once)
+        if self.triggers is not None:
+            self.triggers.stop()
+        if self.host_monitor is None:
+            self.handles.close_all()  # Хосты закрывают хендлы сами, когда завершатся начатые опросы
+        if self.history is not None:
+            self.history.close()
+        flush_logs()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cfg = load_config()
+    set_log_level(args.log_level or cfg.get("log_level", "info"))
+    configure_logs(cfg)
+    monitor = HeadlessMonitor(args, cfg)
+    ready_at = time.perf_counter()
+    if args.stats:
+        memory = peak_memory_mb()
+        memory_str = f"{memory:.1f} МБ" if memory is not None else "н/д"
+        print(f"Импорт: {(IMPORTED_AT - STARTED_AT) * 1000:.1f} мс, готовность: {(ready_at - STARTED_AT) * 1000:.1f} мс, "
+              f"пиковая память: {memory_str}", file=sys.stderr)
+    try:
+        if args.once:
+            monitor.run_once()
+        else:
+            monitor.run_forever()
+    finally:
+        monitor.close()
+    # Для --once ошибка чтения журнала видна по коду возврата (планировщик, скрипты проверки)
+    return 1 if args.once and monitor.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
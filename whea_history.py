@@ -0,0 +1,262 @@
+"""История обнаруженных WHEA-событий в SQLite (LTC-History.sqlite в APPDATA).
+
+Каждое событие, прошедшее через WheaDetector, записывается фоновым потоком пачками
+(одна транзакция на пачку, журнал WAL). Повторы одной неисправности после дедупликации
+(whea_dedup) хранятся одной строкой с числом событий occurrences, поэтому счётчики
+считаются через SUM(occurrences). Индексы по (event_id, timestamp) и по номеру
+записи позволяют быстро отвечать на вопросы вида «сколько ошибок 19 было за неделю».
+Старые записи удаляются по сроку хранения (history_retention_days).
+
+    python whea_history.py summary --days 7 [--id 19] [--hourly]
+    python whea_history.py events --days 1 [--id 47] [--limit 50]
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from whea_core import APPDATA_DIR, write_log, WARNING
+
+
+HISTORY_PATH = os.path.join(APPDATA_DIR, "LTC-History.sqlite")
+
+# Срок хранения событий по умолчанию (ключ конфигурации history_retention_days)
+RETENTION_DAYS = 180
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id            INTEGER PRIMARY KEY,
+    host          TEXT    NOT NULL DEFAULT 'localhost',
+    record_number INTEGER NOT NULL,
+    event_id      INTEGER NOT NULL,
+    source        TEXT    NOT NULL DEFAULT '',
+    level         INTEGER NOT NULL DEFAULT 0,
+    timestamp     INTEGER NOT NULL,
+    inserts       TEXT,
+    details       TEXT    NOT NULL DEFAULT '',
+    occurrences   INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_events_id_time ON events (event_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_record ON events (record_number, host, timestamp);
+"""
+
+
+class WheaHistory:
+    """Хранилище истории: запись из фонового потока, запросы — из любого потока.
+
+    add() только кладёт события в очередь. Поток записи собирает их в пачки не больше
+    batch_size и не реже flush_interval секунд. Для запросов каждый раз открывается
+    отдельное соединение — в режиме WAL чтение не мешает записи.
+    """
+
+    def __init__(self, path=HISTORY_PATH, retention_days=RETENTION_DAYS, batch_size=500,
+                 flush_interval=1.0, max_queue=100000):
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_queue)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.inserted = 0
+        self.last_compact = 0.0
+        conn = self.connect()
+        try:
+            # auto_vacuum задаётся до создания таблиц, иначе место после удаления не освобождается
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+            # База из прежней версии: новые столбцы добавляются без пересоздания таблицы
+            if "details" not in columns:
+                conn.execute("ALTER TABLE events ADD COLUMN details TEXT NOT NULL DEFAULT ''")
+            if "occurrences" not in columns:
+                conn.execute("ALTER TABLE events ADD COLUMN occurrences INTEGER NOT NULL DEFAULT 1")
+        finally:
+            conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- запись ---
+
+    def add(self, events, host='localhost'):
+        """Поставить в очередь записи WheaEvent. Никогда не блокирует вызывающий поток."""
+        if self.thread is None:
+            self.start()
+        for ev in events:
+            try:
+                self.queue.put_nowait((host, ev))
+            except queue.Full:
+                self.dropped += 1
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="WHEAD-history", daemon=True)
+                self.thread.start()
+
+    def flush(self, timeout=10.0):
+        """Дождаться записи всего, что поставлено в очередь до вызова."""
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        if self.thread is None:
+            return
+        self.flush(timeout)
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def run(self):
+        conn = self.connect()
+        try:
+            self.compact(conn)
+            stop = False
+            while not stop:
+                rows, waiters = [], []
+                try:
+                    item = self.queue.get()
+                    deadline = time.monotonic() + self.flush_interval
+                    while True:
+                        if item is None:
+                            stop = True
+                            break
+                        if isinstance(item, threading.Event):
+                            waiters.append(item)
+                            break
+                        host, ev = item
+                        rows.append((host, ev.record_number, ev.event_id, ev.source, ev.level,
+                                     ev.timestamp, json.dumps(ev.inserts, ensure_ascii=False), ev.details,
+                                     ev.occurrences))
+                        if len(rows) >= self.batch_size:
+                            break
+                        item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    pass
+                if rows:
+                    self.insert(conn, rows)
+                for done in waiters:
+                    done.set()
+                if time.time() - self.last_compact > 24 * 3600:
+                    self.compact(conn)
+        finally:
+            conn.close()
+
+    def insert(self, conn, rows):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO events (host, record_number, event_id, source, level, timestamp, inserts, details, "
+                    "occurrences) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.inserted += len(rows)
+        except sqlite3.Error as e:
+            write_log(f"Ошибка записи истории WHEA ({len(rows)} событий): {e}", WARNING)
+
+    def compact(self, conn):
+        """Удалить события старше срока хранения и вернуть освободившееся место."""
+        self.last_compact = time.time()
+        if not self.retention_days:
+            return
+        cutoff = int(time.time() - self.retention_days * 24 * 3600)
+        try:
+            with conn:
+                deleted = conn.execute("DELETE FROM events WHERE timestamp < ?", (cutoff,)).rowcount
+            if deleted:
+                conn.execute("PRAGMA incremental_vacuum")
+                write_log(f"История WHEA: удалено событий старше {self.retention_days} дн.: {deleted}")
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            write_log(f"Ошибка очистки истории WHEA: {e}", WARNING)
+
+    # --- запросы ---
+
+    def query(self, sql, params=()):
+        conn = self.connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def time_filter(since, until, event_id=None):
+        where, params = ["timestamp >= ?", "timestamp < ?"], [int(since or 0), int(until or 2 ** 62)]
+        if event_id is not None:
+            where.insert(0, "event_id = ?")
+            params.insert(0, int(event_id))
+        return " AND ".join(where), params
+
+    def count_by_id(self, since=None, until=None):
+        """{event_id: количество} за интервал [since, until) (секунды epoch)."""
+        where, params = self.time_filter(since, until)
+        rows = self.query(f"SELECT event_id, SUM(occurrences) FROM events WHERE {where} GROUP BY event_id", params)
+        return dict(rows)
+
+    def count(self, event_id, since=None, until=None):
+        where, params = self.time_filter(since, until, event_id)
+        return self.query(f"SELECT COALESCE(SUM(occurrences), 0) FROM events WHERE {where}", params)[0][0]
+
+    def hourly(self, event_id=None, since=None, until=None):
+        """[(начало часа epoch, количество)] — распределение событий по часам."""
+        where, params = self.time_filter(since, until, event_id)
+        return self.query(
+            f"SELECT timestamp - timestamp % 3600 AS hour, SUM(occurrences) FROM events WHERE {where} "
+            "GROUP BY hour ORDER BY hour", params)
+
+    def events(self, since=None, until=None, event_id=None, limit=1000):
+        """Последние события за интервал: [(timestamp, event_id, record_number, source, host, details, occurrences)]."""
+        where, params = self.time_filter(since, until, event_id)
+        return self.query(
+            f"SELECT timestamp, event_id, record_number, source, host, details, occurrences FROM events WHERE {where} "
+            "ORDER BY timestamp DESC LIMIT ?", params + [int(limit)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запросы к истории WHEA-событий")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="Количество событий по кодам за последние дни")
+    p.add_argument("--days", type=float, default=7)
+    p.add_argument("--id", type=int, dest="event_id")
+    p.add_argument("--hourly", action="store_true", help="Распределение по часам")
+    p.add_argument("--path", default=HISTORY_PATH)
+    p = sub.add_parser("events", help="Последние события с описанием из записи CPER")
+    p.add_argument("--days", type=float, default=1)
+    p.add_argument("--id", type=int, dest="event_id")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--path", default=HISTORY_PATH)
+    args = parser.parse_args(argv)
+
+    history = WheaHistory(args.path, retention_days=0)
+    since = time.time() - args.days * 24 * 3600
+    if args.command == "events":
+        for timestamp, event_id, record_number, source, host, details, occurrences in history.events(
+                since, None, args.event_id, args.limit):
+            when = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            repeats = f"  x{occurrences}" if occurrences > 1 else ""
+            print(f"{when}  {host}  {event_id}  #{record_number}  {details or source}{repeats}")
+    elif args.hourly:
+        for hour, count in history.hourly(args.event_id, since):
+            print(f"{datetime.fromtimestamp(hour).strftime('%Y-%m-%d %H:00')}  {count}")
+    elif args.event_id is not None:
+        print(f"{args.event_id}: {history.count(args.event_id, since)}")
+    else:
+        for event_id, count in sorted(history.count_by_id(since).items()):
+            print(f"{event_id}: {count}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Параллельный опрос журналов нескольких хостов с ограничением числа одновременных опросов.
+
+У каждого хоста свой курсор, своё расписание, свой таймаут с экспоненциальной
+задержкой после ошибок и своё состояние обнаружения (WheaDetector), поэтому
+медленный или недоступный хост не задерживает остальные. Функция чтения fetch(host)
+подключаемая: по умолчанию — EventLogFetcher (каналы EVENT_CHANNELS через pywin32), для
+проверки на Linux подойдёт любой поддельный источник (см. whea_bench.py hosts).
+"""
+import threading
+import time
+
+from whea_core import (
+    MAX_RECORDS_PER_TICK, EVENT_CHANNELS, DEFAULT_MATCHER, EventLogCursor, EventLogHandlePool, ScanStats,
+    WheaDetector, write_log, WARNING,
+)
+from whea_sources import MultiChannelEventSource
+from whea_metrics import POLL_DURATION, POLL_ERRORS
+
+
+class EventLogFetcher:
+    """fetch(host) через журнал событий Windows: отдельный MultiChannelEventSource на каждый хост."""
+
+    def __init__(self, cursor=None, since=None, max_records=MAX_RECORDS_PER_TICK, channels=EVENT_CHANNELS,
+                 handles=None, matcher=DEFAULT_MATCHER):
+        self.cursor = cursor if cursor is not None else EventLogCursor()
+        self.handles = handles if handles is not None else EventLogHandlePool()
+        self.since = since
+        self.max_records = max_records
+        self.channels = channels
+        self.matcher = matcher
+        self.sources = {}
+
+    def __call__(self, host):
+        source = self.sources.get(host)
+        if source is None:
+            source = MultiChannelEventSource(host, self.channels, self.cursor, self.since, self.max_records,
+                                             ScanStats(), self.handles, self.matcher)
+            self.sources[host] = source
+        return source.read()
+
+
+class HostState:
+    """Состояние опроса одного хоста."""
+
+    def __init__(self, host, matcher):
+        self.host = host
+        self.detector = WheaDetector(matcher, host)
+        self.next_due = 0.0
+        self.failures = 0
+        self.started = None      # Время начала текущего опроса (None — опрос не идёт)
+        self.timed_out = False
+        self.polls = 0
+        self.events = 0
+        self.last_error = None
+        self.last_duration = None
+
+    def snapshot(self):
+        return {
+            "host": self.host,
+            "polls": self.polls,
+            "events": self.events,
+            "detections": self.detector.total_count,
+            "failures": self.failures,
+            "in_flight": self.started is not None,
+            "hung": self.started is not None and self.timed_out,
+            "last_error": self.last_error,
+            "last_duration": self.last_duration,
+        }
+
+
+class MultiHostMonitor:
+    """Планировщик опроса хостов.
+
+    tick() вызывается часто (таймером GUI или циклом headless-режима) и только запускает
+    опросы хостов, у которых подошло время; сам никогда не ждёт чтения. Одновременно идёт
+    не больше max_workers опросов, каждый в своём потоке. Хост, который не ответил за
+    timeout секунд, считается сбойным: его опрос перестаёт занимать место среди
+    max_workers (зависшие чтения учитываются отдельно, в hung), но сам хост повторно не
+    запускается, пока зависший опрос не завершится, — так зависшие хосты не мешают
+    опросу исправных, а один хост занимает не больше одного потока.
+    on_detection(detection) и on_error(text) вызываются из потоков опроса.
+    """
+
+    def __init__(self, hosts, fetch, on_detection, on_error=None, interval=30, max_workers=8,
+                 timeout=60, backoff_max=3600, matcher=DEFAULT_MATCHER):
+        self.fetch = fetch
+        self.on_detection = on_detection
+        self.on_error = on_error
+        self.interval = interval
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.backoff_max = backoff_max
+        self.states = [HostState(host, matcher) for host in dict.fromkeys(hosts)]
+        self.lock = threading.Lock()
+        self.running = False
+        self.active = 0    # Опросов, занимающих место среди max_workers
+        self.hung = 0      # Опросов, переживших timeout и ещё не вернувшихся
+        self.on_idle = None
+
+    def start(self):
+        now = time.monotonic()
+        with self.lock:
+            self.running = True
+            self.on_idle = None
+            for state in self.states:
+                state.next_due = now
+
+    def stop(self, on_idle=None):
+        """Остановить запуск новых опросов. Уже начатые не прерываются: on_idle() (например,
+        закрытие хендлов журналов, которыми они пользуются) вызывается, когда завершится
+        последний из них, — сразу, если опросов нет."""
+        with self.lock:
+            self.running = False
+            if any(state.started is not None for state in self.states):
+                self.on_idle = on_idle
+                return
+        if on_idle is not None:
+            on_idle()
+
+    def backoff(self, failures):
+        return min(self.backoff_max, self.interval * (2 ** failures))
+
+    def tick(self):
+        """Запустить опросы хостов, которым пора; отметить зависшие. Возвращает число запущенных."""
+        now = time.monotonic()
+        due = []
+        timed_out = []
+        with self.lock:
+            if not self.running:
+                return 0
+            for state in self.states:
+                if state.started is not None:
+                    if not state.timed_out and now - state.started > self.timeout:
+                        state.timed_out = True
+                        state.failures += 1
+                        state.last_error = f"нет ответа за {self.timeout} с"
+                        self.active -= 1
+                        self.hung += 1
+                        timed_out.append(state.host)
+            # Дольше всех ждущие хосты — первыми, если свободных мест меньше, чем хостов
+            waiting = sorted((s for s in self.states if s.started is None and now >= s.next_due),
+                             key=lambda s: s.next_due)
+            for state in waiting[:max(0, self.max_workers - self.active)]:
+                state.started = now
+                state.timed_out = False
+                self.active += 1
+                due.append(state)
+        for host in timed_out:
+            self.report_error(f"Хост {host} не ответил за {self.timeout} с")
+        for state in due:
+            threading.Thread(target=self.poll_host, args=(state,), name=f"WHEAD-host-{state.host}",
+                             daemon=True).start()
+        return len(due)
+
+    def poll_host(self, state):
+        started = time.monotonic()
+        try:
+            events = self.fetch(state.host)
+            error = None
+        except Exception as e:
+            events, error = [], e
+        try:
+            self.finish_poll(state, started, events, error)
+        finally:
+            on_idle = None
+            with self.lock:
+                if state.timed_out:
+                    self.hung -= 1
+                else:
+                    self.active -= 1
+                state.started = None
+                if not self.running and self.on_idle is not None and all(s.started is None for s in self.states):
+                    on_idle, self.on_idle = self.on_idle, None
+            if on_idle is not None:
+                on_idle()
+
+    def finish_poll(self, state, started, events, error):
+        finished = time.monotonic()
+        POLL_DURATION.observe(finished - started, "hosts")
+        if error is not None:
+            POLL_ERRORS.inc(1, "hosts")
+        with self.lock:
+            state.polls += 1
+            state.last_duration = finished - started
+            if error is not None:
+                if not state.timed_out:
+                    state.failures += 1
+                state.last_error = str(error)
+                delay = self.backoff(state.failures)
+                state.next_due = finished + delay
+            else:
+                state.failures = 0
+                state.last_error = None
+                state.next_due = started + self.interval
+                state.events += len(events)
+
+        if error is not None:
+            self.report_error(f"Ошибка опроса хоста {state.host}: {error}; следующая попытка через {delay:.0f} с")
+            return
+        detection = state.detector.process(events)
+        if detection is not None:
+            self.on_detection(detection)
+
+    def report_error(self, text):
+        write_log(text, WARNING)
+        if self.on_error is not None:
+            self.on_error(text)
+
+    def snapshot(self):
+        with self.lock:
+            return [state.snapshot() for state in self.states]
+
+    def wait_idle(self, timeout=None):
+        """Дождаться окончания всех начатых опросов (для однократного прохода). False — истёк timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if all(state.started is None for state in self.states):
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
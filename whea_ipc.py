@@ -0,0 +1,444 @@
+"""Локальный поток событий WHEAD для других программ (агенты инвентаризации, проверки здоровья).
+
+Точка подключения — именованный канал \\\\.\\pipe\\WHEAD в Windows (pywin32) или Unix-сокет
+whead.sock в каталоге данных. Клиент отправляет одну строку запроса:
+
+    {"cmd": "subscribe"}  (или просто subscribe) — поток NDJSON: detection, rate_alert, ...
+    {"cmd": "state"}      (или state)            — одна строка JSON с текущим состоянием
+
+У каждого подписчика своя ограниченная очередь: если клиент не успевает читать,
+отбрасываются самые старые строки, а клиент получает {"type": "dropped", "count": N}.
+publish() только сериализует сообщение один раз и раскладывает его по очередям,
+поэтому медленный подписчик никогда не задерживает обнаружение. Проверка из консоли:
+
+    python WHEA.py ipc subscribe
+    python WHEA.py ipc state
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from whea_core import APPDATA_DIR, write_log, write_debug, WARNING
+from whea_metrics import METRICS
+
+try:
+    import pywintypes
+    import win32event
+    import win32file
+    import win32pipe
+except ImportError:  # Не Windows: используется Unix-сокет
+    pywintypes = None
+    win32event = None
+    win32file = None
+    win32pipe = None
+
+
+IPC_NAME = "WHEAD"     # Ключ конфигурации ipc_name
+IPC_BUFFER = 256       # Ключ конфигурации ipc_buffer: строк в очереди одного подписчика
+REQUEST_TIMEOUT = 5.0  # Сколько ждать строку запроса от клиента, с
+PIPE_REJECT_REMOTE_CLIENTS = 0x8
+FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+ERROR_PIPE_CONNECTED = 535
+ERROR_IO_PENDING = 997
+
+IPC_DROPPED = METRICS.counter("whead_ipc_dropped_total", "Строк потока событий, отброшенных у медленных подписчиков")
+
+
+def pipe_path(name=IPC_NAME):
+    return f"\\\\.\\pipe\\{name}"
+
+
+def socket_path(name=IPC_NAME):
+    return os.path.join(APPDATA_DIR, f"{name.lower()}.sock")
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def parse_request(line):
+    """Команда из строки запроса: JSON {"cmd": ...} или просто слово."""
+    line = line.strip()
+    if line.startswith(b"{"):
+        try:
+            return str(json.loads(line.decode("utf-8")).get("cmd", "")).lower()
+        except (ValueError, AttributeError):
+            return ""
+    return line.decode("utf-8", "replace").lower()
+
+
+class SocketConnection:
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read_line(self, timeout=REQUEST_TIMEOUT, limit=4096):
+        self.sock.settimeout(timeout)
+        data = b""
+        try:
+            while b"\n" not in data and len(data) < limit:
+                chunk = self.sock.recv(limit)
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            self.sock.settimeout(None)
+        return data.split(b"\n", 1)[0]
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class PipeConnection:
+    """Сторона сервера одного экземпляра именованного канала.
+
+    Канал открыт в режиме overlapped: чтение строки запроса ждёт не дольше timeout, как
+    у Unix-сокета, а close() из другого потока прерывает незавершённую запись.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.overlapped = pywintypes.OVERLAPPED()
+        self.overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+
+    def connect(self):
+        """Дождаться клиента (ConnectNamedPipe)."""
+        try:
+            if win32pipe.ConnectNamedPipe(self.handle, self.overlapped) == ERROR_IO_PENDING:
+                win32file.GetOverlappedResult(self.handle, self.overlapped, True)
+        except Exception as e:
+            if getattr(e, "winerror", None) != ERROR_PIPE_CONNECTED:
+                raise
+
+    def read_line(self, timeout=REQUEST_TIMEOUT, limit=4096):
+        deadline = time.monotonic() + timeout
+        buffer = win32file.AllocateReadBuffer(limit)
+        data = b""
+        while b"\n" not in data and len(data) < limit:
+            remaining = deadline - time.monotonic()
+            win32file.ReadFile(self.handle, buffer, self.overlapped)
+            if remaining <= 0 or win32event.WaitForSingleObject(
+                    self.overlapped.hEvent, int(remaining * 1000)) != win32event.WAIT_OBJECT_0:
+                win32file.CancelIo(self.handle)
+                try:
+                    win32file.GetOverlappedResult(self.handle, self.overlapped, True)
+                except Exception:
+                    pass
+                raise TimeoutError(f"клиент не прислал строку запроса за {timeout} с")
+            size = win32file.GetOverlappedResult(self.handle, self.overlapped, False)
+            if not size:
+                break
+            data += bytes(buffer[:size])
+        return data.split(b"\n", 1)[0]
+
+    def write(self, data):
+        win32file.WriteFile(self.handle, data, self.overlapped)
+        win32file.GetOverlappedResult(self.handle, self.overlapped, True)
+
+    def close(self):
+        try:
+            win32pipe.DisconnectNamedPipe(self.handle)
+        except Exception:
+            pass
+        try:
+            win32file.CloseHandle(self.handle)
+        except Exception:
+            pass
+
+
+class Subscriber:
+    """Очередь строк одного подписчика; при переполнении вытесняются самые старые."""
+
+    def __init__(self, connection, capacity):
+        self.connection = connection
+        self.lines = deque(maxlen=capacity)
+        self.cond = threading.Condition()
+        self.dropped = 0       # Отброшено с последнего уведомления клиента
+        self.total_dropped = 0
+        self.sent = 0
+        self.closed = False
+
+    def offer(self, line):
+        with self.cond:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+                self.total_dropped += 1
+                IPC_DROPPED.inc()
+            self.lines.append(line)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def run(self):
+        """Поток записи подписчика: блокируется только он, если клиент не читает."""
+        try:
+            while True:
+                with self.cond:
+                    while not self.lines and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                    lines = list(self.lines)
+                    self.lines.clear()
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    lines.insert(0, encode({"type": "dropped", "count": dropped}))
+                self.connection.write(b"".join(lines))
+                self.sent += len(lines)
+        except Exception as e:
+            write_debug(f"Подписчик потока событий отключился: {e}")
+        finally:
+            self.connection.close()
+
+
+class IpcServer:
+    """Сервер потока событий: приём подключений, подписчики и запрос состояния.
+
+    state_func() возвращает словарь текущего состояния; вызывается в потоке клиента.
+    """
+
+    def __init__(self, name=IPC_NAME, buffer_size=IPC_BUFFER, state_func=None):
+        self.name = name
+        self.buffer_size = max(1, int(buffer_size))
+        self.state_func = state_func
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stopping = False
+        self.thread = None
+        self.sock = None
+        self.next_pipe = None  # Экземпляр канала, ожидающий следующего клиента
+        self.published = 0
+        METRICS.gauge("whead_ipc_subscribers", "Подписчиков потока событий", lambda: len(self.subscribers))
+
+    @property
+    def address(self):
+        return pipe_path(self.name) if win32pipe is not None else socket_path(self.name)
+
+    def start(self):
+        if win32pipe is None:
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("нет ни именованных каналов (pywin32), ни Unix-сокетов")
+            path = socket_path(self.name)
+            if os.path.exists(path):
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(path)
+                except OSError:
+                    os.remove(path)  # Сокет остался от прошлого запуска
+                else:
+                    raise OSError("канал уже занят другим экземпляром WHEAD")
+                finally:
+                    probe.close()
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(path)
+            os.chmod(path, 0o600)
+            self.sock.listen(16)
+            self.sock.settimeout(0.5)
+        else:
+            # Первый экземпляр канала создаётся сразу: если имя занято, ошибка видна при запуске
+            self.next_pipe = self.create_pipe(FILE_FLAG_FIRST_PIPE_INSTANCE)
+        self.stopping = False
+        self.thread = threading.Thread(target=self.accept_loop, name="WHEAD-ipc", daemon=True)
+        self.thread.start()
+        write_log(f"Поток событий доступен: {self.address}")
+
+    def stop(self):
+        self.stopping = True
+        if win32pipe is not None:
+            self.wake_pipe()
+        elif self.sock is not None:
+            self.wake_socket()
+        if self.thread is not None:
+            self.thread.join(2.0)
+            self.thread = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.remove(socket_path(self.name))
+            except OSError:
+                pass
+        with self.lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for sub in subscribers:
+            sub.close()
+            sub.connection.close()  # Прерывает запись, если клиент перестал читать
+
+    def wake_pipe(self):
+        """Подключиться к своему каналу, чтобы ConnectNamedPipe в потоке приёма вернулся."""
+        try:
+            handle = win32file.CreateFile(pipe_path(self.name), win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                                          0, None, win32file.OPEN_EXISTING, 0, None)
+            win32file.CloseHandle(handle)
+        except Exception:
+            pass
+
+    def wake_socket(self):
+        """То же для Unix-сокета: accept() возвращается сразу, не дожидаясь таймаута."""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path(self.name))
+        except OSError:
+            pass
+        finally:
+            probe.close()
+
+    def create_pipe(self, flags=0):
+        return win32pipe.CreateNamedPipe(
+            pipe_path(self.name), win32pipe.PIPE_ACCESS_DUPLEX | win32file.FILE_FLAG_OVERLAPPED | flags,
+            win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | win32pipe.PIPE_WAIT | PIPE_REJECT_REMOTE_CLIENTS,
+            win32pipe.PIPE_UNLIMITED_INSTANCES, 65536, 65536, 0, None)
+
+    def accept(self):
+        """Следующее подключение или None (таймаут, остановка)."""
+        if win32pipe is None:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                return None
+            return SocketConnection(conn)
+        handle, self.next_pipe = self.next_pipe, None
+        if handle is None:
+            handle = self.create_pipe()
+        connection = PipeConnection(handle)
+        try:
+            connection.connect()
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def accept_loop(self):
+        while not self.stopping:
+            try:
+                connection = self.accept()
+            except Exception as e:
+                if self.stopping:
+                    break
+                write_log(f"Ошибка приёма подключения к потоку событий: {e}", WARNING)
+                time.sleep(1.0)
+                continue
+            if connection is None:
+                continue
+            if self.stopping:
+                connection.close()
+                break
+            threading.Thread(target=self.serve, args=(connection,), name="WHEAD-ipc-client", daemon=True).start()
+
+    def serve(self, connection):
+        try:
+            command = parse_request(connection.read_line())
+        except Exception:
+            connection.close()
+            return
+        if command == "subscribe":
+            sub = Subscriber(connection, self.buffer_size)
+            sub.offer(encode({"type": "hello", "time": time.time(), "state": self.state()}))
+            with self.lock:
+                self.subscribers.append(sub)
+            try:
+                sub.run()
+            finally:
+                with self.lock:
+                    if sub in self.subscribers:
+                        self.subscribers.remove(sub)
+            return
+        try:
+            if command == "state":
+                connection.write(encode({"type": "state", "time": time.time(), "state": self.state()}))
+            else:
+                connection.write(encode({"type": "error", "error": f"неизвестная команда: {command}"}))
+        except Exception:
+            pass
+        finally:
+            connection.close()
+
+    def state(self):
+        state = {}
+        if self.state_func is not None:
+            try:
+                state = self.state_func()
+            except Exception as e:
+                state = {"error": str(e)}
+        state["subscribers"] = self.stats()
+        return state
+
+    def publish(self, kind, payload):
+        """Разослать сообщение подписчикам. Не блокируется: только очереди в памяти."""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return
+        line = encode({"type": kind, **payload})
+        for sub in subscribers:
+            sub.offer(line)
+        self.published += 1
+
+    def stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            "count": len(subscribers),
+            "published": self.published,
+            "dropped": sum(sub.total_dropped for sub in subscribers),
+        }
+
+
+def server_from_config(cfg, state_func=None):
+    """Запущенный IpcServer по конфигурации или None (ipc_enabled выключен или канал занят)."""
+    if not cfg.get("ipc_enabled", True):
+        return None
+    server = IpcServer(cfg.get("ipc_name", IPC_NAME), cfg.get("ipc_buffer", IPC_BUFFER), state_func)
+    try:
+        server.start()
+    except Exception as e:
+        write_log(f"Не удалось открыть поток событий {server.address}: {e}", WARNING)
+        return None
+    return server
+
+
+def connect(name=IPC_NAME):
+    """Клиентское подключение: файловый объект для чтения и записи строк."""
+    if sys.platform == "win32":
+        return open(pipe_path(name), "r+b", buffering=0)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path(name))
+    return sock.makefile("rwb", buffering=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="WHEA.py ipc", description="Клиент потока событий WHEAD")
+    parser.add_argument("command", choices=("subscribe", "state"))
+    parser.add_argument("--name", default=IPC_NAME, help="Имя канала (ключ ipc_name)")
+    args = parser.parse_args(argv)
+    try:
+        stream = connect(args.name)
+    except OSError as e:
+        print(f"WHEAD не запущен или поток событий выключен: {e}", file=sys.stderr)
+        return 1
+    with stream:
+        stream.write(encode({"cmd": args.command}))
+        try:
+            for line in iter(stream.readline, b""):
+                sys.stdout.write(line.decode("utf-8"))
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,454 @@
+"""Асинхронная запись текстовых журналов WHEAD.
+
+Вызывающий код только кладёт строку в ограниченную очередь в памяти; фоновый поток
+собирает строки в пачку и дописывает её в файл одной операцией — по размеру пачки,
+по времени и при выходе из программы. Уровни позволяют отключить подробную
+диагностику каждого тика почти без затрат.
+
+Журнал делится на сегменты (LogRotation): активный файл (LTC-Logger.log) закрывается
+по размеру или возрасту и переименовывается в LTC-Logger.20250131-142800.log, после чего
+сжимается в .gz в фоне. Суммарный объём сегментов ограничен бюджетом — самые старые
+удаляются. Индекс LTC-Logger.index.json хранит интервал времени каждого сегмента,
+поэтому поиск строк за нужный период открывает только подходящие сегменты:
+
+    python WHEA.py logs around "2025-01-31 14:32" --minutes 5 [--errors]
+"""
+import argparse
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+
+def parse_level(value, default=INFO):
+    """Уровень из конфигурации: имя (debug/info/warning/error) или число."""
+    if isinstance(value, int):
+        return value
+    return LEVEL_NAMES.get(str(value).strip().lower(), default)
+
+
+# Ключи конфигурации log_max_mb, log_max_age_hours, log_budget_mb, log_compress
+LOG_MAX_MB = 10
+LOG_MAX_AGE_HOURS = 24
+LOG_BUDGET_MB = 200
+
+
+class LogRotation:
+    """Параметры ротации: размер и возраст активного сегмента, общий бюджет на диске."""
+
+    def __init__(self, max_bytes=LOG_MAX_MB << 20, max_age=LOG_MAX_AGE_HOURS * 3600,
+                 budget_bytes=LOG_BUDGET_MB << 20, compress=True):
+        self.max_bytes = max_bytes        # 0 — без ограничения размера
+        self.max_age = max_age            # Секунды; 0 — без ограничения возраста
+        self.budget_bytes = budget_bytes  # 0 — без бюджета
+        self.compress = compress
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            int(float(cfg.get("log_max_mb", LOG_MAX_MB)) * (1 << 20)),
+            float(cfg.get("log_max_age_hours", LOG_MAX_AGE_HOURS)) * 3600,
+            int(float(cfg.get("log_budget_mb", LOG_BUDGET_MB)) * (1 << 20)),
+            bool(cfg.get("log_compress", True)),
+        )
+
+    def due(self, size, started, now):
+        return bool((self.max_bytes and size >= self.max_bytes) or
+                    (self.max_age and started is not None and now - started >= self.max_age))
+
+
+def parse_line_time(line):
+    """Время строки журнала «[2025-01-31 14:28:00.123] …» в секундах epoch или None."""
+    if not line.startswith("[") or len(line) < 21:
+        return None
+    try:
+        return datetime.strptime(line[1:20], '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+class LogIndex:
+    """Боковой индекс сегментов журнала: {"active_start": t, "segments": [{file, start, end, bytes}]}.
+
+    Записи сегментов упорядочены по времени. Файл индекса заменяется атомарно.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.directory = os.path.dirname(os.path.abspath(log_path))
+        root, _ = os.path.splitext(log_path)
+        self.path = root + ".index.json"
+        self.lock = threading.Lock()
+        self.active_start = None
+        self.segments = []
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.active_start = data.get("active_start")
+            self.segments = [s for s in data.get("segments", []) if isinstance(s, dict) and "file" in s]
+        except (OSError, ValueError, AttributeError):
+            self.active_start = None
+            self.segments = []
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"active_start": self.active_start, "segments": self.segments}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def file_path(self, segment):
+        return os.path.join(self.directory, segment["file"])
+
+    def between(self, start, end):
+        """Пути сегментов (включая активный файл), строки которых могут попасть в [start, end]."""
+        with self.lock:
+            paths = [self.file_path(s) for s in self.segments
+                     if s.get("start", 0) <= end and s.get("end", float("inf")) >= start]
+            if self.active_start is None or self.active_start <= end:
+                paths.append(self.log_path)
+        return [p for p in paths if os.path.exists(p)]
+
+
+def open_segment(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def read_lines_between(log_path, start, end):
+    """Строки журнала за [start, end] (epoch); строки без метки времени идут за предыдущей."""
+    index = LogIndex(log_path)
+    for path in index.between(start, end):
+        try:
+            with open_segment(path) as f:
+                inside = False
+                for line in f:
+                    ts = parse_line_time(line)
+                    if ts is not None:
+                        if ts > end + 1:
+                            break
+                        inside = ts >= start - 1
+                    if inside:
+                        yield line.rstrip("\n")
+        except OSError:
+            continue
+
+
+class AsyncLogWriter:
+    """Буферизованная запись строк в файл из фонового потока.
+
+    Очередь ограничена max_queue строками: если диск не успевает, новые строки
+    отбрасываются (счётчик dropped), и вызывающий поток никогда не блокируется.
+    Поток запускается при первой записи и останавливается через close() или при выходе.
+    Файл остаётся открытым между пачками; перед пачкой проверяется ротация (rotation).
+    """
+
+    def __init__(self, path, time_format='%Y-%m-%d %H:%M:%S', max_queue=10000,
+                 flush_lines=256, flush_interval=1.0, rotation=None):
+        self.path = path
+        self.time_format = time_format
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.rotation = rotation if rotation is not None else LogRotation()
+        self.queue = queue.Queue(max_queue)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.file = None
+        self.size = 0
+        self.index = None          # LogIndex, загружается в потоке записи
+        self.segment_start = None  # Время первой строки активного сегмента
+        self.compressor = None
+
+    def write(self, text):
+        if self.thread is None:
+            self.ensure_started()
+        try:
+            self.queue.put_nowait((time.time(), text))
+        except queue.Full:
+            self.dropped += 1
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is not None or self.closed:
+                return
+            self.thread = threading.Thread(target=self.run, name="WHEAD-log-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def flush(self, timeout=5.0):
+        """Дождаться записи всех строк, поставленных в очередь до вызова."""
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self.closed:
+            return
+        self.flush(timeout)
+        self.closed = True
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+        compressor = self.compressor
+        if compressor is not None:
+            compressor.join(timeout)
+
+    def configure(self, rotation):
+        """Новые параметры ротации; применяются к следующей пачке."""
+        self.rotation = rotation
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def format_line(self, created, text):
+        timestamp = datetime.fromtimestamp(created).strftime(self.time_format)
+        if self.time_format.endswith('%f'):
+            timestamp = timestamp[:-3]  # Миллисекунды, как и раньше
+        return f"[{timestamp}] {text}\n"
+
+    def run(self):
+        lines = []
+        waiters = []
+        reported_drops = 0
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not False:
+                lines.append(self.format_line(*item))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(lines) < self.flush_lines:
+                    continue
+            elif deadline is not None and time.monotonic() < deadline:
+                continue
+
+            if self.dropped != reported_drops:
+                lines.append(self.format_line(time.time(), f"Очередь журнала переполнена, пропущено строк: {self.dropped - reported_drops}"))
+                reported_drops = self.dropped
+            if lines:
+                self.write_batch(lines)
+                lines = []
+            deadline = None
+            for done in waiters:
+                done.set()
+            waiters = []
+        self.close_file()
+
+    def open_file(self, now):
+        if self.index is None:
+            self.index = LogIndex(self.path)
+            self.segment_start = self.index.active_start
+            self.start_compressor()  # Сегменты, которые не успели сжать до прошлого выхода
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+        if self.size == 0 or self.segment_start is None:
+            self.segment_start = now if self.size == 0 else self.first_line_time(now)
+            with self.index.lock:
+                self.index.active_start = self.segment_start
+                self.index.save()
+
+    def first_line_time(self, default):
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                return parse_line_time(f.readline()) or default
+        except OSError:
+            return default
+
+    def close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+
+    def write_batch(self, lines):
+        try:
+            now = time.time()
+            if self.file is None:
+                self.open_file(now)
+            if self.size and self.rotation.due(self.size, self.segment_start, now):
+                self.rotate(now)
+            data = "".join(lines)
+            self.file.write(data)
+            self.file.flush()
+            self.size += len(data.encode("utf-8"))
+            self.written += len(lines)
+            self.batches += 1
+        except Exception:
+            self.close_file()
+
+    def segment_name(self, start):
+        root, ext = os.path.splitext(os.path.basename(self.path))
+        stamp = datetime.fromtimestamp(start).strftime('%Y%m%d-%H%M%S')
+        name = f"{root}.{stamp}{ext}"
+        n = 1
+        while os.path.exists(os.path.join(self.index.directory, name)) or \
+                os.path.exists(os.path.join(self.index.directory, name + ".gz")):
+            name = f"{root}.{stamp}-{n}{ext}"
+            n += 1
+        return name
+
+    def rotate(self, now):
+        """Закрыть активный сегмент, переименовать его и начать новый файл."""
+        self.close_file()
+        name = self.segment_name(self.segment_start or now)
+        os.replace(self.path, os.path.join(self.index.directory, name))
+        with self.index.lock:
+            self.index.segments.append({"file": name, "start": self.segment_start or now, "end": now,
+                                        "bytes": self.size})
+            self.index.active_start = now
+            self.index.save()
+        self.rotations += 1
+        self.segment_start = now
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = 0
+        self.start_compressor()
+
+    def start_compressor(self):
+        """Сжатие закрытых сегментов и соблюдение бюджета — в отдельном потоке, запись не ждёт."""
+        if self.compressor is not None and self.compressor.is_alive():
+            return
+        self.compressor = threading.Thread(target=self.compress_segments, name="WHEAD-log-compress", daemon=True)
+        self.compressor.start()
+
+    def compress_segments(self):
+        index = self.index
+        while self.rotation.compress:
+            with index.lock:
+                pending = next((s for s in index.segments if not s["file"].endswith(".gz")), None)
+            if pending is None:
+                break
+            source = index.file_path(pending)
+            target = source + ".gz"
+            try:
+                with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                os.remove(source)
+            except OSError:
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+                if os.path.exists(source):
+                    break  # Повторим при следующей ротации
+            with index.lock:
+                pending["file"] += ".gz"
+                try:
+                    pending["bytes"] = os.path.getsize(target)
+                except OSError:
+                    index.segments.remove(pending)
+                index.save()
+        self.enforce_budget()
+
+    def enforce_budget(self):
+        """Удалять самые старые сегменты, пока сегменты и активный файл не уложатся в бюджет."""
+        budget = self.rotation.budget_bytes
+        if not budget:
+            return
+        index = self.index
+        with index.lock:
+            total = self.size + sum(s.get("bytes", 0) for s in index.segments)
+            removed = []
+            while index.segments and total > budget:
+                segment = index.segments.pop(0)
+                total -= segment.get("bytes", 0)
+                removed.append(index.file_path(segment))
+            if removed:
+                index.save()
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        index = self.index
+        segments = list(index.segments) if index is not None else []
+        return {
+            "active_bytes": self.size,
+            "segments": len(segments),
+            "segment_bytes": sum(s.get("bytes", 0) for s in segments),
+            "rotations": self.rotations,
+        }
+
+
+def main(argv=None):
+    from whea_core import LOG_FILE_PATH, ERRORS_LOG_PATH
+
+    parser = argparse.ArgumentParser(prog="WHEA.py logs", description="Поиск в журналах WHEAD по времени")
+    sub = parser.add_subparsers(dest="command", required=True)
+    around = sub.add_parser("around", help="Строки журнала вокруг заданного момента")
+    around.add_argument("time", help="Момент: «ГГГГ-ММ-ДД ЧЧ:ММ[:СС]» или «ЧЧ:ММ» (сегодня)")
+    around.add_argument("--minutes", type=float, default=5, help="Сколько минут до и после момента")
+    around.add_argument("--errors", action="store_true", help="Искать в LTC-Errors.log")
+    segments = sub.add_parser("segments", help="Сегменты журнала из индекса")
+    segments.add_argument("--errors", action="store_true", help="Сегменты LTC-Errors.log")
+    args = parser.parse_args(argv)
+
+    path = ERRORS_LOG_PATH if args.errors else LOG_FILE_PATH
+    if args.command == "segments":
+        index = LogIndex(path)
+        for s in index.segments:
+            print(f"{datetime.fromtimestamp(s['start']):%Y-%m-%d %H:%M:%S} — {datetime.fromtimestamp(s['end']):%Y-%m-%d %H:%M:%S}"
+                  f"  {s.get('bytes', 0) / 1024:10.1f} КБ  {s['file']}")
+        if index.active_start is not None:
+            print(f"{datetime.fromtimestamp(index.active_start):%Y-%m-%d %H:%M:%S} — …  (активный)  {os.path.basename(path)}")
+        return 0
+
+    text = args.time.strip()
+    try:
+        if len(text) <= 5:
+            moment = datetime.combine(datetime.now().date(), datetime.strptime(text, '%H:%M').time())
+        else:
+            moment = datetime.fromisoformat(text)
+    except ValueError:
+        parser.error(f"не удалось разобрать время «{text}»")
+    delta = timedelta(minutes=args.minutes)
+    for line in read_lines_between(path, (moment - delta).timestamp(), (moment + delta).timestamp()):
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Панель журнала главного окна: кольцевой буфер строк, модель Qt и фильтры.
+
+Строки хранятся в LogRing фиксированной ёмкости — самые старые вытесняются, поэтому
+память не растёт, сколько бы приложение ни провело в трее. QListView с одинаковой
+высотой строк отрисовывает только видимые строки. append() можно вызывать из любого
+потока: строки копятся в очереди и попадают в модель одной пачкой раз в кадр
+(FRAME_MS), так что шторм обнаружений не вызывает перерисовку на каждую строку.
+"""
+import threading
+import time
+from typing import NamedTuple
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QGuiApplication, QKeySequence
+from PyQt6.QtWidgets import QAbstractItemView, QListView
+
+from whea_log import INFO, WARNING, ERROR
+
+
+LOG_VIEW_CAPACITY = 2000  # Ключ конфигурации log_view_capacity
+FRAME_MS = 16
+
+LEVEL_COLORS = {WARNING: QColor("#ffb74d"), ERROR: QColor("#ff6b6b")}
+
+# Пункты фильтра важности: подпись -> минимальный уровень
+SEVERITY_FILTERS = (("Все", INFO), ("Предупреждения и ошибки", WARNING), ("Только ошибки", ERROR))
+
+
+class LogEntry(NamedTuple):
+    seq: int
+    created: float
+    text: str
+    level: int
+    event_ids: tuple
+
+
+class LogRing:
+    """Кольцевой буфер фиксированной ёмкости: добавление O(1), доступ по номеру O(1)."""
+
+    def __init__(self, capacity=LOG_VIEW_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self.items = [None] * self.capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return self.items[(self.start + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.items[(self.start + i) % self.capacity]
+
+    def append(self, item):
+        """Добавить элемент; возвращает вытесненный или None."""
+        end = (self.start + self.size) % self.capacity
+        evicted = None
+        if self.size == self.capacity:
+            evicted = self.items[end]
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+        self.items[end] = item
+        return evicted
+
+    def oldest_seq(self):
+        return self.items[self.start].seq if self.size else None
+
+    def clear(self):
+        self.items = [None] * self.capacity
+        self.start = 0
+        self.size = 0
+
+
+# EventType события журнала -> уровень строки (1 — ошибка, 2 — предупреждение)
+EVENT_TYPE_LEVELS = {1: ERROR, 2: WARNING}
+
+
+def detection_level(events):
+    """Уровень строки обнаружения — самый серьёзный среди событий пачки."""
+    return max((EVENT_TYPE_LEVELS.get(ev.level, INFO) for ev in events), default=INFO)
+
+
+def parse_id_filter(text):
+    """Коды событий из строки фильтра «19, 41» (пустое множество — без фильтра)."""
+    ids = set()
+    for part in text.replace(";", ",").split(","):
+        part = part.strip()
+        if part.isdigit():
+            ids.add(int(part))
+    return ids
+
+
+class LogModel(QAbstractListModel):
+    """Модель строк журнала: кольцевой буфер и список строк, прошедших фильтр."""
+
+    schedule = pyqtSignal()
+
+    def __init__(self, capacity=LOG_VIEW_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.ring = LogRing(capacity)
+        self.rows = []  # Строки кольца, прошедшие фильтр, в порядке добавления
+        self.min_level = INFO
+        self.event_ids = set()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.frame = QTimer(self)
+        self.frame.setSingleShot(True)
+        self.frame.setInterval(FRAME_MS)
+        self.frame.timeout.connect(self.flush)
+        # Из чужого потока сигнал доставляется в поток модели — таймер запускается там
+        self.schedule.connect(self.frame.start)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        entry = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return entry.text
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return LEVEL_COLORS.get(entry.level)
+        return None
+
+    def append(self, text, level=INFO, event_ids=()):
+        """Поставить строку в очередь; в модель она попадёт в ближайшем кадре."""
+        with self.lock:
+            self.seq += 1
+            self.pending.append(LogEntry(self.seq, time.time(), text, level, tuple(event_ids)))
+            first = len(self.pending) == 1
+        if first:
+            self.schedule.emit()
+
+    def accepts(self, entry):
+        if entry.level < self.min_level:
+            return False
+        return not self.event_ids or not self.event_ids.isdisjoint(entry.event_ids)
+
+    def flush(self):
+        """Перенести накопленные за кадр строки в кольцо одной вставкой и одним удалением."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        pending = pending[-self.ring.capacity:]
+        for entry in pending:
+            self.ring.append(entry)
+        oldest = self.ring.oldest_seq()
+        evicted = 0
+        while evicted < len(self.rows) and self.rows[evicted].seq < oldest:
+            evicted += 1
+        if evicted:
+            self.beginRemoveRows(QModelIndex(), 0, evicted - 1)
+            del self.rows[:evicted]
+            self.endRemoveRows()
+        added = [entry for entry in pending if entry.seq >= oldest and self.accepts(entry)]
+        if added:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self.rows.extend(added)
+            self.endInsertRows()
+
+    def set_filter(self, min_level=None, event_ids=None):
+        if min_level is not None:
+            self.min_level = min_level
+        if event_ids is not None:
+            self.event_ids = set(event_ids)
+        self.beginResetModel()
+        self.rows = [entry for entry in self.ring if self.accepts(entry)]
+        self.endResetModel()
+
+    def set_capacity(self, capacity):
+        capacity = max(1, int(capacity))
+        if capacity == self.ring.capacity:
+            return
+        entries = list(self.ring)[-capacity:]
+        self.ring = LogRing(capacity)
+        for entry in entries:
+            self.ring.append(entry)
+        self.set_filter()
+
+    def clear(self):
+        self.beginResetModel()
+        self.ring.clear()
+        self.rows = []
+        self.endResetModel()
+
+
+class LogView(QListView):
+    """Список строк журнала: прокрутка за новыми строками, если пользователь внизу; Ctrl+C копирует выделенное."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setUniformItemSizes(True)  # Высота строк одинакова — раскладка не зависит от числа строк
+        self.setWordWrap(False)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.follow = True
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        model.rowsInserted.connect(self.on_rows_inserted)
+
+    def on_scrolled(self, value):
+        self.follow = value >= self.verticalScrollBar().maximum()
+
+    def on_rows_inserted(self, parent, first, last):
+        if self.follow:
+            self.scrollToBottom()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            model = self.model()
+            QGuiApplication.clipboard().setText("\n".join(model.rows[row].text for row in rows))
+            event.accept()
+            return
+        super().keyPressEvent(event)
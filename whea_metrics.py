@@ -0,0 +1,276 @@
+"""Метрики WHEAD: счётчики и гистограммы горячего пути, локальный HTTP-эндпоинт.
+
+Метрики копятся всегда — обновление стоит одно взятие блокировки и сложение, поэтому
+их можно не отключать в рабочем режиме. Эндпоинт включается ключом конфигурации
+metrics_port (0 — выключен) и слушает только 127.0.0.1:
+
+    GET /metrics       — текстовый формат Prometheus
+    GET /metrics.json  — снимок в JSON
+
+Модуль не зависит от остальных модулей WHEAD, поэтому его импортирует и whea_core.
+http.server подключается только при запуске эндпоинта — без metrics_port запуск его не ждёт.
+"""
+import bisect
+import json
+import threading
+
+
+# Границы корзин по умолчанию, секунды: от миллисекунды до минуты
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 50000)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонный счётчик, при необходимости с метками."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, n=1, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + n
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        if not items and not self.labels:
+            items = [((), 0)]
+        return [(self.name, format_labels(self.labels, key), value) for key, value in items]
+
+    def snapshot(self):
+        with self.lock:
+            if not self.labels:
+                return self.values.get((), 0)
+            return {",".join(str(v) for v in key): value for key, value in sorted(self.values.items())}
+
+
+class Gauge:
+    """Текущее значение, которое вычисляется функцией в момент чтения метрик.
+
+    func() возвращает число или {значение метки: число} для метрики с одной меткой.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, func, label=None):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.label = label
+
+    def read(self):
+        try:
+            return self.func()
+        except Exception:
+            return None
+
+    def samples(self):
+        value = self.read()
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, format_labels((self.label,), (key,)), v) for key, v in sorted(value.items())]
+        return [(self.name, "", value)]
+
+    def snapshot(self):
+        return self.read()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (накопительная при выводе, как в Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS, labels=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = {}  # значения меток -> [счётчики корзин..., +Inf], сумма, количество
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self.series.items())
+        result = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else format_value(float(bound))
+                result.append((f"{self.name}_bucket", format_labels(self.labels + ("le",), key + (le,)), cumulative))
+            result.append((f"{self.name}_sum", format_labels(self.labels, key), total))
+            result.append((f"{self.name}_count", format_labels(self.labels, key), count))
+        return result
+
+    def quantile(self, q, *label_values):
+        """Оценка квантиля по корзинам (верхняя граница корзины, в которую попал квантиль)."""
+        with self.lock:
+            series = self.series.get(label_values)
+            counts = list(series[0]) if series is not None else None
+        return self.bucket_quantile(q, counts)
+
+    def bucket_quantile(self, q, counts):
+        if not counts or not sum(counts):
+            return None
+        rank = q * sum(counts)
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self.lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self.series.items())
+        return {
+            ",".join(str(v) for v in key) or "all": {
+                "count": count,
+                "avg": round(total / count, 6) if count else 0.0,
+                "p50": self.bucket_quantile(0.5, counts),
+                "p99": self.bucket_quantile(0.99, counts),
+            }
+            for key, (counts, total, count) in items
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS, labels=()):
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def gauge(self, name, help_text, func, label=None):
+        """Повторная регистрация заменяет функцию (например, новый пул хендлов)."""
+        gauge = Gauge(name, help_text, func, label)
+        with self.lock:
+            self.metrics[name] = gauge
+        return gauge
+
+    def render_prometheus(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+METRICS = MetricsRegistry()
+
+POLL_DURATION = METRICS.histogram(
+    "whead_poll_duration_seconds", "Длительность прохода чтения и обработки журнала", labels=("source",))
+RECORDS_PER_TICK = METRICS.histogram(
+    "whead_records_scanned_per_tick", "Просмотрено записей журнала за проход", COUNT_BUCKETS)
+RECORDS_SCANNED = METRICS.counter("whead_records_scanned_total", "Всего просмотрено записей журнала")
+MATCHES = METRICS.counter("whead_matches_total", "Найдено WHEA-событий по кодам", labels=("event_id",))
+TICKS_COALESCED = METRICS.counter(
+    "whead_ticks_coalesced_total", "Тиков таймера, объединённых с ещё не начатым проходом")
+POLL_ERRORS = METRICS.counter("whead_poll_errors_total", "Ошибок прохода чтения", labels=("source",))
+TRIGGER_LATENCY = METRICS.histogram(
+    "whead_trigger_latency_seconds", "Задержка от обнаружения до действия триггера", labels=("action",))
+TRIGGER_DROPPED = METRICS.counter(
+    "whead_trigger_dropped_total", "Пропущенных срабатываний триггера", labels=("reason",))
+HANDLE_RECONNECTS = METRICS.counter("whead_handle_reconnects_total", "Повторных открытий журнала после ошибки")
+HANDLE_OPEN_ERRORS = METRICS.counter("whead_handle_open_errors_total", "Ошибок открытия журнала")
+
+
+def metrics_handler(registry=METRICS):
+    """Класс обработчика запросов к registry."""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(registry.snapshot(), ensure_ascii=False, default=str).encode("utf-8")
+                content_type = "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Запросы не пишем в stderr (в GUI его нет, в headless он занят выводом)
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """HTTP-эндпоинт метрик в фоновом потоке, только на локальном адресе."""
+
+    def __init__(self, port, host="127.0.0.1", registry=METRICS):
+        self.port = int(port)
+        self.host = host
+        self.registry = registry
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        from http.server import ThreadingHTTPServer
+
+        self.server = ThreadingHTTPServer((self.host, self.port), metrics_handler(self.registry))
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="WHEAD-metrics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
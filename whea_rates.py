@@ -0,0 +1,228 @@
+"""Частота WHEA-событий в скользящем окне и оповещения о «шторме» ошибок.
+
+Правило вида «больше 10 исправленных ошибок памяти (45) за 10 минут» задаётся в
+конфигурации ключом rate_rules:
+
+    "rate_rules": [{"event_id": 45, "threshold": 10, "window_minutes": 10}]
+
+Для каждого правила (и каждого хоста) хранится кольцевой буфер из фиксированного
+числа временных корзин, поэтому добавление события стоит O(1), а память не растёт,
+сколько бы ни работал монитор. Оповещение срабатывает только при пересечении порога
+снизу вверх и снова становится возможным, когда частота опустится до порога.
+"""
+import re
+import threading
+import time
+from datetime import datetime
+
+from whea_core import WHEA_EVENT_IDS
+
+
+RATE_BUCKETS = 60  # Корзин в окне: точность окна — 1/60 его длины
+
+
+class RateWindow:
+    """Счётчик событий за последние window секунд на кольцевом буфере корзин."""
+
+    __slots__ = ("window", "bucket_seconds", "buckets", "head", "head_slot", "total")
+
+    def __init__(self, window, buckets=RATE_BUCKETS):
+        self.window = float(window)
+        self.bucket_seconds = self.window / buckets
+        self.buckets = [0] * buckets
+        self.head = 0          # Индекс корзины, в которую попадает текущее время
+        self.head_slot = None  # Номер интервала bucket_seconds с начала эпохи для head
+        self.total = 0
+
+    def advance(self, now):
+        """Сдвинуть окно к моменту now, обнуляя устаревшие корзины."""
+        slot = int(now // self.bucket_seconds)
+        if self.head_slot is None:
+            self.head_slot = slot
+            return
+        steps = slot - self.head_slot
+        if steps <= 0:
+            return
+        size = len(self.buckets)
+        if steps >= size:
+            self.buckets = [0] * size
+            self.total = 0
+        else:
+            for _ in range(steps):
+                self.head = (self.head + 1) % size
+                self.total -= self.buckets[self.head]
+                self.buckets[self.head] = 0
+        self.head_slot = slot
+
+    def add(self, timestamp, count=1):
+        """Учесть событие с временем timestamp. Событие старше окна не учитывается."""
+        self.advance(timestamp)
+        age = self.head_slot - int(timestamp // self.bucket_seconds)
+        if age >= len(self.buckets):
+            return
+        self.buckets[(self.head - max(age, 0)) % len(self.buckets)] += count
+        self.total += count
+
+
+class RateRule:
+    """Порог: больше threshold событий event_id за window_minutes минут."""
+
+    def __init__(self, event_id, threshold, window_minutes):
+        self.event_id = int(event_id)
+        self.threshold = int(threshold)
+        self.window_minutes = float(window_minutes)
+        if self.event_id not in WHEA_EVENT_IDS:
+            raise ValueError(f"код {self.event_id} не относится к WHEA")
+        if self.threshold < 0 or self.window_minutes <= 0:
+            raise ValueError(f"неверный порог {self.threshold} за {self.window_minutes} мин")
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["event_id"], d["threshold"], d.get("window_minutes", 10))
+
+    def to_dict(self):
+        return {"event_id": self.event_id, "threshold": self.threshold, "window_minutes": self.window_minutes}
+
+    def __str__(self):
+        return f"{self.event_id}>{self.threshold}/{self.window_minutes:g}"
+
+
+def load_rules(cfg):
+    """Правила из конфигурации (ключ rate_rules); неверные записи пропускаются."""
+    rules = []
+    for item in cfg.get("rate_rules", []) or []:
+        try:
+            rules.append(RateRule.from_dict(item))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return rules
+
+
+RULE_TEXT = re.compile(r"^\s*(\d+)\s*>\s*(\d+)\s*/\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def parse_rules_text(text):
+    """Правила из строки формы: «45>10/10, 19>0/60» — код > порог / окно в минутах.
+
+    Возвращает список RateRule; при ошибке — ValueError с текстом для пользователя.
+    """
+    rules = []
+    for part in re.split(r"[,;]", text):
+        if not part.strip():
+            continue
+        m = RULE_TEXT.match(part)
+        if m is None:
+            raise ValueError(f"не удалось разобрать «{part.strip()}», ожидается код>порог/минуты")
+        rules.append(RateRule(m.group(1), m.group(2), m.group(3)))
+    return rules
+
+
+def format_rules_text(rules):
+    return ", ".join(str(rule) for rule in rules)
+
+
+class RateAlert:
+    """Пересечение порога. Атрибуты совместимы с Detection для TriggerExecutor."""
+
+    def __init__(self, rule, count, host='localhost', details=()):
+        self.rule = rule
+        self.details = list(details)
+        self.count = count
+        self.new_count = count
+        self.event_ids = [rule.event_id]
+        self.host = host
+        self.time = datetime.now()
+
+    @property
+    def codes_str(self):
+        return str(self.rule.event_id)
+
+    @property
+    def reason(self):
+        return (f"код {self.rule.event_id}: {self.count} за {self.rule.window_minutes:g} мин "
+                f"(порог {self.rule.threshold})")
+
+    def message(self):
+        where = f" на {self.host}" if self.host != 'localhost' else ""
+        details = f". {'; '.join(self.details)}" if self.details else ""
+        return f"[{self.time.strftime('%H:%M:%S')}] Шторм ошибок WHEA{where}: {self.reason}{details}"
+
+    def to_dict(self):
+        return {
+            "time": self.time.isoformat(timespec="seconds"),
+            "host": self.host,
+            "event_id": self.rule.event_id,
+            "count": self.count,
+            "threshold": self.rule.threshold,
+            "window_minutes": self.rule.window_minutes,
+            "details": self.details,
+        }
+
+
+class RateDetector:
+    """Скользящие счётчики по кодам событий для всех правил и хостов.
+
+    update() вызывается из потоков обнаружения (в том числе из пула опроса хостов),
+    поэтому состояние защищено блокировкой.
+    """
+
+    def __init__(self, rules=()):
+        self.lock = threading.Lock()
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        with self.lock:
+            self.rules = list(rules)
+            self.hosts = {}
+
+    def windows_for(self, host):
+        """{event_id: [(правило, окно, состояние «взведено»)]} для хоста, создаётся при первом событии."""
+        windows = self.hosts.get(host)
+        if windows is None:
+            windows = {}
+            for rule in self.rules:
+                windows.setdefault(rule.event_id, []).append([rule, RateWindow(rule.window_minutes * 60), True])
+            self.hosts[host] = windows
+        return windows
+
+    def update(self, events, host='localhost', now=None):
+        """Учесть WheaEvent пачки. Возвращает список RateAlert для пересечённых порогов."""
+        if not self.rules:
+            return []
+        now = time.time() if now is None else now
+        alerts = []
+        with self.lock:
+            windows = self.windows_for(host)
+            stamps = {}
+            details = {}
+            for ev in events:
+                if ev.event_id in windows:
+                    stamps.setdefault(ev.event_id, []).append(min(ev.timestamp, now))
+                    if getattr(ev, "details", ""):
+                        details[ev.event_id] = ev.details
+            for event_id, times in stamps.items():
+                for entry in windows[event_id]:
+                    rule, window = entry[0], entry[1]
+                    window.advance(now)
+                    if window.total <= rule.threshold:
+                        entry[2] = True  # Частота опустилась до порога — оповещение снова возможно
+                    for ts in times:
+                        window.add(ts)
+                    if entry[2] and window.total > rule.threshold:
+                        entry[2] = False
+                        detail = details.get(event_id)
+                        alerts.append(RateAlert(rule, window.total, host, [detail] if detail else ()))
+        return alerts
+
+    def snapshot(self, now=None):
+        """Текущие значения счётчиков: [{host, event_id, window_minutes, count, threshold}]."""
+        now = time.time() if now is None else now
+        result = []
+        with self.lock:
+            for host, windows in self.hosts.items():
+                for entries in windows.values():
+                    for rule, window, _ in entries:
+                        window.advance(now)
+                        result.append({"host": host, "event_id": rule.event_id, "window_minutes": rule.window_minutes,
+                                       "count": window.total, "threshold": rule.threshold})
+        return result
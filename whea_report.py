@@ -0,0 +1,445 @@
+"""Отправка обнаружений WHEAD на центральный сборщик (парк машин).
+
+FleetReporter копит сообщения (detection, rate_alert, error) в памяти и раз в
+report_interval секунд или по накоплении report_batch штук отправляет их одной пачкой:
+JSON, сжатый gzip, POST на report_url по постоянному keep-alive соединению. Во время
+шторма на сотнях хостов стоимость одного события — доля пачки; дедупликация
+(whea_dedup) дополнительно сворачивает повторы в occurrences.
+
+Если сборщик недоступен, пачки дописываются в файл-очередь LTC-Spool.bin в APPDATA_DIR
+(только дописывание: длина + тело) и отправляются позже по порядку, с экспоненциальной
+задержкой между попытками. Размер очереди ограничен report_spool_mb — при переполнении
+отбрасываются самые старые пачки. Для проверки есть локальный сборщик:
+
+    python WHEA.py report collector --port 8765 --out collected.ndjson
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from whea_core import APPDATA_DIR, write_log, write_debug, WARNING
+from whea_metrics import METRICS
+
+
+SPOOL_PATH = os.path.join(APPDATA_DIR, "LTC-Spool.bin")
+
+REPORT_BATCH = 500       # report_batch: сообщений в пачке
+REPORT_INTERVAL = 5.0    # report_interval: как часто отправлять неполную пачку, с
+REPORT_SPOOL_MB = 50     # report_spool_mb: предел файла-очереди
+REPORT_TIMEOUT = 10.0
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+QUEUE_SIZE = 10000       # Сообщений в памяти до отправки; сверх — отбрасываются
+
+REPORT_SENT = METRICS.counter("whead_report_sent_total", "Отправлено на сборщик", labels=("what",))
+REPORT_DROPPED = METRICS.counter("whead_report_dropped_total", "Не отправлено на сборщик", labels=("reason",))
+
+FRAME = struct.Struct(">I")
+
+
+class ReportSpool:
+    """Файл-очередь пачек: запись только в конец, чтение с сохранённого смещения.
+
+    Смещение первой неотправленной пачки хранится рядом (LTC-Spool.bin.offset); когда все
+    пачки отправлены, файл удаляется. Переполнение сдвигает смещение за самые старые
+    пачки, а файл переписывается без них, только когда мёртвая часть больше живой.
+    """
+
+    def __init__(self, path=SPOOL_PATH, max_bytes=REPORT_SPOOL_MB << 20):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.max_bytes = max_bytes
+        self.offset = 0
+        self.dropped = 0
+        try:
+            with open(self.offset_path, "r", encoding="utf-8") as f:
+                self.offset = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            self.offset = 0
+        if self.offset > self.size():
+            self.offset = 0
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def pending_bytes(self):
+        return max(0, self.size() - self.offset)
+
+    def __bool__(self):
+        return self.pending_bytes() > 0
+
+    def save_offset(self):
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(self.offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def append(self, body):
+        if self.max_bytes and self.pending_bytes() + len(body) + FRAME.size > self.max_bytes:
+            self.trim(len(body) + FRAME.size)
+        with open(self.path, "ab") as f:
+            f.write(FRAME.pack(len(body)))
+            f.write(body)
+
+    def trim(self, needed):
+        """Отбросить самые старые пачки, чтобы поместилось ещё needed байт."""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while self.pending_bytes() + needed > self.max_bytes:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    break
+                (length,) = FRAME.unpack(head)
+                f.seek(length, os.SEEK_CUR)
+                self.offset = f.tell()
+                self.dropped += 1
+                REPORT_DROPPED.inc(1, "spool_full")
+        if self.offset > self.pending_bytes():
+            self.compact()
+        else:
+            self.save_offset()
+
+    def compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            src.seek(self.offset)
+            while True:
+                chunk = src.read(1 << 20)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(tmp_path, self.path)
+        self.offset = 0
+        self.save_offset()
+
+    def peek(self):
+        """Первая неотправленная пачка: (тело, смещение следующей) или None."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return None
+                (length,) = FRAME.unpack(head)
+                body = f.read(length)
+                if len(body) < length:
+                    return None  # Запись оборвалась (выход во время записи) — дальше читать нечего
+                return body, f.tell()
+        except OSError:
+            return None
+
+    def commit(self, next_offset):
+        """Пачка отправлена: сдвинуть смещение; пустую очередь удалить."""
+        self.offset = next_offset
+        if self.offset >= self.size():
+            for path in (self.path, self.offset_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.offset = 0
+        else:
+            self.save_offset()
+
+
+class FleetReporter:
+    """Фоновая отправка пачек на сборщик. submit() не блокируется и не ходит в сеть."""
+
+    def __init__(self, url, batch_size=REPORT_BATCH, interval=REPORT_INTERVAL, spool=None,
+                 token=None, timeout=REPORT_TIMEOUT, agent=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"неверный адрес сборщика: {url}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.netloc = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.batch_size = max(1, int(batch_size))
+        self.interval = float(interval)
+        self.spool = spool if spool is not None else ReportSpool()
+        self.token = token
+        self.timeout = timeout
+        self.agent = agent or socket.gethostname()
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.connection = None
+        self.thread = None
+        self.stopping = threading.Event()
+        self.send_on_stop = False
+        self.failures = 0
+        self.retry_at = 0.0
+        self.seq = 0
+        self.stats = {"events": 0, "batches": 0, "bytes": 0, "raw_bytes": 0, "spooled": 0, "replayed": 0,
+                      "errors": 0, "dropped": 0}
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="WHEAD-report", daemon=True)
+        self.thread.start()
+        write_log(f"Отправка на сборщик {self.url} (пачка до {self.batch_size}, раз в {self.interval:g} с)")
+
+    def stop(self, send=False):
+        """Остановить поток; неотправленное уходит в файл-очередь (send=True — сначала попытка отправить)."""
+        self.send_on_stop = send
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(self.timeout * 2 + 1 if send else 5.0)
+            self.thread = None
+        self.close_connection()
+
+    def submit(self, kind, payload):
+        try:
+            self.queue.put_nowait({"type": kind, **payload})
+        except queue.Full:
+            self.stats["dropped"] += 1
+            REPORT_DROPPED.inc(1, "queue_full")
+
+    def run(self):
+        while True:
+            items = self.collect()
+            stopping = self.stopping.is_set()
+            if items:
+                body = self.encode(items)
+                # При остановке сеть не ждём: пачка уйдёт при следующем запуске
+                if (stopping and not self.send_on_stop) or self.spool or time.monotonic() < self.retry_at or not self.send(body):
+                    self.spool.append(body)  # Порядок сохраняется: новое идёт за очередью
+                    self.stats["spooled"] += 1
+            if stopping:
+                if self.queue.empty():
+                    break
+                continue
+            self.replay()
+
+    def collect(self):
+        """Сообщения следующей пачки: ждём первое не дольше interval, затем добираем без ожидания."""
+        items = []
+        deadline = time.monotonic() + self.interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self.stopping.is_set():
+                break
+            try:
+                items.append(self.queue.get(timeout=min(timeout, 0.5)))
+            except queue.Empty:
+                continue
+        while len(items) < self.batch_size:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def encode(self, items):
+        self.seq += 1
+        raw = json.dumps({"agent": self.agent, "seq": self.seq, "sent": datetime.now().isoformat(timespec="seconds"),
+                          "items": items}, ensure_ascii=False, default=str).encode("utf-8")
+        self.stats["events"] += len(items)
+        self.stats["raw_bytes"] += len(raw)
+        return gzip.compress(raw, compresslevel=6)
+
+    def replay(self):
+        """Досылать очередь с диска, пока сборщик отвечает и не пора собирать новую пачку."""
+        sent = 0
+        while self.spool and time.monotonic() >= self.retry_at and not self.stopping.is_set():
+            item = self.spool.peek()
+            if item is None:
+                self.spool.commit(self.spool.size())
+                break
+            body, next_offset = item
+            if not self.send(body):
+                break
+            self.spool.commit(next_offset)
+            self.stats["replayed"] += 1
+            sent += 1
+            if sent >= 10 and not self.queue.empty():
+                break  # Новые события не ждут, пока очередь догонится целиком
+        if sent:
+            write_log(f"Дослано пачек из очереди: {sent}, осталось {self.spool.pending_bytes()} байт")
+
+    def open_connection(self):
+        if self.connection is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self.connection = cls(self.netloc, self.port, timeout=self.timeout)
+        return self.connection
+
+    def close_connection(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, body):
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "Connection": "keep-alive",
+            "User-Agent": "WHEAD",
+        }
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in (1, 2):
+            try:
+                conn = self.open_connection()
+                conn.request("POST", self.path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.will_close:
+                    self.close_connection()
+                if 200 <= response.status < 300:
+                    self.on_success(len(body))
+                    return True
+                error = f"ответ {response.status} {response.reason}"
+                if 400 <= response.status < 500 and response.status not in (408, 429):
+                    # Сборщик отверг пачку — повтор не поможет
+                    REPORT_DROPPED.inc(1, "rejected")
+                    write_log(f"Сборщик отверг пачку: {error}", WARNING)
+                    return True
+                break
+            except (OSError, http.client.HTTPException) as e:
+                # Сервер мог закрыть простаивающее keep-alive соединение — одна повторная попытка
+                self.close_connection()
+                error = str(e)
+                if attempt == 2:
+                    break
+        self.on_failure(error)
+        return False
+
+    def on_success(self, size):
+        if self.failures:
+            write_log(f"Сборщик {self.url} снова доступен")
+        self.failures = 0
+        self.retry_at = 0.0
+        self.stats["batches"] += 1
+        self.stats["bytes"] += size
+        REPORT_SENT.inc(1, "batches")
+        REPORT_SENT.inc(size, "bytes")
+
+    def on_failure(self, error):
+        self.failures += 1
+        self.stats["errors"] += 1
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+        delay *= random.uniform(0.8, 1.2)  # Разброс, чтобы сотни хостов не повторяли одновременно
+        self.retry_at = time.monotonic() + delay
+        level = WARNING if self.failures == 1 else None
+        text = f"Сборщик {self.url} недоступен ({error}), повтор через {delay:.0f} с, пачки копятся на диске"
+        if level is not None:
+            write_log(text, level)
+        else:
+            write_debug(text)
+
+    def snapshot(self):
+        return {**self.stats, "queued": self.queue.qsize(), "spool_bytes": self.spool.pending_bytes(),
+                "failures": self.failures}
+
+
+def reporter_from_config(cfg):
+    """Запущенный FleetReporter, если задан report_url, иначе None."""
+    url = (cfg.get("report_url") or "").strip()
+    if not url:
+        return None
+    try:
+        reporter = FleetReporter(
+            url,
+            batch_size=cfg.get("report_batch", REPORT_BATCH),
+            interval=cfg.get("report_interval", REPORT_INTERVAL),
+            spool=ReportSpool(max_bytes=int(float(cfg.get("report_spool_mb", REPORT_SPOOL_MB)) * (1 << 20))),
+            token=cfg.get("report_token"),
+        )
+    except (TypeError, ValueError) as e:
+        write_log(f"Отправка на сборщик выключена: {e}", WARNING)
+        return None
+    reporter.start()
+    return reporter
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """Эталонный сборщик: принимает пачки и дописывает сообщения в NDJSON."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    out = None
+    lock = threading.Lock()
+    totals = {}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            batch = json.loads(body)
+            items = batch["items"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.reply(400, {"error": str(e)})
+            return
+        agent = batch.get("agent", "?")
+        with self.lock:
+            if self.out is not None:
+                for item in items:
+                    self.out.write(json.dumps({"agent": agent, **item}, ensure_ascii=False) + "\n")
+                self.out.flush()
+            self.totals[agent] = self.totals.get(agent, 0) + len(items)
+        print(f"{datetime.now():%H:%M:%S} {agent}: пачка {batch.get('seq')} — {len(items)} сообщений, "
+              f"{length} байт (всего от хоста {self.totals[agent]})", flush=True)
+        self.reply(200, {"accepted": len(items)})
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_collector(port, out_path=None, host="127.0.0.1"):
+    out = open(out_path, "a", encoding="utf-8") if out_path else None
+    handler = type("Handler", (CollectorHandler,), {"out": out, "totals": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Сборщик WHEAD слушает http://{host}:{server.server_address[1]}/ingest", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if out is not None:
+            out.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="WHEA.py report", description="Отправка WHEAD на центральный сборщик")
+    sub = parser.add_subparsers(dest="command", required=True)
+    collector = sub.add_parser("collector", help="Локальный эталонный сборщик для проверки")
+    collector.add_argument("--port", type=int, default=8765)
+    collector.add_argument("--host", default="127.0.0.1")
+    collector.add_argument("--out", help="Файл NDJSON для принятых сообщений")
+    sub.add_parser("spool", help="Состояние файла-очереди")
+    args = parser.parse_args(argv)
+    if args.command == "collector":
+        return run_collector(args.port, args.out, args.host)
+    spool = ReportSpool()
+    print(f"{spool.path}: неотправлено {spool.pending_bytes()} байт (смещение {spool.offset})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
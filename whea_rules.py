@@ -0,0 +1,230 @@
+"""Правила триггера: какие события считать совпадением и какие действия выполнять.
+
+Правила задаются в конфигурации ключом trigger_rules:
+
+    "trigger_rules": [
+        {"name": "DIMM 3", "match": {"event_ids": [19, 45], "fields": {"location": "*DIMM 3*"}},
+         "actions": [{"type": "messagebox"}, {"type": "execute", "path": "C:\\\\tools\\\\ticket.bat", "args": "{event_ids}"}]}
+    ]
+
+Условия match (все необязательные, пустой match совпадает с любым событием):
+event_ids — коды событий, providers — поставщики, levels — EventType (1 — ошибка,
+2 — предупреждение), fields — шаблоны fnmatch без учёта регистра для полей, разобранных
+из записи CPER (location, details). Действия: notify, messagebox, execute (path, args).
+Настройки окна триггера (message_*, execute_*) становятся правилом DEFAULT_RULE_NAME без условий.
+
+compile_rules() один раз проверяет конфигурацию и строит таблицу «код события -> правила»,
+поэтому для события перебираются только правила с его кодом и правила без кодов.
+Оповещения о пороге частоты (RateAlert) несут только код события — им соответствуют
+правила без условий на поставщика, уровень и поля.
+"""
+import fnmatch
+import re
+from typing import NamedTuple
+
+
+ACTION_TYPES = ("notify", "messagebox", "execute")
+MATCH_FIELDS = ("location", "details")
+MATCH_KEYS = ("event_ids", "providers", "levels", "fields")
+RULE_KEYS = ("name", "enabled", "match", "actions")
+DEFAULT_RULE_NAME = "Окно настройки"
+
+
+class RuleError(ValueError):
+    """Ошибка в правилах триггера; текст начинается с пути к неверному ключу."""
+
+
+class RuleAction(NamedTuple):
+    type: str
+    path: str = ""
+    args: str = ""
+
+
+class TriggerRule:
+    __slots__ = ("name", "event_ids", "providers", "levels", "fields", "actions")
+
+    def __init__(self, name, actions, event_ids=None, providers=None, levels=None, fields=()):
+        self.name = name
+        self.actions = tuple(actions)
+        self.event_ids = event_ids  # frozenset или None — любой код
+        self.providers = providers
+        self.levels = levels
+        self.fields = tuple(fields)  # (поле WheaEvent, скомпилированный шаблон)
+
+    @property
+    def event_only(self):
+        """Правило проверяет только код события (подходит и для оповещений частоты)."""
+        return self.providers is None and self.levels is None and not self.fields
+
+    def accepts(self, event):
+        """Условия, кроме кода: код уже проверен выбором правила по таблице."""
+        if self.providers is not None and event.source not in self.providers:
+            return False
+        if self.levels is not None and event.level not in self.levels:
+            return False
+        for name, pattern in self.fields:
+            if pattern.match(getattr(event, name)) is None:
+                return False
+        return True
+
+
+class RuleSet:
+    """Скомпилированные правила: таблица «код события -> правила с этим кодом и правила без кодов»."""
+
+    def __init__(self, rules=()):
+        self.rules = tuple(rules)
+        self.any_id = tuple(rule for rule in self.rules if rule.event_ids is None)
+        ids = set()
+        for rule in self.rules:
+            if rule.event_ids is not None:
+                ids.update(rule.event_ids)
+        self.by_event_id = {
+            eid: tuple(rule for rule in self.rules if rule.event_ids is None or eid in rule.event_ids)
+            for eid in ids
+        }
+
+    def __len__(self):
+        return len(self.rules)
+
+    def names(self):
+        return [rule.name for rule in self.rules]
+
+    def match(self, item):
+        """Правила, совпавшие с обнаружением (Detection) или оповещением частоты, в порядке конфигурации."""
+        matched = set()
+        events = getattr(item, "events", None)
+        if events is None:
+            for eid in item.event_ids:
+                for rule in self.by_event_id.get(eid, self.any_id):
+                    if rule.event_only:
+                        matched.add(rule.name)
+        else:
+            total = len(self.rules)
+            for ev in events:
+                for rule in self.by_event_id.get(ev.event_id, self.any_id):
+                    if rule.name not in matched and rule.accepts(ev):
+                        matched.add(rule.name)
+                if len(matched) == total:
+                    break
+        if not matched:
+            return ()
+        return tuple(rule for rule in self.rules if rule.name in matched)
+
+
+def check_keys(raw, allowed, where):
+    if not isinstance(raw, dict):
+        raise RuleError(f"{where}: ожидается объект, получено {raw!r}")
+    unknown = sorted(set(raw) - set(allowed))
+    if unknown:
+        raise RuleError(f"{where}: неизвестный ключ {unknown[0]!r} (допустимы: {', '.join(allowed)})")
+
+
+def parse_int_set(raw, where, low, high):
+    if raw is None:
+        return None
+    if not isinstance(raw, list) or not raw:
+        raise RuleError(f"{where}: ожидается непустой список чисел, получено {raw!r}")
+    values = set()
+    for value in raw:
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise RuleError(f"{where}: {value!r} — не число от {low} до {high}")
+        values.add(value)
+    return frozenset(values)
+
+
+def parse_str_set(raw, where):
+    if raw is None:
+        return None
+    if not isinstance(raw, list) or not raw or not all(isinstance(v, str) and v.strip() for v in raw):
+        raise RuleError(f"{where}: ожидается непустой список строк, получено {raw!r}")
+    return frozenset(v.strip() for v in raw)
+
+
+def parse_fields(raw, where):
+    if raw is None:
+        return ()
+    check_keys(raw, MATCH_FIELDS, where)
+    fields = []
+    for name in MATCH_FIELDS:
+        if name not in raw:
+            continue
+        pattern = raw[name]
+        if not isinstance(pattern, str) or not pattern:
+            raise RuleError(f"{where}.{name}: ожидается шаблон-строка, получено {pattern!r}")
+        fields.append((name, re.compile(fnmatch.translate(pattern), re.IGNORECASE | re.DOTALL)))
+    return tuple(fields)
+
+
+def parse_action(raw, where):
+    if isinstance(raw, str):
+        raw = {"type": raw}
+    check_keys(raw, ("type", "path", "args"), where)
+    kind = raw.get("type")
+    if kind not in ACTION_TYPES:
+        raise RuleError(f"{where}.type: {kind!r} — допустимы {', '.join(ACTION_TYPES)}")
+    if kind != "execute":
+        if "path" in raw or "args" in raw:
+            raise RuleError(f"{where}: path и args задаются только для execute")
+        return RuleAction(kind)
+    path = raw.get("path")
+    args = raw.get("args", "")
+    if not isinstance(path, str) or not path.strip():
+        raise RuleError(f"{where}.path: для execute нужен путь к программе")
+    if not isinstance(args, str):
+        raise RuleError(f"{where}.args: ожидается строка, получено {args!r}")
+    return RuleAction(kind, path.strip(), args.strip())
+
+
+def parse_rule(raw, where):
+    """TriggerRule из записи trigger_rules или None для выключенного правила (enabled: false)."""
+    check_keys(raw, RULE_KEYS, where)
+    name = raw.get("name", where)
+    if not isinstance(name, str) or not name.strip():
+        raise RuleError(f"{where}.name: ожидается непустая строка, получено {name!r}")
+    if not raw.get("enabled", True):
+        return None
+    match = raw.get("match", {})
+    check_keys(match, MATCH_KEYS, f"{where}.match")
+    actions = raw.get("actions")
+    if not isinstance(actions, list) or not actions:
+        raise RuleError(f"{where}.actions: ожидается непустой список действий")
+    return TriggerRule(
+        name.strip(),
+        [parse_action(action, f"{where}.actions[{i}]") for i, action in enumerate(actions)],
+        event_ids=parse_int_set(match.get("event_ids"), f"{where}.match.event_ids", 0, 65535),
+        providers=parse_str_set(match.get("providers"), f"{where}.match.providers"),
+        levels=parse_int_set(match.get("levels"), f"{where}.match.levels", 0, 255),
+        fields=parse_fields(match.get("fields"), f"{where}.match.fields"),
+    )
+
+
+def default_rule(cfg):
+    """Правило из настроек окна триггера (message_*, execute_*) или None, если действий нет."""
+    actions = []
+    if cfg.get("message_enabled", False):
+        actions.append(RuleAction("notify" if cfg.get("message_mode", "notify") == "notify" else "messagebox"))
+    if cfg.get("execute_enabled"):
+        actions.append(RuleAction("execute", str(cfg.get("execute_path", "")).strip(),
+                                  str(cfg.get("execute_args", "")).strip()))
+    return TriggerRule(DEFAULT_RULE_NAME, actions) if actions else None
+
+
+def compile_rules(cfg):
+    """Проверить правила конфигурации и собрать RuleSet; при ошибке — RuleError с путём к ключу."""
+    rules = []
+    rule = default_rule(cfg)
+    if rule is not None:
+        rules.append(rule)
+    raw_rules = cfg.get("trigger_rules", [])
+    if not isinstance(raw_rules, list):
+        raise RuleError(f"trigger_rules: ожидается список правил, получено {raw_rules!r}")
+    names = {r.name for r in rules}
+    for i, raw in enumerate(raw_rules):
+        rule = parse_rule(raw, f"trigger_rules[{i}]")
+        if rule is None:
+            continue
+        if rule.name in names:
+            raise RuleError(f"trigger_rules[{i}].name: правило {rule.name!r} уже есть")
+        names.add(rule.name)
+        rules.append(rule)
+    return RuleSet(rules)
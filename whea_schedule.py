@@ -0,0 +1,134 @@
+"""Адаптивный интервал опроса журнала.
+
+Пока журнал спокоен, опрос идёт с интервалом, заданным пользователем (slow). После
+обнаружения или всплеска записей (проход упёрся в max_records_per_tick либо прочитал
+больше burst_records записей) интервал сжимается до fast и держится там hold_polls
+спокойных проходов, затем каждый проход растягивает его в decay раз до slow.
+
+Бюджет: опрос не должен занимать больше budget доли времени, поэтому интервал не
+опускается ниже средней длительности прохода / budget — длительность измеряется по
+фактическим проходам (timed_poll). К каждой паузе добавляется случайный сдвиг
+±jitter, чтобы машины парка, запущенные одновременно, не опрашивали журнал в такт.
+"""
+import random
+import threading
+from typing import NamedTuple
+
+from whea_metrics import METRICS
+
+
+POLL_FAST_INTERVAL = 2     # poll_fast_interval: интервал после обнаружения, с
+POLL_DECAY = 2.0           # poll_decay: во сколько раз интервал растёт за спокойный проход
+POLL_HOLD = 3              # poll_hold: спокойных проходов на быстром интервале перед затуханием
+POLL_JITTER = 0.1          # poll_jitter: случайный сдвиг паузы, доля интервала
+POLL_BUDGET = 0.05         # poll_budget: доля времени, которую может занимать опрос
+POLL_BURST_RECORDS = 1000  # poll_burst_records: записей за проход, считающихся всплеском
+DURATION_SMOOTHING = 0.5   # Вес нового прохода в средней длительности
+
+
+class PollDecision(NamedTuple):
+    interval: float
+    reason: str
+
+
+class AdaptivePollScheduler:
+    """Выбор интервала опроса. on_detection() и on_poll() вызываются из потока чтения,
+    next_delay() — из потока таймера."""
+
+    def __init__(self, slow, fast=POLL_FAST_INTERVAL, decay=POLL_DECAY, hold_polls=POLL_HOLD,
+                 jitter=POLL_JITTER, budget=POLL_BUDGET, burst_records=POLL_BURST_RECORDS):
+        self.slow = float(slow)
+        self.fast = min(float(fast), self.slow)
+        self.decay = max(1.0, float(decay))
+        self.hold_polls = max(0, int(hold_polls))
+        self.jitter = min(max(0.0, float(jitter)), 0.5)
+        self.budget = float(budget)
+        self.burst_records = int(burst_records)
+        self.lock = threading.Lock()
+        self.interval = self.slow
+        self.reason = "тишина"
+        self.reported = PollDecision(self.interval, self.reason)
+        self.hold = 0
+        self.hold_reason = ""
+        self.detected = False
+        self.avg_duration = None
+        self.changes = 0
+
+    def on_detection(self):
+        """Обнаружение в текущем проходе: следующий on_poll() сожмёт интервал."""
+        self.detected = True
+
+    def on_poll(self, duration, records=0, exhausted=False):
+        """Итог прохода: длительность (с), прочитано записей, упёрся ли проход в лимит.
+
+        Возвращает PollDecision, если интервал заметно изменился или сменилась причина, иначе None.
+        """
+        with self.lock:
+            if self.avg_duration is None:
+                self.avg_duration = duration
+            else:
+                self.avg_duration += DURATION_SMOOTHING * (duration - self.avg_duration)
+            if self.detected:
+                self.detected = False
+                self.hold, self.hold_reason = self.hold_polls, "обнаружение"
+                target, reason = self.fast, self.hold_reason
+            elif exhausted or (self.burst_records and records >= self.burst_records):
+                self.hold, self.hold_reason = self.hold_polls, f"всплеск: {records} записей за проход"
+                target, reason = self.fast, self.hold_reason
+            elif self.hold:
+                self.hold -= 1
+                target, reason = self.fast, self.hold_reason
+            else:
+                target = min(self.slow, self.interval * self.decay)
+                reason = "тишина" if target >= self.slow else "затухание"
+            floor = self.avg_duration / self.budget if self.budget > 0 else 0.0
+            if floor > target:
+                target = floor
+                reason = f"бюджет {self.budget:.0%}: проход {self.avg_duration * 1000:.0f} мс"
+            self.interval, self.reason = target, reason
+            last = self.reported
+            # Причины сравниваются без чисел после двоеточия: мелкие колебания длительности не попадают в журнал
+            same_reason = reason.split(":")[0] == last.reason.split(":")[0]
+            if same_reason and abs(target - last.interval) < 0.1 * last.interval:
+                return None
+            self.reported = PollDecision(target, reason)
+            self.changes += 1
+            return self.reported
+
+    def next_delay(self):
+        """Пауза до следующего прохода, с: текущий интервал со случайным сдвигом."""
+        with self.lock:
+            interval = self.interval
+        return interval * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "interval": round(self.interval, 3),
+                "reason": self.reason,
+                "slow": self.slow,
+                "fast": self.fast,
+                "avg_duration_ms": round(self.avg_duration * 1000, 2) if self.avg_duration is not None else None,
+                "changes": self.changes,
+            }
+
+
+def format_decision(decision):
+    return f"Интервал опроса {decision.interval:.1f} с ({decision.reason})"
+
+
+def scheduler_from_config(cfg, slow):
+    """AdaptivePollScheduler для интервала пользователя slow или None, если адаптация выключена (poll_adaptive)."""
+    if not cfg.get("poll_adaptive", True):
+        return None
+    scheduler = AdaptivePollScheduler(
+        slow,
+        fast=cfg.get("poll_fast_interval", POLL_FAST_INTERVAL),
+        decay=cfg.get("poll_decay", POLL_DECAY),
+        hold_polls=cfg.get("poll_hold", POLL_HOLD),
+        jitter=cfg.get("poll_jitter", POLL_JITTER),
+        budget=cfg.get("poll_budget", POLL_BUDGET),
+        burst_records=cfg.get("poll_burst_records", POLL_BURST_RECORDS),
+    )
+    METRICS.gauge("whead_poll_interval_seconds", "Текущий интервал опроса журнала", lambda: scheduler.interval)
+    return scheduler
@@ -0,0 +1,210 @@
+"""Окно настройки триггера (сообщение, запуск программы, пороги частоты).
+
+Импортируется при первом открытии окна, а не при запуске: вместе с формой
+подгружаются виджеты компоновки и таблица стилей, которые трею не нужны.
+"""
+import os
+import json
+
+from PyQt6.QtWidgets import (
+    QDialog, QGroupBox, QCheckBox, QLineEdit, QPushButton, QFileDialog, QLabel,
+    QHBoxLayout, QVBoxLayout, QRadioButton,
+)
+from PyQt6.QtGui import QPalette, QColor, QIcon
+
+from whea_core import CONFIG_PATH, resource_path, save_config as save_config_file, write_log, write_debug
+from whea_rates import load_rules, parse_rules_text, format_rules_text
+
+
+class TriggerSettingsForm(QDialog):
+    # Ключи конфигурации, которыми управляет форма; остальные сохраняются как есть
+    FORM_KEYS = {"message_enabled", "message_mode", "execute_enabled", "execute_path", "execute_args", "rate_rules"}
+
+    def __init__(self):
+        super().__init__()
+        self.extra_config = {}
+        self.rate_rules = []  # Последние корректные правила частоты
+        self.save_callback = None
+        self.setWindowTitle("Настройка триггера")
+        icon_path = resource_path("icon.ico")
+        if os.path.exists(icon_path):
+            self.setWindowIcon(QIcon(icon_path))
+        self.setFixedSize(450, 680)  # Прежний размер + панель порогов частоты
+
+        palette = QPalette()
+        palette.setColor(QPalette.ColorRole.Window, QColor(45, 45, 45))
+        palette.setColor(QPalette.ColorRole.WindowText, QColor(220, 220, 220))
+        self.setPalette(palette)
+
+        self.setStyleSheet(""" 
+            QWidget { background-color: #1e1f26; color: #e0e0e0; font-family: 'Segoe UI'; font-size: 14px; }
+            QGroupBox { background-color: #323232; border: 1px solid gray; border-radius: 4px; margin-top: 4px; padding: 8px; min-height: 130px; }
+            QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; padding: 0 5px; color: #F0F0F0; font-weight: bold; font-size: 15px; }
+            QCheckBox { color: #F0F0F0; spacing: 6px; padding: 2px 0; font-size: 14px; background-color: transparent; }
+            QLabel { background-color: transparent; color: #F0F0F0; font-size: 14px; }
+            QLineEdit { background-color: #2c2d35; border: 1px solid #444; border-radius: 6px; padding: 6px 8px; color: #fff; min-height: 20px; font-size: 14px; }
+            QPushButton { background-color: #3f51b5; border-radius: 6px; color: white; padding: 4px 10px; min-height: 28px; }
+            QPushButton:hover { background-color: #303f9f; }
+        """)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(8, 8, 8, 8)
+        main_layout.setSpacing(6)
+
+        # Message panel
+        self.group_message = QGroupBox("Сообщение")
+        layout_msg = QVBoxLayout(self.group_message)
+        self.checkbox_msg_enable = QCheckBox("Включить")
+        self.checkbox_msg_enable.setChecked(True)  # По умолчанию включено
+        self.checkbox_msg_enable.stateChanged.connect(self.on_message_enable_changed)
+
+        self.label_mode = QLabel("Режим уведомления")
+        self.radio_notify = QRadioButton("Стандартный Windows")
+        self.radio_notify.setChecked(True)  # По умолчанию выбрано уведомление Windows
+        self.radio_message = QRadioButton("Сообщение")
+        
+        layout_msg.addWidget(self.checkbox_msg_enable)
+        layout_msg.addWidget(self.label_mode)
+        layout_msg.addWidget(self.radio_notify)
+        layout_msg.addWidget(self.radio_message)
+        layout_msg.addStretch()
+        main_layout.addWidget(self.group_message)
+
+        # Execute panel (не изменён)
+        self.group_execute = QGroupBox("Запуск")
+        layout_exec = QVBoxLayout(self.group_execute)
+        self.checkbox_exec_enable = QCheckBox("Включить")
+        self.checkbox_exec_enable.stateChanged.connect(self.update_execute_controls)
+        layout_exec.addWidget(self.checkbox_exec_enable)
+        path_layout = QHBoxLayout()
+        self.line_program = QLineEdit()
+        self.line_program.setPlaceholderText("Путь к программе")
+        self.btn_browse = QPushButton("Обзор")
+        self.btn_browse.clicked.connect(self.browse_program)
+        self.btn_browse.setEnabled(False)
+        path_layout.addWidget(self.line_program)
+        path_layout.addWidget(self.btn_browse)
+        layout_exec.addLayout(path_layout)
+        self.line_args = QLineEdit()
+        self.line_args.setPlaceholderText("Аргумент запуска")
+        self.line_args.setEnabled(False)
+        layout_exec.addWidget(self.line_args)
+        layout_exec.addStretch()
+        main_layout.addWidget(self.group_execute)
+
+        # Rate panel: триггер срабатывает при пересечении порога, а не на каждое событие
+        self.group_rate = QGroupBox("Порог частоты")
+        layout_rate = QVBoxLayout(self.group_rate)
+        layout_rate.addWidget(QLabel("код>количество/минуты, через запятую"))
+        self.line_rate_rules = QLineEdit()
+        self.line_rate_rules.setPlaceholderText("Например: 45>10/10, 19>0/60 (пусто — любое событие)")
+        self.line_rate_rules.editingFinished.connect(self.on_rate_rules_changed)
+        layout_rate.addWidget(self.line_rate_rules)
+        self.label_rate_error = QLabel("")
+        self.label_rate_error.setStyleSheet("color: #ff8a80;")
+        layout_rate.addWidget(self.label_rate_error)
+        layout_rate.addStretch()
+        main_layout.addWidget(self.group_rate)
+
+        self.load_config()
+        self.update_message_controls()
+        self.update_execute_controls()
+
+    def on_message_enable_changed(self, state):
+        """Изменение состояния включения/выключения блока сообщений."""
+        enabled = self.checkbox_msg_enable.isChecked()
+        self.radio_notify.setEnabled(enabled)
+        self.radio_message.setEnabled(enabled)
+
+        # Логируем состояние чекбокса
+        write_debug(f"Состояние чекбокса 'Включить': {enabled}")  # Логируем состояние чекбокса
+
+        # Сохраняем обновленное состояние конфигурации
+        self.save_config()  # Сохраняем изменения в конфигурации
+
+    def update_message_controls(self):
+        """Обновление контролов для сообщений."""
+        enabled = self.checkbox_msg_enable.isChecked()
+        self.radio_notify.setEnabled(enabled)
+        self.radio_message.setEnabled(enabled)
+
+    def update_execute_controls(self):
+        """Обновление контролов для запуска программы."""
+        enabled = self.checkbox_exec_enable.isChecked()
+        self.line_program.setEnabled(enabled)
+        self.btn_browse.setEnabled(enabled)
+        self.line_args.setEnabled(enabled)
+
+    def on_rate_rules_changed(self):
+        """Проверка строки порогов; неверная строка не сохраняется, остаются прежние правила."""
+        try:
+            self.rate_rules = parse_rules_text(self.line_rate_rules.text())
+            self.label_rate_error.setText("")
+        except ValueError as e:
+            self.label_rate_error.setText(f"Ошибка: {e}")
+
+    def browse_program(self):
+        """Выбор программы через диалоговое окно."""
+        path, _ = QFileDialog.getOpenFileName(self, "Выберите .exe или .bat", "", "Executable Files (*.exe *.bat)")
+        if path:
+            self.line_program.setText(path)
+
+    def get_current_config(self):
+        """Возвращаем текущую конфигурацию триггера."""
+        return {
+            **self.extra_config,  # Ключи, которые задаются только в файле (например, max_records_per_tick)
+            "message_enabled": self.checkbox_msg_enable.isChecked(),
+            "message_mode": "notify" if self.radio_notify.isChecked() else "message",
+            "execute_enabled": self.checkbox_exec_enable.isChecked(),
+            "execute_path": self.line_program.text(),
+            "execute_args": self.line_args.text(),
+            "rate_rules": [rule.to_dict() for rule in self.rate_rules],
+        }
+
+    def load_config(self):
+        """Загрузка конфигурации."""
+        if os.path.exists(CONFIG_PATH):
+            try:
+                with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                    cfg = json.load(f)
+                    write_log(f"Загружена конфигурация триггера: {json.dumps(cfg, ensure_ascii=False)}")  # Логируем конфигурацию
+                    self.extra_config = {k: v for k, v in cfg.items() if k not in self.FORM_KEYS}
+
+                    # Без сигнала: иначе on_message_enable_changed сохранил бы наполовину загруженную форму
+                    self.checkbox_msg_enable.blockSignals(True)
+                    self.checkbox_msg_enable.setChecked(cfg.get("message_enabled", False))  # Включение триггера
+                    self.checkbox_msg_enable.blockSignals(False)
+                    write_debug(f"Значение 'message_enabled' из конфигурации: {cfg.get('message_enabled', False)}")  # Логируем значение
+
+                    mode = cfg.get("message_mode", "notify")
+                    if mode == "notify":
+                        self.radio_notify.setChecked(True)
+                    else:
+                        self.radio_message.setChecked(True)
+
+                    self.checkbox_exec_enable.setChecked(cfg.get("execute_enabled", False))
+                    self.line_program.setText(cfg.get("execute_path", ""))
+                    self.line_args.setText(cfg.get("execute_args", ""))
+                    self.rate_rules = load_rules(cfg)
+                    self.line_rate_rules.setText(format_rules_text(self.rate_rules))
+            except Exception as e:
+                write_log(f"Ошибка загрузки конфигурации: {e}")
+            self.update_message_controls()
+
+
+    def closeEvent(self, event):
+        """Переопределение метода closeEvent для сохранения конфигурации при закрытии формы."""
+        self.on_rate_rules_changed()
+        self.save_config()  # Сохраняем конфигурацию триггера перед закрытием
+        event.accept()  # Разрешаем закрытие окна
+
+    def save_config(self):
+        """Сохранение конфигурации."""
+        cfg = self.get_current_config()  # Получаем текущую конфигурацию
+        try:
+            save_config_file(cfg)
+            write_log(f"Конфигурация триггера сохранена: {json.dumps(cfg, ensure_ascii=False)}")  # Логируем сохранение
+        except Exception as e:
+            write_log(f"Ошибка сохранения конфигурации триггера: {e}")
+        if self.save_callback is not None:
+            self.save_callback(cfg)  # Новые настройки применяются сразу, без перезапуска
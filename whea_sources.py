@@ -0,0 +1,619 @@
+"""Источники событий журнала для WHEAD.
+
+Все источники передают новые записи пачками в один и тот же callback, поэтому путь
+обнаружения и триггеров (WheaDetector -> обработчик в приложении) общий:
+
+* MultiChannelEventSource — опрос по таймеру нескольких каналов (System, Microsoft-Windows-Kernel-WHEA/…)
+  за один проход: у каждого канала свой курсор, записи сливаются в один поток по времени;
+* PollingEventSource / ChannelQuerySource — чтение одного канала: классический журнал через
+  ReadEventLog, канал Windows Event Log через EvtQuery;
+* SubscriptionEventSource — подписка EvtSubscribe, Windows сама доставляет новые WHEA-записи;
+* SimulatedEventSource — воспроизведение заданного сценария без Windows API (тесты, бенчмарки на Linux).
+
+ScanWorker выполняет источник в отдельном потоке, чтобы чтение журнала не блокировало GUI.
+"""
+import heapq
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+from whea_core import (
+    win32evtlog, write_log, write_debug, WARNING, EventLogCursor, EventLogHandlePool,
+    ERROR_EVENTLOG_FILE_CHANGED, ERROR_INVALID_HANDLE, RPC_ERRORS, ScanStats, EventRecord, read_new_events,
+    event_timestamp, MAX_RECORDS_PER_TICK, EVENT_CHANNELS, DEFAULT_MATCHER,
+)
+from whea_metrics import POLL_DURATION, POLL_ERRORS, RECORDS_PER_TICK, RECORDS_SCANNED, TICKS_COALESCED
+
+
+EVENT_NS = "{http://schemas.microsoft.com/win/2004/08/events/event}"
+
+# Level из XML-представления события -> EventType классического API
+LEVEL_TO_EVENT_TYPE = {1: 1, 2: 1, 3: 2, 4: 4, 0: 4}
+
+# Журналы, которые открываются классическим OpenEventLog; остальные каналы читаются через EvtQuery
+CLASSIC_LOGS = {"System", "Application", "Security", "Setup"}
+
+ERROR_EVT_CHANNEL_NOT_FOUND = 15007
+CURSOR_SAVE_INTERVAL = 1.0  # Подписка сохраняет курсор на диск не чаще раза в столько секунд
+EVT_NEXT_BATCH = 64  # Записей за один вызов EvtNext
+CLEAR_CHECK_INTERVAL = 60.0  # Как часто пустой канал проверяется на очистку (EvtOpenLog + EvtGetLogInfo), с
+
+
+class EventSource:
+    """Базовый источник событий.
+
+    start() подключает обработчики: on_events(list) получает пачку новых записей,
+    on_error(str) — текст ошибки. Если needs_polling == True, приложение само вызывает
+    poll() по таймеру; остальные источники доставляют события сами (из своего потока).
+    """
+
+    needs_polling = False
+    name = "base"
+
+    def __init__(self):
+        self.on_events = None
+        self.on_error = None
+        self.running = False
+
+    def start(self, on_events, on_error=None):
+        self.on_events = on_events
+        self.on_error = on_error
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def poll(self):
+        """Один проход чтения. Для push-источников ничего не делает."""
+
+    def deliver(self, events):
+        if events and self.on_events is not None:
+            self.on_events(events)
+
+    def report_error(self, text):
+        POLL_ERRORS.inc(1, self.name)
+        write_log(text, WARNING)
+        if self.on_error is not None:
+            self.on_error(text)
+
+
+def timed_poll(source):
+    """source.poll() с записью длительности прохода (чтение и обработка) в метрики.
+
+    Возвращает длительность прохода в секундах (для выбора интервала опроса).
+    """
+    started = time.perf_counter()
+    try:
+        source.poll()
+    finally:
+        elapsed = time.perf_counter() - started
+        POLL_DURATION.observe(elapsed, source.name)
+    return elapsed
+
+
+class PollingEventSource(EventSource):
+    """Опрос журнала: каждый poll() дочитывает записи после сохранённого курсора."""
+
+    needs_polling = True
+    name = "poll"
+
+    # После этих ошибок хендл заново открывается сразу, в том же проходе
+    REOPEN_ERRORS = {ERROR_EVENTLOG_FILE_CHANGED, ERROR_INVALID_HANDLE}
+
+    def __init__(self, server='localhost', log_type='System', cursor=None, since=None,
+                 max_records=MAX_RECORDS_PER_TICK, stats=None, handles=None):
+        super().__init__()
+        self.server = server
+        self.log_type = log_type
+        self.cursor = cursor if cursor is not None else EventLogCursor()
+        self.since = since
+        self.max_records = max_records
+        self.stats = stats if stats is not None else ScanStats()
+        self.handles = handles if handles is not None else EventLogHandlePool()
+
+    def poll(self):
+        try:
+            events = self.read()
+        except Exception as e:
+            self.report_error(str(e))
+            return
+        self.deliver(events)
+
+    def read(self):
+        """Прочитать новые записи после курсора. Ошибки открытия и чтения — исключением."""
+        if win32evtlog is None:
+            raise RuntimeError("Журнал событий Windows недоступен (pywin32 не установлен)")
+        self.stats.begin_tick()
+        events = self.read_records()
+        scanned = self.stats.tick["records_scanned"]
+        RECORDS_PER_TICK.observe(scanned)
+        RECORDS_SCANNED.inc(scanned)
+        write_debug(f"Статистика чтения журнала: {self.stats.summary()}; хендлы: {self.handles.summary()}")
+        return events
+
+    def read_records(self):
+        """Записи после курсора и сдвиг курсора; счётчики тика уже сброшены в read()."""
+        position = self.cursor.get(self.server, self.log_type)
+        for attempt in (1, 2):
+            try:
+                hand = self.handles.acquire(self.server, self.log_type)
+            except Exception as e:
+                raise RuntimeError(f"Ошибка открытия журнала событий: {e}") from e
+            try:
+                events, new_position = read_new_events(
+                    hand, position,
+                    since=self.since,
+                    max_records=self.max_records,
+                    stats=self.stats,
+                )
+                break
+            except Exception as e:
+                # Хендл мог устареть (журнал очищен, служба перезапущена, хост недоступен)
+                self.handles.invalidate(self.server, self.log_type)
+                winerror = getattr(e, "winerror", None)
+                if attempt == 1 and winerror in self.REOPEN_ERRORS:
+                    write_log(f"Хендл журнала {self.log_type} устарел (код {winerror}), открываем заново", WARNING)
+                    continue
+                if winerror in RPC_ERRORS:
+                    raise RuntimeError(f"Хост {self.server} недоступен: {e}") from e
+                raise RuntimeError(f"Ошибка чтения журнала событий: {e}") from e
+
+        if new_position != position:
+            self.cursor.set(self.server, self.log_type, new_position)
+            self.cursor.save()
+
+        if not events:
+            write_debug(f"Новых событий нет в {self.log_type} (курсор: {new_position.get('record')})")
+        else:
+            write_debug(f"Прочитано новых событий {self.log_type}: {len(events)}, курсор: {new_position.get('record')}")
+        return events
+
+
+def format_system_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class ChannelQuerySource(PollingEventSource):
+    """Чтение канала Windows Event Log (например, Microsoft-Windows-Kernel-WHEA/Errors) через EvtQuery.
+
+    Классический OpenEventLog такие каналы не открывает. Запрос XPath отбирает только
+    записи после курсора (EventRecordID) и только пары (поставщик, код) из таблицы
+    совпадений, поэтому отрисовываются в XML лишь новые WHEA-записи. Канала может не
+    быть в этой версии Windows — тогда он отключается до следующего запуска мониторинга.
+    Очистку канала тихий тик проверяет не чаще раза в CLEAR_CHECK_INTERVAL секунд, чтобы
+    простой проход стоил один EvtQuery на канал.
+    """
+
+    name = "channel"
+
+    def __init__(self, server='localhost', log_type=EVENT_CHANNELS[1], cursor=None, since=None,
+                 max_records=MAX_RECORDS_PER_TICK, stats=None, handles=None, matcher=DEFAULT_MATCHER):
+        super().__init__(server, log_type, cursor, since, max_records, stats, handles)
+        self.filter = matcher.xpath()
+        self.session = None
+        self.disabled = False
+        self.next_clear_check = 0.0
+
+    def open_session(self):
+        """Сессия удалённого журнала (None — локальный компьютер)."""
+        if self.server in ('localhost', '.', '') or self.session is not None:
+            return self.session
+        self.session = win32evtlog.EvtOpenSession(
+            (self.server, None, None, None, win32evtlog.EvtRpcLoginAuthDefault), win32evtlog.EvtRpcLogin)
+        return self.session
+
+    def query(self, condition, max_records):
+        flags = win32evtlog.EvtQueryChannelPath | win32evtlog.EvtQueryForwardDirection
+        result = win32evtlog.EvtQuery(self.log_type, flags, f"*[System[({condition}) and ({self.filter})]]",
+                                      self.open_session())
+        records = []
+        while len(records) < max_records:
+            handles = win32evtlog.EvtNext(result, min(EVT_NEXT_BATCH, max_records - len(records)))
+            if not handles:
+                break
+            self.stats.add("buffers_read")
+            for handle in handles:
+                records.append(record_from_xml(win32evtlog.EvtRender(handle, win32evtlog.EvtRenderEventXml)))
+        self.stats.add("records_scanned", len(records))
+        if len(records) >= max_records:
+            self.stats.add("budget_exhausted")
+            write_log(f"Достигнут лимит {max_records} записей за тик в {self.log_type}, остаток будет прочитан на следующем тике", WARNING)
+        return records
+
+    def last_record_number(self):
+        """Номер самой новой записи канала — чтобы заметить очистку канала (нумерация начинается заново)."""
+        log = win32evtlog.EvtOpenLog(self.log_type, win32evtlog.EvtOpenChannelPath, self.open_session())
+        oldest = win32evtlog.EvtGetLogInfo(log, win32evtlog.EvtLogOldestRecordNumber)[0]
+        total = win32evtlog.EvtGetLogInfo(log, win32evtlog.EvtLogNumberOfLogRecords)[0]
+        return (oldest or 0) + (total or 0) - 1
+
+    def clear_check_due(self):
+        now = time.monotonic()
+        if now < self.next_clear_check:
+            return False
+        self.next_clear_check = now + CLEAR_CHECK_INTERVAL
+        return True
+
+    def read_records(self):
+        if self.disabled:
+            return []
+        position = self.cursor.get(self.server, self.log_type)
+        try:
+            if position is None:
+                since = self.since if self.since is not None else time.time()
+                condition = f"TimeCreated[@SystemTime>='{format_system_time(since)}']"
+            else:
+                condition = f"EventRecordID>{position.get('record', 0)}"
+            records = self.query(condition, self.max_records)
+            if not records and position is not None and self.clear_check_due() \
+                    and position.get("record", 0) > self.last_record_number():
+                write_log(f"Канал {self.log_type} очищен (курсор {position.get('record')}), чтение с начала", WARNING)
+                records = self.query("EventRecordID>0", self.max_records)
+                position = {"record": 0, "time": 0}
+        except Exception as e:
+            self.session = None
+            winerror = getattr(e, "winerror", None)
+            if winerror == ERROR_EVT_CHANNEL_NOT_FOUND:
+                self.disabled = True
+                write_log(f"Канал {self.log_type} не найден на {self.server}, он не будет читаться", WARNING)
+                return []
+            if winerror in RPC_ERRORS:
+                raise RuntimeError(f"Хост {self.server} недоступен: {e}") from e
+            raise RuntimeError(f"Ошибка чтения канала {self.log_type}: {e}") from e
+
+        if records:
+            last = records[-1]
+            self.cursor.set(self.server, self.log_type, {"record": last.RecordNumber, "time": event_timestamp(last)})
+            self.cursor.save()
+            write_debug(f"Прочитано новых событий {self.log_type}: {len(records)}, курсор: {last.RecordNumber}")
+        return records
+
+
+def record_time(record):
+    try:
+        return record.TimeGenerated.timestamp()
+    except Exception:
+        return event_timestamp(record) or 0
+
+
+class MultiChannelEventSource(PollingEventSource):
+    """Опрос нескольких каналов за один проход.
+
+    У каждого канала свой курсор (ключ сервер\\канал в EventLogCursor), поэтому стоимость
+    прохода зависит от числа новых записей, а не от числа каналов и размера журналов.
+    Записи каналов упорядочены по времени каждая, и слияние heapq.merge даёт один поток
+    по времени. Ошибка одного канала не мешает остальным; если не прочитался ни один —
+    проход завершается исключением, как у одиночного источника.
+
+    Лимит max_records общий на проход: каждый канал получает остаток после предыдущих.
+    Если лимит исчерпан, следующий проход начинается со следующего канала, чтобы шумный
+    канал не забирал весь лимит у остальных.
+    """
+
+    name = "poll"
+
+    def __init__(self, server='localhost', channels=EVENT_CHANNELS, cursor=None, since=None,
+                 max_records=MAX_RECORDS_PER_TICK, stats=None, handles=None, matcher=DEFAULT_MATCHER):
+        super().__init__(server, channels[0], cursor, since, max_records, stats, handles)
+        self.channels = tuple(channels)
+        self.readers = [self.create_reader(channel, matcher) for channel in self.channels]
+        self.first_reader = 0
+
+    def create_reader(self, channel, matcher):
+        args = (self.server, channel, self.cursor, self.since, self.max_records, self.stats, self.handles)
+        if channel in CLASSIC_LOGS:
+            return PollingEventSource(*args)
+        return ChannelQuerySource(*args, matcher=matcher)
+
+    def read_records(self):
+        batches = []
+        errors = []
+        remaining = self.max_records
+        readers = self.readers[self.first_reader:] + self.readers[:self.first_reader]
+        for reader in readers:
+            if remaining <= 0:
+                break
+            reader.max_records = remaining
+            try:
+                batch = reader.read_records()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            if batch:
+                batches.append(batch)
+                remaining -= len(batch)
+        if remaining <= 0:
+            self.first_reader = (self.first_reader + 1) % len(self.readers)
+        if errors:
+            if len(errors) == len(self.readers):
+                raise RuntimeError("; ".join(errors))
+            for text in errors:
+                self.report_error(text)
+        if len(batches) <= 1:
+            return batches[0] if batches else []
+        return list(heapq.merge(*batches, key=record_time))
+
+
+def build_whea_query(channels=EVENT_CHANNELS, matcher=DEFAULT_MATCHER):
+    """Структурированный запрос EvtSubscribe: по Select на канал, только пары (поставщик, код) из таблицы."""
+    condition = matcher.xpath()
+    selects = "".join(f'<Select Path="{channel}">*[System[{condition}]]</Select>' for channel in channels)
+    return f'<QueryList><Query Id="0">{selects}</Query></QueryList>'
+
+
+def parse_system_time(value):
+    """Разбор SystemTime вида 2025-01-31T10:20:30.1234567Z (дробная часть до 7 знаков)."""
+    value = value.rstrip("Z")
+    if "." in value:
+        head, frac = value.split(".", 1)
+        value = f"{head}.{frac[:6]}"
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def record_from_xml(xml_text):
+    """Преобразует XML-представление события (EvtRender) в EventRecord."""
+    root = ET.fromstring(xml_text)
+    system = root.find(f"{EVENT_NS}System")
+    provider = system.find(f"{EVENT_NS}Provider")
+    time_created = system.find(f"{EVENT_NS}TimeCreated")
+    level = int(system.findtext(f"{EVENT_NS}Level", "4") or 4)
+    data = root.find(f"{EVENT_NS}EventData")
+    inserts = [d.text or "" for d in data] if data is not None else None
+    return EventRecord(
+        RecordNumber=int(system.findtext(f"{EVENT_NS}EventRecordID", "0")),
+        EventID=int(system.findtext(f"{EVENT_NS}EventID", "0")),
+        TimeGenerated=parse_system_time(time_created.get("SystemTime")) if time_created is not None else datetime.now(timezone.utc),
+        SourceName=provider.get("Name", "") if provider is not None else "",
+        EventType=LEVEL_TO_EVENT_TYPE.get(level, 4),
+        ComputerName=system.findtext(f"{EVENT_NS}Computer", ""),
+        StringInserts=inserts,
+        Channel=system.findtext(f"{EVENT_NS}Channel", ""),
+    )
+
+
+class SubscriptionEventSource(EventSource):
+    """Подписка на журнал через EvtSubscribe: WHEA-записи доставляются сразу после записи.
+
+    Одна подписка охватывает все каналы (структурированный запрос QueryList).
+    При старте подписка создаётся до догоняющего чтения по курсору, поэтому события,
+    записанные пока приложение не работало, не теряются, а дубликаты отсекаются по курсору
+    своего канала.
+    Callback подписки вызывается из потока Windows — приложение должно само передать
+    пачку в GUI-поток. Курсор в памяти сдвигается на каждое событие, а на диск пишется
+    не чаще раза в CURSOR_SAVE_INTERVAL секунд и при остановке — во всплеске это одна
+    запись файла в секунду, а не на каждое событие.
+    """
+
+    name = "subscribe"
+
+    # Канал, которого нет в этой версии Windows, не должен отменять подписку на остальные
+    TOLERATE_QUERY_ERRORS = 0x1000  # EvtSubscribeTolerateQueryErrors
+
+    def __init__(self, server='localhost', channels=EVENT_CHANNELS, cursor=None, since=None,
+                 max_records=MAX_RECORDS_PER_TICK, stats=None, handles=None, matcher=DEFAULT_MATCHER):
+        super().__init__()
+        self.matcher = matcher
+        self.poller = MultiChannelEventSource(server, channels, cursor, since, max_records, stats, handles, matcher)
+        self.lock = threading.Lock()
+        self.subscription = None
+        self.last_save = 0.0
+        self.unsaved = False
+
+    @property
+    def cursor(self):
+        return self.poller.cursor
+
+    def start(self, on_events, on_error=None):
+        super().start(on_events, on_error)
+        if win32evtlog is None:
+            self.report_error("Подписка на журнал недоступна (pywin32 не установлен)")
+            return
+        try:
+            self.subscription = win32evtlog.EvtSubscribe(
+                None,
+                win32evtlog.EvtSubscribeToFutureEvents | self.TOLERATE_QUERY_ERRORS,
+                Query=build_whea_query(self.poller.channels, self.matcher),
+                Callback=self.on_subscription_event,
+            )
+            write_log(f"Создана подписка на каналы {', '.join(self.poller.channels)}")
+        except Exception as e:
+            self.report_error(f"Ошибка создания подписки на журнал событий: {e}")
+            return
+        # Догоняем то, что было записано до подписки (в том числе пока приложение не работало)
+        self.poller.start(on_events, on_error)
+        with self.lock:
+            self.poller.poll()
+
+    def stop(self):
+        super().stop()
+        self.poller.stop()
+        self.subscription = None  # Хендл подписки закрывается при удалении объекта
+        with self.lock:
+            if self.unsaved:
+                self.cursor.save()
+                self.unsaved = False
+
+    def on_subscription_event(self, action, context, event_handle):
+        if not self.running:
+            return
+        if action != win32evtlog.EvtSubscribeActionDeliver:
+            self.report_error(f"Ошибка подписки на журнал событий (код {event_handle})")
+            return
+        try:
+            record = record_from_xml(win32evtlog.EvtRender(event_handle, win32evtlog.EvtRenderEventXml))
+        except Exception as e:
+            self.report_error(f"Ошибка разбора события подписки: {e}")
+            return
+
+        server, log_type = self.poller.server, record.Channel or self.poller.log_type
+        ts = event_timestamp(record)
+        with self.lock:
+            position = self.cursor.get(server, log_type) or {"record": 0, "time": 0}
+            # Уже прочитано догоняющим проходом (после очистки журнала номера меньше, но время новее)
+            if record.RecordNumber <= position.get("record", 0) and (ts or 0) <= (position.get("time") or 0):
+                return
+            self.cursor.set(server, log_type, {"record": record.RecordNumber, "time": ts})
+            now = time.monotonic()
+            self.unsaved = now - self.last_save < CURSOR_SAVE_INTERVAL
+            if not self.unsaved:
+                self.cursor.save()
+                self.last_save = now
+        self.deliver([record])
+
+
+class SimulatedEventSource(EventSource):
+    """Воспроизводит сценарий событий без Windows API.
+
+    script — последовательность шагов (задержка в секундах, события шага), где события —
+    код события, EventRecord или список из них. В режиме realtime шаги доставляются из
+    фонового потока с указанными задержками; иначе каждый poll() выдаёт следующий шаг.
+    Синтетические записи (заданные кодом) получают время в момент выдачи, а не создания
+    сценария — иначе фильтр since и окна частоты считали бы поздние шаги устаревшими.
+    """
+
+    name = "simulate"
+
+    def __init__(self, script, realtime=False, source_name=None):
+        super().__init__()
+        self.realtime = realtime
+        self.needs_polling = not realtime
+        self.source_name = source_name
+        self.next_record = 1
+        self.steps = [(delay, self.make_records(items)) for delay, items in script]
+        self.position = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def make_records(self, items):
+        if not isinstance(items, (list, tuple)):
+            items = [items]
+        records = []
+        for item in items:
+            if not isinstance(item, EventRecord):
+                source_name = self.source_name or DEFAULT_MATCHER.provider_for(int(item)) or "TestWHEA"
+                item = EventRecord(self.next_record, int(item), None, source_name)
+            self.next_record = max(self.next_record, item.RecordNumber) + 1
+            records.append(item)
+        return records
+
+    @staticmethod
+    def stamp(records):
+        """Копии синтетических записей (без TimeGenerated) с текущим временем."""
+        now = datetime.now(timezone.utc)
+        return [
+            EventRecord(r.RecordNumber, r.EventID, now, r.SourceName) if r.TimeGenerated is None else r
+            for r in records
+        ]
+
+    @property
+    def finished(self):
+        return self.position >= len(self.steps)
+
+    def start(self, on_events, on_error=None):
+        super().start(on_events, on_error)
+        self.stop_event.clear()
+        if self.realtime:
+            self.thread = threading.Thread(target=self.run, name="WHEAD-simulated-source", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        super().stop()
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def poll(self):
+        if not self.running or self.finished:
+            return
+        _, records = self.steps[self.position]
+        self.position += 1
+        self.deliver(self.stamp(records))
+
+    def run(self):
+        while self.running and not self.finished:
+            delay, records = self.steps[self.position]
+            if self.stop_event.wait(delay):
+                return
+            self.position += 1
+            self.deliver(self.stamp(records))
+
+
+def create_event_source(kind, **kwargs):
+    """Создаёт источник по имени из конфигурации: poll (по умолчанию) или subscribe."""
+    if kind == SubscriptionEventSource.name:
+        return SubscriptionEventSource(**kwargs)
+    return MultiChannelEventSource(**kwargs)
+
+
+
+class ScanWorker:
+    """Фоновый поток чтения журнала: открытие, чтение и обработка идут вне GUI-потока.
+
+    GUI только вызывает request_poll() по таймеру. Если предыдущий проход ещё не закончился,
+    новые запросы не ставятся в очередь, а объединяются в один следующий проход.
+    Источник запускается и останавливается в этом же потоке (для подписки это включает
+    догоняющее чтение по курсору). on_polled(duration) вызывается после каждого прохода.
+    """
+
+    def __init__(self, source, on_events, on_error=None, stop_timeout=10.0, on_polled=None):
+        self.source = source
+        self.on_events = on_events
+        self.on_error = on_error
+        self.on_polled = on_polled
+        self.stop_timeout = stop_timeout
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = False
+        self.stopping = False
+        self.polls = 0
+        self.coalesced = 0
+        self.thread = None
+
+    def start(self):
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="WHEAD-scan-worker", daemon=True)
+        self.thread.start()
+
+    def request_poll(self):
+        """Запросить проход чтения. Возвращает False, если запрос объединён с уже ожидающим."""
+        with self.lock:
+            if self.pending:
+                self.coalesced += 1
+                TICKS_COALESCED.inc()
+                return False
+            self.pending = True
+        self.wake.set()
+        return True
+
+    def stop(self):
+        """Остановить поток, дождавшись окончания текущего прохода (не дольше stop_timeout)."""
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(self.stop_timeout)
+            if self.thread.is_alive():
+                write_log(f"Поток чтения журнала не завершился за {self.stop_timeout} с")
+        self.thread = None
+        write_log(f"Поток чтения журнала остановлен: проходов {self.polls}, объединено тиков {self.coalesced}")
+
+    def run(self):
+        try:
+            self.source.start(self.on_events, self.on_error)
+            while True:
+                self.wake.wait()
+                if self.stopping:
+                    break
+                with self.lock:
+                    self.wake.clear()
+                    self.pending = False
+                try:
+                    duration = timed_poll(self.source)
+                    self.polls += 1
+                    if self.on_polled is not None:
+                        self.on_polled(duration)
+                except Exception as e:
+                    self.source.report_error(f"Ошибка прохода чтения журнала: {e}")
+        finally:
+            self.source.stop()
@@ -0,0 +1,122 @@
+"""WHEA Tools: консоль для записи тестовых WHEA-событий в журнал System.
+
+Текст пакетного файла держится здесь, а не в WHEA.py, и модуль импортируется только
+по кнопке «WHEA Tools» — при запуске программы эта строка не загружается.
+"""
+import subprocess
+import tempfile
+
+from whea_core import write_log
+
+
+TOOLS_BAT = r"""@echo off
+chcp 65001 >nul
+
+:: Проверка прав администратора
+>nul 2>&1 "%SYSTEMROOT%\system32\cacls.exe" "%SYSTEMROOT%\system32\config\system"
+if '%errorlevel%' NEQ '0' (
+    echo Admin rights required. Restarting as admin...
+    powershell -Command "Start-Process -Verb runAs -FilePath '%~f0'"
+    exit /b
+)
+
+:main_loop
+cls
+echo ┌─────┐ ┌─────┐ ┌─────┐  ┌───────────────────────────────────────────────────┐
+echo │ ┌───┘ │ ┌─┐ │ │ ┌───┘  │ Forgotten Private Coalition                       │
+echo │ └───┐ │ └─┘ │ │ │      │ WHEA Trigger Tools                                │
+echo │ ┌───┘ │ ┌───┘ │ │      -│ Private version                                   │
+echo │ │     │ │     │ └───┐  │ License CC BY 4.0                                 │
+echo └─┘     └─┘     └─────┘  └───────────────────────────────────────────────────┘
+echo.
+echo Available WHEA EventIDs and meanings:
+echo  17 - General hardware error event
+echo  18 - Machine Check Exception (MCE)
+echo  19 - Corrected Machine Check error
+echo  20 - PCI Express error
+echo  41 - Detailed WHEA error report
+echo  45 - Corrected memory error
+echo  46 - Corrected processor error
+echo  47 - Corrected PCI Express error
+echo.
+echo Commands:
+echo  ex - Exit program
+echo  el - Open Windows Event Viewer / System log
+echo  ec - Clear all errors from TestWHEA source
+echo.
+
+if defined last_message (
+    echo %last_message%
+    echo.
+    set "last_message="
+)
+
+set /p input=Enter "EventID Level" (Level: 1=Warning, 2=Error) or command (ex, el, ec): 
+
+:: Command checks
+if /i "%input%"=="ex" (
+    exit /b
+)
+if /i "%input%"=="el" (
+    start eventvwr.msc /s:"System"
+    set last_message=Windows System event log opened.
+    goto main_loop
+)
+if /i "%input%"=="ec" (
+    echo Clearing all errors from TestWHEA source...
+    wevtutil.exe cl System
+    set last_message=System log cleared.
+    goto main_loop
+)
+
+:: Process EventID and Level
+for /f "tokens=1,2" %%a in ("%input%") do (
+    set "code=%%a"
+    set "level=%%b"
+)
+
+if not defined code (
+    set last_message=Invalid input. Try again.
+    goto main_loop
+)
+if not defined level (
+    set last_message=Invalid input. Try again.
+    goto main_loop
+)
+
+set executed=0
+
+for %%E in (17 18 19 20 41 45 46 47) do (
+    if "%code%"=="%%E" (
+        if "%level%"=="1" (
+            eventcreate /T WARNING /ID %%E /L SYSTEM /SO TestWHEA /D "Test warning WHEA (EventID %%E)"
+            set executed=1
+        ) else if "%level%"=="2" (
+            eventcreate /T ERROR /ID %%E /L SYSTEM /SO TestWHEA /D "Test error WHEA (EventID %%E)"
+            set executed=1
+        )
+    )
+)
+
+if "%executed%"=="1" (
+    set last_message=Operation successful.
+    goto main_loop
+) else (
+    set last_message=Invalid input or unsupported EventID/Level. Try again.
+    goto main_loop
+)
+"""
+
+
+def launch_tools():
+    """Записать пакетный файл во временный каталог и запустить его (он сам запросит права администратора)."""
+    try:
+        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".bat", encoding="utf-8") as tmpfile:
+            tmpfile.write(TOOLS_BAT)
+            tmp_path = tmpfile.name
+        subprocess.Popen(
+            ["cmd.exe", "/c", tmp_path],
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+    except Exception as e:
+        write_log(f"Error launching WHEA Tools: {e}")
@@ -0,0 +1,404 @@
+"""Действия триггера при обнаружении WHEA-ошибок — общие для GUI и headless-режима.
+
+Действия выполняет TriggerExecutor в своих потоках, а не путь обнаружения:
+обнаружения за окно debounce объединяются в одну пачку (TriggerBatch), между
+срабатываниями выдерживается cooldown, число одновременно запущенных внешних
+программ ограничено, MessageBox показывается в отдельном потоке.
+GUI передаёт notify — функцию показа уведомления в трее; без неё (headless)
+уведомление только записывается в журнал.
+
+Что выполнять, решают правила (whea_rules): submit() сразу сопоставляет обнаружение
+со скомпилированными правилами, и пачка выполняет действия всех совпавших правил.
+"""
+import ctypes
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from whea_core import WARNING, write_log, write_debug, write_error_log
+from whea_metrics import METRICS, TRIGGER_LATENCY, TRIGGER_DROPPED
+from whea_rules import RuleError, RuleSet, compile_rules, default_rule
+
+
+def show_messagebox(text, title="WHEA Monitor"):
+    if not hasattr(ctypes, "windll"):
+        write_log(f"MessageBox недоступен вне Windows: {text}")
+        return
+    ctypes.windll.user32.MessageBoxW(0, text, title, 0x40)  # MB_ICONINFORMATION
+
+
+def detection_message(detection):
+    timestamp = detection.time.strftime('%H:%M:%S')
+    where = f" на {detection.host}" if detection.host != 'localhost' else ""
+    details = f". {'; '.join(detection.details)}" if detection.details else ""
+    repeats = sum(ev.occurrences for ev in detection.events) - len(detection.events)
+    if repeats > 0:
+        details += f" (повторов: {repeats})"
+    return f"[{timestamp}] Найдена ошибка WHEA{where} ({detection.count}). Коды ошибок: {detection.codes_str}{details}"
+
+
+def log_rate_alert(alert):
+    """Записать пересечение порога частоты в оба журнала, вернуть текст сообщения."""
+    msg = alert.message()
+    write_log(msg, WARNING)
+    write_error_log(msg)
+    return msg
+
+
+def log_detection(detection):
+    """Записать обнаружение в LTC-Logger.log и LTC-Errors.log, вернуть текст сообщения."""
+    msg = detection_message(detection)
+    write_log(msg)
+    write_error_log(msg)
+    return msg
+
+
+# Значения по умолчанию для ключей конфигурации триггера
+TRIGGER_DEBOUNCE = 2.0        # trigger_debounce: окно объединения обнаружений, с
+TRIGGER_COOLDOWN = 60.0       # trigger_cooldown: минимальный интервал между срабатываниями, с
+MAX_RUNNING_PROGRAMS = 2      # max_running_programs: одновременно запущенных внешних программ
+ACTION_QUEUE_SIZE = 16        # action_queue_size: пачек в очереди на выполнение
+PROGRAM_SLOT_TIMEOUT = 30.0   # Сколько ждать свободного слота для запуска программы, с
+
+
+def load_trigger_rules(cfg):
+    """Скомпилированные правила; при ошибке в trigger_rules остаётся только правило окна настройки."""
+    try:
+        return compile_rules(cfg)
+    except RuleError as e:
+        write_log(f"Ошибка в правилах триггера, используются только настройки окна: {e}", WARNING)
+        rule = default_rule(cfg)
+        return RuleSet([rule] if rule is not None else [])
+
+
+class TriggerBatch:
+    """Обнаружения, объединённые в одно срабатывание триггера."""
+
+    def __init__(self, detection, rules=()):
+        self.first_time = detection.time
+        self.last_time = detection.time
+        self.first_monotonic = time.monotonic()
+        self.detections = 0
+        self.new_count = 0
+        self.count = 0
+        self.event_ids = set()
+        self.hosts = set()
+        self.reasons = []  # Описания пересечённых порогов частоты (RateAlert)
+        self.details = []  # Описания из записей CPER: модуль памяти, банк MCA, устройство PCIe
+        self.rules = {}    # Совпавшие правила по имени, в порядке совпадения
+        self.merge(detection, rules)
+
+    def merge(self, detection, rules=()):
+        for rule in rules:
+            self.rules.setdefault(rule.name, rule)
+        self.detections += 1
+        self.new_count += detection.new_count
+        self.count = max(self.count, detection.count)
+        self.event_ids.update(detection.event_ids)
+        self.hosts.add(detection.host)
+        self.last_time = detection.time
+        reason = getattr(detection, "reason", None)
+        if reason is not None and reason not in self.reasons and len(self.reasons) < 5:
+            self.reasons.append(reason)
+        for text in detection.details:
+            if text not in self.details and len(self.details) < 3:
+                self.details.append(text)
+
+    @property
+    def codes_str(self):
+        return ', '.join(str(eid) for eid in sorted(self.event_ids))
+
+    def actions(self):
+        """Действия совпавших правил без повторов: одинаковое действие двух правил выполняется один раз."""
+        seen = {}
+        for rule in self.rules.values():
+            for action in rule.actions:
+                seen.setdefault(action, None)
+        return list(seen)
+
+    @property
+    def where(self):
+        hosts = sorted(self.hosts - {'localhost'})
+        return f" на {', '.join(hosts)}" if hosts else ""
+
+    def environment(self):
+        """Переменные окружения для внешней программы — сводка по всей пачке."""
+        return {
+            "WHEAD_COUNT": str(self.new_count),
+            "WHEAD_TOTAL": str(self.count),
+            "WHEAD_DETECTIONS": str(self.detections),
+            "WHEAD_EVENT_IDS": ",".join(str(eid) for eid in sorted(self.event_ids)),
+            "WHEAD_HOSTS": ",".join(sorted(self.hosts)),
+            "WHEAD_FIRST_TIME": self.first_time.isoformat(timespec="seconds"),
+            "WHEAD_LAST_TIME": self.last_time.isoformat(timespec="seconds"),
+            "WHEAD_REASON": "; ".join(self.reasons),
+            "WHEAD_DETAILS": "; ".join(self.details),
+            "WHEAD_RULES": "; ".join(self.rules),
+        }
+
+    def format_args(self, args):
+        """Подстановка {count}, {total}, {event_ids}, {hosts}, {detections} в аргументы запуска."""
+        values = {
+            "count": self.new_count,
+            "total": self.count,
+            "event_ids": ",".join(str(eid) for eid in sorted(self.event_ids)),
+            "hosts": ",".join(sorted(self.hosts)),
+            "detections": self.detections,
+        }
+        result = []
+        for arg in args:
+            try:
+                result.append(arg.format(**values))
+            except (KeyError, IndexError, ValueError):
+                result.append(arg)
+        return result
+
+
+class TriggerExecutor:
+    """Асинхронное выполнение действий триггера с объединением всплесков и ограничением частоты.
+
+    submit() вызывается из потока обнаружения и никогда не блокирует: обнаружение
+    добавляется в текущую пачку. Поток-диспетчер отправляет пачку на выполнение через
+    trigger_debounce секунд после первого обнаружения, но не раньше чем через
+    trigger_cooldown после предыдущего срабатывания. Очередь пачек ограничена
+    action_queue_size — при переполнении пачка отбрасывается и учитывается в метриках.
+    """
+
+    ACTIONS = ("notify", "messagebox", "execute")
+
+    def __init__(self, cfg, notify=None):
+        self.cfg = cfg
+        self.rules = load_trigger_rules(cfg)
+        self.notify = notify
+        self.condition = threading.Condition()
+        self.pending = None
+        self.last_fire = None
+        self.stopping = False
+        self.actions = queue.Queue(int(cfg.get("action_queue_size", ACTION_QUEUE_SIZE)))
+        self.running_programs = []
+        self.messagebox_open = threading.Event()
+        self.threads = []
+        self.metrics = {
+            "submitted": 0,
+            "unmatched": 0,
+            "coalesced": 0,
+            "fired": 0,
+            "dropped_queue": 0,
+            "dropped_busy": 0,
+            "messagebox_suppressed": 0,
+            "latency": {name: {"count": 0, "total_ms": 0.0, "max_ms": 0.0} for name in self.ACTIONS},
+        }
+
+    def update_config(self, cfg, rules=None):
+        """Новая конфигурация; rules — уже скомпилированные правила (иначе компилируются здесь)."""
+        if rules is None:
+            rules = load_trigger_rules(cfg)
+        with self.condition:
+            self.cfg = cfg
+            self.rules = rules
+            self.condition.notify()
+
+    def start(self):
+        self.stopping = False
+        METRICS.gauge("whead_trigger_pending", "Обнаружений, ожидающих срабатывания триггера",
+                      lambda: self.pending.detections if self.pending is not None else 0)
+        METRICS.gauge("whead_trigger_queue_depth", "Пачек в очереди действий триггера", self.actions.qsize)
+        for target, name in ((self.run_dispatcher, "WHEAD-trigger-dispatch"), (self.run_actions, "WHEAD-trigger-actions")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """Остановить потоки; уже накопленная пачка выполняется без ожидания окна."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        write_log(f"Исполнитель триггера остановлен: {self.summary()}")
+
+    def submit(self, detection):
+        rules = self.rules.match(detection)
+        with self.condition:
+            self.metrics["submitted"] += 1
+            if not rules:
+                self.metrics["unmatched"] += 1
+                return
+            if self.pending is None:
+                self.pending = TriggerBatch(detection, rules)
+            else:
+                self.pending.merge(detection, rules)
+                self.metrics["coalesced"] += 1
+            self.condition.notify()
+
+    def fire_at(self):
+        debounce = float(self.cfg.get("trigger_debounce", TRIGGER_DEBOUNCE))
+        cooldown = float(self.cfg.get("trigger_cooldown", TRIGGER_COOLDOWN))
+        at = self.pending.first_monotonic + debounce
+        if self.last_fire is not None:
+            at = max(at, self.last_fire + cooldown)
+        return at
+
+    def run_dispatcher(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.pending is not None:
+                        delay = self.fire_at() - time.monotonic()
+                        if delay <= 0 or self.stopping:
+                            break
+                        self.condition.wait(delay)
+                    elif self.stopping:
+                        break
+                    else:
+                        self.condition.wait()
+                batch, self.pending = self.pending, None
+                stopping = self.stopping
+                if batch is not None:
+                    self.last_fire = time.monotonic()
+                    self.metrics["fired"] += 1
+            if batch is not None:
+                try:
+                    self.actions.put_nowait(batch)
+                except queue.Full:
+                    self.metrics["dropped_queue"] += 1
+                    TRIGGER_DROPPED.inc(1, "queue")
+                    write_log(f"Очередь действий триггера переполнена, пропущена пачка из {batch.detections} обнаружений", WARNING)
+            if stopping:
+                self.actions.put(None)
+                return
+
+    def run_actions(self):
+        while True:
+            batch = self.actions.get()
+            if batch is None:
+                return
+            try:
+                run_trigger_actions(batch, self.cfg, self.notify, self)
+            except Exception as e:
+                write_log(f"Ошибка выполнения действий триггера: {e}", WARNING)
+
+    def record_latency(self, action, batch):
+        latency_ms = (time.monotonic() - batch.first_monotonic) * 1000
+        stats = self.metrics["latency"][action]
+        stats["count"] += 1
+        stats["total_ms"] += latency_ms
+        stats["max_ms"] = max(stats["max_ms"], latency_ms)
+        TRIGGER_LATENCY.observe(latency_ms / 1000, action)
+
+    def show_messagebox_async(self, text):
+        """MessageBox в отдельном потоке; пока открыт предыдущий, новые не показываются."""
+        if self.messagebox_open.is_set():
+            self.metrics["messagebox_suppressed"] += 1
+            TRIGGER_DROPPED.inc(1, "messagebox_open")
+            write_debug("MessageBox уже открыт, новое сообщение не показано")
+            return False
+
+        def run():
+            try:
+                show_messagebox(text)
+            finally:
+                self.messagebox_open.clear()
+
+        self.messagebox_open.set()
+        threading.Thread(target=run, name="WHEAD-messagebox", daemon=True).start()
+        return True
+
+    def launch_program(self, cmd, env):
+        """Запуск внешней программы с ограничением числа одновременно работающих."""
+        limit = max(1, int(self.cfg.get("max_running_programs", MAX_RUNNING_PROGRAMS)))
+        deadline = time.monotonic() + PROGRAM_SLOT_TIMEOUT
+        while True:
+            self.running_programs = [p for p in self.running_programs if p.poll() is None]
+            if len(self.running_programs) < limit:
+                break
+            if time.monotonic() >= deadline or self.stopping:
+                self.metrics["dropped_busy"] += 1
+                TRIGGER_DROPPED.inc(1, "programs_busy")
+                write_log(f"Запуск приложения пропущен: уже работает {len(self.running_programs)} из {limit}", WARNING)
+                return None
+            time.sleep(0.2)
+        process = subprocess.Popen(cmd, env=env)
+        self.running_programs.append(process)
+        return process
+
+    def stats(self):
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics["latency"] = {
+                name: {
+                    "count": v["count"],
+                    "avg_ms": round(v["total_ms"] / v["count"], 1) if v["count"] else 0.0,
+                    "max_ms": round(v["max_ms"], 1),
+                }
+                for name, v in self.metrics["latency"].items()
+            }
+            metrics["pending"] = self.pending.detections if self.pending is not None else 0
+            metrics["queued"] = self.actions.qsize()
+            metrics["running_programs"] = len([p for p in self.running_programs if p.poll() is None])
+            metrics["rules"] = self.rules.names()
+        return metrics
+
+    def summary(self):
+        m = self.stats()
+        return (f"обнаружений {m['submitted']}, объединено {m['coalesced']}, срабатываний {m['fired']}, "
+                f"отброшено {m['dropped_queue'] + m['dropped_busy']}")
+
+
+def run_trigger_actions(batch, cfg, notify=None, executor=None):
+    """Действия правил, совпавших с пачкой: уведомление, MessageBox, запуск внешней программы.
+
+    batch — TriggerBatch (или одиночное обнаружение через TriggerBatch(detection, rules)).
+    Без executor MessageBox и запуск программы выполняются напрямую.
+    """
+    codes_str = batch.codes_str
+    write_debug(f"Сработали правила триггера: {', '.join(batch.rules) or 'нет'}")
+    burst = f" (обнаружений: {batch.detections}, событий: {batch.new_count})" if batch.detections > 1 else ""
+    if batch.reasons:
+        burst = f". Превышен порог частоты: {'; '.join(batch.reasons)}"
+    if batch.details:
+        burst += f". {'; '.join(batch.details)}"
+
+    for action in batch.actions():
+        if action.type == "notify":
+            notification_msg = f"Найдена ошибка WHEA{batch.where}! Коды ошибок {codes_str}{burst}"
+            if notify is not None:
+                write_log(f"Отправляем уведомление через Windows: {notification_msg}")
+                notify(notification_msg)
+                write_log(f"Отправлено сообщение Windows: {notification_msg}")
+            else:
+                write_log(f"Уведомление (без GUI): {notification_msg}")
+            if executor is not None:
+                executor.record_latency("notify", batch)
+        elif action.type == "messagebox":
+            notification_msg = f"Найдена ошибка WHEA{batch.where}{burst}"
+            write_log(f"Отправляем сообщение через ShowMessage: {notification_msg}")
+            if executor is None:
+                show_messagebox(notification_msg)
+            elif executor.show_messagebox_async(notification_msg):
+                executor.record_latency("messagebox", batch)
+            write_log(f"Отправлено сообщение через ShowMessage: {notification_msg}")
+        elif action.type == "execute":
+            run_program(batch, action.path, action.args, executor)
+
+
+def run_program(batch, exe_path, exe_args, executor=None):
+    """Запуск внешнего приложения с подстановкой значений пачки в аргументы и окружение."""
+    if not exe_path:
+        write_log("Не указан путь к приложению для запуска.")
+        return
+    try:
+        full_cmd = [exe_path] + batch.format_args(exe_args.split())
+        env = {**os.environ, **batch.environment()}
+        if executor is None:
+            subprocess.Popen(full_cmd, env=env)
+        elif executor.launch_program(full_cmd, env) is None:
+            return
+        else:
+            executor.record_latency("execute", batch)
+        write_log(f"Запущено приложение: {exe_path} с аргументами: {exe_args}")
+    except Exception as e:
+        write_log(f"Ошибка запуска приложения: {e}")